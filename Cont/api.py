@@ -0,0 +1,474 @@
+"""API JSON versionada (v1) para contas, categorias e tipos de pagamento.
+
+Usa as mesmas funções de database.py que as páginas HTML, com:
+  - seleção de campos:      GET /api/v1/contas?fields=id,nome,valor
+  - paginação por chave:    GET /api/v1/contas?limit=50&after=<último id recebido>
+  - busca em lote por IDs:  GET /api/v1/contas?ids=3,7,9
+  - busca pelo nome:        GET /api/v1/busca?q=netf&categoria_id=2&de=2024-01-01&ate=2024-12-31
+A autenticação é a mesma sessão do Flask-Login usada pelo site. As leituras (GET) usam conexões
+somente leitura; as listagens e a busca, na réplica se LEITURA_REPLICA estiver ligado (ver leitura.py).
+"""
+import decimal
+import math
+from datetime import date
+
+from flask import Blueprint, jsonify, request, abort
+from flask_login import login_required, current_user
+from werkzeug.exceptions import HTTPException
+
+from database import (
+    API_COLUMNS,
+    get_rows_by_user,
+    create_conta,
+    get_conta_by_id,
+    update_conta,
+    delete_conta,
+    create_categoria,
+    get_categoria_by_id,
+    get_categoria_by_name_and_user,
+    update_categoria,
+    delete_categoria,
+    create_tipo_pagamento,
+    get_tipo_pagamento_by_id,
+    update_tipo_pagamento,
+    delete_tipo_pagamento,
+    adjust_tipo_pagamento_saldo,
+    search_contas,
+    MOTIVO_CONTA_ADICIONADA,
+    MOTIVO_CONTA_EDITADA,
+    MOTIVO_CONTA_ESTORNO,
+    MOTIVO_CONTA_EXCLUIDA,
+)
+from forms import valor_para_decimal
+from leitura import somente_leitura
+from models import Cartao, ContaBancaria
+
+api_bp = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+LIMITE_PADRAO = 50  # Itens por página quando 'limit' não é informado
+LIMITE_MAXIMO = 500  # Maior página aceita
+MAX_IDS_POR_LOTE = 200  # Maior quantidade de IDs aceita em uma busca em lote
+BUSCA_LIMITE_PADRAO = 10  # Resultados da busca quando 'limit' não é informado (autocomplete)
+BUSCA_LIMITE_MAXIMO = 100
+
+
+class ErroValidacao(ValueError):
+    """Dados enviados à API inválidos (respondido com 400)."""
+
+
+# --- Tratamento de Erros (sempre em JSON dentro da API) ---
+@api_bp.errorhandler(HTTPException)
+def erro_http(e):
+    return jsonify(erro=e.description), e.code
+
+
+@api_bp.errorhandler(ErroValidacao)
+def erro_validacao(e):
+    return jsonify(erro=str(e)), 400
+
+
+# --- Funções Auxiliares de Requisição ---
+def _ler_json():
+    """Retorna o corpo JSON da requisição (exige Content-Type application/json)."""
+    if not request.is_json:
+        abort(415, description="Envie o corpo como application/json.")
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        abort(400, description="Corpo JSON inválido.")
+    return dados
+
+
+def _parse_inteiro(nome, valor, minimo=None):
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ErroValidacao(f"'{nome}' deve ser um número inteiro.")
+    if minimo is not None and numero < minimo:
+        raise ErroValidacao(f"'{nome}' deve ser maior ou igual a {minimo}.")
+    return numero
+
+
+def _parse_lista_ids(texto):
+    ids = [_parse_inteiro("ids", parte) for parte in texto.split(",") if parte.strip()]
+    if len(ids) > MAX_IDS_POR_LOTE:
+        raise ErroValidacao(f"Máximo de {MAX_IDS_POR_LOTE} IDs por requisição.")
+    return ids
+
+
+def _parse_campos(tabela):
+    """Lê o parâmetro 'fields' (lista separada por vírgulas). None = todos os campos."""
+    texto = request.args.get("fields")
+    if not texto:
+        return None
+    campos = [c.strip() for c in texto.split(",") if c.strip()]
+    invalidos = [c for c in campos if c not in API_COLUMNS[tabela]]
+    if invalidos:
+        raise ErroValidacao(f"Campos inválidos: {', '.join(invalidos)}")
+    return campos
+
+
+def _filtrar_campos(linha, campos):
+    if campos is None:
+        return linha
+    return {c: linha[c] for c in campos}
+
+
+def _buscar_um(tabela, id, campos=None):
+    linhas = get_rows_by_user(tabela, current_user.id, colunas=campos, ids=[id])
+    if not linhas:
+        abort(404, description="Registro não encontrado.")
+    return _filtrar_campos(linhas[0], campos)
+
+
+def _parse_decimal(nome, valor, obrigatorio=True):
+    if valor is None or valor == "":
+        if obrigatorio:
+            raise ErroValidacao(f"'{nome}' é obrigatório.")
+        return None
+    if isinstance(valor, bool):  # True/False do JSON viram 1/0 no int, não são valores
+        raise ErroValidacao(f"'{nome}' inválido.")
+    try:
+        val = valor_para_decimal(valor)
+    except decimal.InvalidOperation:
+        val = None
+    # NaN, Infinity e valores além do float (ex: 1e400) não cabem no banco nem nos limites/saldos
+    if val is None or not math.isfinite(float(val)):
+        raise ErroValidacao(f"'{nome}' inválido.")
+    return val
+
+
+# Valores aceitos para campos booleanos (além de true/false do JSON). 0/1 é o formato devolvido nas leituras
+_BOOLEANOS = {"true": True, "1": True, "false": False, "0": False}
+
+
+def _parse_booleano(nome, valor):
+    if isinstance(valor, bool):
+        return valor
+    if isinstance(valor, (int, str)) and str(valor).strip().lower() in _BOOLEANOS:
+        return _BOOLEANOS[str(valor).strip().lower()]
+    raise ErroValidacao(f"'{nome}' deve ser true ou false.")
+
+
+def _verificar_recurso(recurso):
+    if recurso not in API_COLUMNS:
+        abort(404, description=f"Recurso desconhecido: {recurso}")
+
+
+def _parse_data(nome, valor):
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ErroValidacao(f"'{nome}' deve estar no formato AAAA-MM-DD.")
+
+
+# --- Busca ---
+@api_bp.route("/busca", methods=["GET"])
+@login_required
+@somente_leitura
+def buscar():
+    """Busca contas pelo nome: cada palavra de 'q' casa como prefixo, resultados por relevância.
+    Filtros opcionais: 'categoria_id' (pode repetir), 'de' e 'ate' (vencimento, AAAA-MM-DD)."""
+    texto = request.args.get("q", "")
+    categoria_ids = [_parse_inteiro("categoria_id", c) for c in request.args.getlist("categoria_id") if c]
+    data_inicio = _parse_data("de", request.args.get("de"))
+    data_fim = _parse_data("ate", request.args.get("ate"))
+    limite = _parse_inteiro("limit", request.args.get("limit", BUSCA_LIMITE_PADRAO), minimo=1)
+    linhas = search_contas(
+        current_user.id, texto, categoria_ids=categoria_ids, data_inicio=data_inicio, data_fim=data_fim,
+        limit=min(limite, BUSCA_LIMITE_MAXIMO),
+    )
+    return jsonify(data=linhas)
+
+
+# --- Leitura (comum a todos os recursos) ---
+@api_bp.route("/<recurso>", methods=["GET"])
+@login_required
+@somente_leitura
+def listar(recurso):
+    _verificar_recurso(recurso)
+    campos = _parse_campos(recurso)
+
+    ids_texto = request.args.get("ids")
+    if ids_texto is not None:
+        linhas = get_rows_by_user(recurso, current_user.id, colunas=campos, ids=_parse_lista_ids(ids_texto))
+        return jsonify(data=[_filtrar_campos(l, campos) for l in linhas], next_after=None)
+
+    limite = _parse_inteiro("limit", request.args.get("limit", LIMITE_PADRAO), minimo=1)
+    limite = min(limite, LIMITE_MAXIMO)
+    after = request.args.get("after")
+    after_id = _parse_inteiro("after", after, minimo=0) if after is not None else None
+
+    # Busca um item a mais para saber se existe próxima página sem precisar de COUNT(*)
+    linhas = get_rows_by_user(
+        recurso, current_user.id, colunas=campos, after_id=after_id, limit=limite + 1
+    )
+    proxima = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proxima = linhas[-1]["id"]
+    return jsonify(data=[_filtrar_campos(l, campos) for l in linhas], next_after=proxima)
+
+
+@api_bp.route("/<recurso>/<int:id>", methods=["GET"])
+@login_required
+@somente_leitura(replica=False)  # Lido logo depois de um POST/PUT: sempre o arquivo atual
+def obter(recurso, id):
+    _verificar_recurso(recurso)
+    return jsonify(data=_buscar_um(recurso, id, _parse_campos(recurso)))
+
+
+# --- Escrita: Contas ---
+def _dados_conta(dados, conta=None):
+    """Valida os campos de uma conta. Com 'conta', faz atualização parcial sobre os valores atuais."""
+    def atual(campo, padrao=None):
+        return getattr(conta, campo) if conta is not None else padrao
+
+    nome = dados.get("nome", atual("nome"))
+    if not nome or not str(nome).strip():
+        raise ErroValidacao("'nome' é obrigatório.")
+
+    valor = _parse_decimal("valor", dados["valor"]) if "valor" in dados else atual("valor")
+    if valor is None:
+        raise ErroValidacao("'valor' é obrigatório.")
+    if "valor_total_compra" in dados:
+        valor_total = _parse_decimal("valor_total_compra", dados["valor_total_compra"], obrigatorio=False)
+    else:
+        valor_total = atual("valor_total_compra")
+    if not valor_total:
+        valor_total = valor  # Mesmo padrão do formulário: sem total, usa o valor da parcela
+
+    if "vencimento" in dados:
+        try:
+            vencimento = date.fromisoformat(str(dados["vencimento"]))
+        except ValueError:
+            raise ErroValidacao("'vencimento' deve estar no formato AAAA-MM-DD.")
+    else:
+        vencimento = atual("vencimento")
+    if vencimento is None:
+        raise ErroValidacao("'vencimento' é obrigatório.")
+
+    categoria_id = dados.get("categoria_id", atual("categoria_id")) or None
+    if categoria_id is not None:
+        categoria_id = _parse_inteiro("categoria_id", categoria_id)
+        if not get_categoria_by_id(categoria_id, current_user.id):
+            raise ErroValidacao("Categoria não encontrada.")
+
+    tipo_pagamento_id = dados.get("tipo_pagamento_id", atual("tipo_pagamento_id")) or None
+    if tipo_pagamento_id is not None:
+        tipo_pagamento_id = _parse_inteiro("tipo_pagamento_id", tipo_pagamento_id)
+        tp = get_tipo_pagamento_by_id(tipo_pagamento_id)
+        if not tp or tp.user_id != current_user.id:
+            raise ErroValidacao("Tipo de pagamento não encontrado.")
+
+    parcela_atual = dados.get("parcela_atual", atual("parcela_atual")) or None
+    total_parcelas = dados.get("total_parcelas", atual("total_parcelas")) or None
+    if parcela_atual is not None:
+        parcela_atual = _parse_inteiro("parcela_atual", parcela_atual, minimo=1)
+    if total_parcelas is not None:
+        total_parcelas = _parse_inteiro("total_parcelas", total_parcelas, minimo=1)
+        if parcela_atual is None:
+            parcela_atual = 1
+    if parcela_atual and total_parcelas and parcela_atual > total_parcelas:
+        raise ErroValidacao("Parcela atual > total.")
+
+    if "recorrente" in dados:
+        recorrente = _parse_booleano("recorrente", dados["recorrente"])
+    else:
+        recorrente = bool(atual("recorrente", False))
+
+    return dict(
+        nome=str(nome).strip(),
+        valor=valor,
+        valor_total_compra=valor_total,
+        vencimento=vencimento,
+        categoria_id=categoria_id,
+        parcela_atual=parcela_atual,
+        total_parcelas=total_parcelas,
+        recorrente=recorrente,
+        tipo_pagamento_id=tipo_pagamento_id,
+    )
+
+
+def _criar_conta(dados):
+    campos = _dados_conta(dados)
+    conta_id = create_conta(
+        campos["nome"],
+        float(campos["valor"]),
+        campos["vencimento"],
+        campos["categoria_id"],
+        campos["parcela_atual"],
+        campos["total_parcelas"],
+        current_user.id,
+        int(campos["recorrente"]),
+        campos["tipo_pagamento_id"],
+        float(campos["valor_total_compra"]),
+    )
+    if conta_id is None:
+        abort(500, description="Erro ao criar conta.")
+    if campos["tipo_pagamento_id"]:
+        # Mesma regra da tela: o valor TOTAL da compra sai do limite/saldo
+        adjust_tipo_pagamento_saldo(
+            campos["tipo_pagamento_id"], current_user.id, -campos["valor_total_compra"],
+            motivo=MOTIVO_CONTA_ADICIONADA, conta_id=conta_id,
+        )
+    return conta_id
+
+
+def _atualizar_conta(id, dados):
+    conta = get_conta_by_id(id, current_user.id)
+    if not conta:
+        abort(404, description="Registro não encontrado.")
+    tp_antigo, total_antigo = conta.tipo_pagamento_id, conta.valor_total_compra
+    for campo, valor in _dados_conta(dados, conta).items():
+        setattr(conta, campo, valor)
+    if not update_conta(conta):
+        abort(500, description="Erro ao salvar conta.")
+    if (tp_antigo, total_antigo) != (conta.tipo_pagamento_id, conta.valor_total_compra):
+        if tp_antigo:
+            adjust_tipo_pagamento_saldo(
+                tp_antigo, current_user.id, total_antigo, motivo=MOTIVO_CONTA_ESTORNO, conta_id=id
+            )
+        if conta.tipo_pagamento_id:
+            adjust_tipo_pagamento_saldo(
+                conta.tipo_pagamento_id, current_user.id, -conta.valor_total_compra,
+                motivo=MOTIVO_CONTA_EDITADA, conta_id=id,
+            )
+
+
+def _excluir_conta(id):
+    conta = get_conta_by_id(id, current_user.id)
+    if not conta:
+        abort(404, description="Registro não encontrado.")
+    if not delete_conta(id, current_user.id):
+        abort(500, description="Erro ao excluir conta.")
+    if conta.tipo_pagamento_id:
+        adjust_tipo_pagamento_saldo(
+            conta.tipo_pagamento_id, current_user.id, conta.valor_total_compra,
+            motivo=MOTIVO_CONTA_EXCLUIDA, conta_id=id,
+        )
+
+
+# --- Escrita: Categorias ---
+def _nome_categoria(dados):
+    nome = str(dados.get("nome") or "").strip()
+    if not (2 <= len(nome) <= 50):
+        raise ErroValidacao("'nome' deve ter entre 2 e 50 caracteres.")
+    return nome
+
+
+def _criar_categoria(dados):
+    nome = _nome_categoria(dados)
+    if get_categoria_by_name_and_user(nome, current_user.id):
+        abort(409, description=f'A categoria "{nome}" já existe.')
+    categoria_id = create_categoria(nome, current_user.id)
+    if categoria_id is None:
+        abort(500, description="Erro ao adicionar categoria.")
+    return categoria_id
+
+
+def _atualizar_categoria(id, dados):
+    if not get_categoria_by_id(id, current_user.id):
+        abort(404, description="Registro não encontrado.")
+    if not update_categoria(id, _nome_categoria(dados), current_user.id):
+        abort(409, description="Já existe outra categoria com este nome.")
+
+
+def _excluir_categoria(id):
+    if not delete_categoria(id, current_user.id):
+        abort(404, description="Registro não encontrado.")
+
+
+# --- Escrita: Tipos de Pagamento ---
+def _criar_tipo_pagamento(dados):
+    nome = str(dados.get("nome") or "").strip()
+    if not nome or len(nome) > 50:
+        raise ErroValidacao("'nome' é obrigatório (máximo 50 caracteres).")
+    tipo = dados.get("tipo")
+    if tipo == "cartao":
+        limite = _parse_decimal("limite", dados.get("limite"))
+        tipo_id = create_tipo_pagamento(
+            nome=nome, tipo="cartao", limite=limite, limite_disponivel=limite, user_id=current_user.id
+        )
+    elif tipo == "conta":
+        saldo = _parse_decimal("saldo", dados.get("saldo"))
+        tipo_id = create_tipo_pagamento(nome=nome, tipo="conta", saldo=saldo, user_id=current_user.id)
+    else:
+        raise ErroValidacao("'tipo' deve ser 'cartao' ou 'conta'.")
+    if tipo_id is None:
+        abort(500, description="Erro ao criar tipo de pagamento.")
+    return tipo_id
+
+
+def _tipo_pagamento_do_usuario(id):
+    tp = get_tipo_pagamento_by_id(id)
+    if not tp or tp.user_id != current_user.id:
+        abort(404, description="Registro não encontrado.")
+    return tp
+
+
+def _atualizar_tipo_pagamento(id, dados):
+    tp = _tipo_pagamento_do_usuario(id)
+    if "nome" in dados:
+        nome = str(dados["nome"] or "").strip()
+        if not nome or len(nome) > 50:
+            raise ErroValidacao("'nome' é obrigatório (máximo 50 caracteres).")
+        tp.nome = nome
+    if isinstance(tp, Cartao) and "limite" in dados:
+        # Mesma regra de edit_cartao: a diferença de limite é refletida no disponível
+        limite_novo = _parse_decimal("limite", dados["limite"])
+        tp.limite_disponivel += limite_novo - tp.limite
+        tp.limite = limite_novo
+    elif isinstance(tp, ContaBancaria) and "saldo" in dados:
+        tp.saldo = _parse_decimal("saldo", dados["saldo"])
+    if not update_tipo_pagamento(tp):
+        abort(500, description="Erro ao salvar tipo de pagamento.")
+
+
+def _excluir_tipo_pagamento(id):
+    _tipo_pagamento_do_usuario(id)
+    if not delete_tipo_pagamento(id, current_user.id):
+        abort(409, description="Não foi possível excluir. Verifique contas vinculadas.")
+
+
+CRIAR = {
+    "contas": _criar_conta,
+    "categorias": _criar_categoria,
+    "tipos_pagamento": _criar_tipo_pagamento,
+}
+ATUALIZAR = {
+    "contas": _atualizar_conta,
+    "categorias": _atualizar_categoria,
+    "tipos_pagamento": _atualizar_tipo_pagamento,
+}
+EXCLUIR = {
+    "contas": _excluir_conta,
+    "categorias": _excluir_categoria,
+    "tipos_pagamento": _excluir_tipo_pagamento,
+}
+
+
+@api_bp.route("/<recurso>", methods=["POST"])
+@login_required
+def criar(recurso):
+    _verificar_recurso(recurso)
+    novo_id = CRIAR[recurso](_ler_json())
+    return jsonify(data=_buscar_um(recurso, novo_id)), 201
+
+
+@api_bp.route("/<recurso>/<int:id>", methods=["PUT", "PATCH"])
+@login_required
+def atualizar(recurso, id):
+    """Atualização parcial: apenas os campos enviados são alterados (PUT e PATCH se comportam igual)."""
+    _verificar_recurso(recurso)
+    ATUALIZAR[recurso](id, _ler_json())
+    return jsonify(data=_buscar_um(recurso, id))
+
+
+@api_bp.route("/<recurso>/<int:id>", methods=["DELETE"])
+@login_required
+def excluir(recurso, id):
+    _verificar_recurso(recurso)
+    EXCLUIR[recurso](id)
+    return "", 204
@@ -1,11 +1,13 @@
 import os
 import sqlite3
+import hashlib  # Para gerar ETags a partir da versão dos dados
 import calendar  # Para obter nomes de meses e cálculos de dias
 import decimal  # Para manipulação precisa de valores monetários
 from datetime import date, timedelta, datetime  # Para manipulação de datas e horas
 from dateutil.relativedelta import relativedelta  # Para cálculos fáceis de meses (ex: +2 meses)
 from flask import (
     Flask, render_template, request, redirect, url_for, flash, g, current_app,
+    session, make_response,
 )
 from flask_login import (
     LoginManager,  # Gerencia a sessão de login
@@ -15,10 +17,6 @@ from flask_login import (
     current_user,  # Proxy para o usuário atualmente logado
     UserMixin,  # Mixin para a classe User (geralmente definida em models.py)
 )
-from werkzeug.security import (
-    generate_password_hash,
-    check_password_hash,  # Para hashing seguro de senhas
-)
 from waitress import serve  # Servidor WSGI recomendado para produção (alternativa ao servidor de dev do Flask)
 
 # --- Importações Locais ---
@@ -30,9 +28,13 @@ from database import (
     get_db_connection,  # Função para obter uma conexão com o DB
     init_db,  # Função para inicializar o DB (criar tabelas)
     update_conta,  # Função para atualizar uma conta no DB
+    create_conta,  # Função para criar uma conta no DB (devolve o ID)
+    delete_conta as excluir_conta,  # Função para deletar uma conta no DB (a rota tem o mesmo nome)
+    avancar_recorrentes,  # Função que grava o rollover das recorrentes (vencimentos e débitos) de uma vez
     get_conta_by_id,  # Função para buscar uma conta pelo ID
     get_user_by_username,  # Função para buscar um usuário pelo nome
     create_user,  # Função para criar um novo usuário
+    update_user_password,  # Função para gravar um novo hash de senha
     get_contas_by_user,  # Função para buscar todas as contas de um usuário
     get_tipos_pagamento_by_user,  # Função para buscar todos os tipos de pagamento (cartões/contas) de um usuário
     create_tipo_pagamento,  # Função para criar um novo tipo de pagamento (cartão/conta)
@@ -45,7 +47,20 @@ from database import (
     get_categoria_by_name_and_user,  # Função para buscar categoria pelo nome (evitar duplicados)
     update_categoria,  # Função para atualizar uma categoria
     delete_categoria,  # Função para deletar uma categoria (e desassociar contas)
-    check_and_apply_schema_updates,  # Função para verificar e aplicar atualizações no schema do DB
+    apply_migrations_all,  # Aplica as migrações pendentes do schema no banco principal e nos shards
+    get_main_db_path,  # Caminho do banco principal (tabela 'users'), mesmo com shards por usuário
+    get_data_version,  # Função para buscar a versão dos dados do usuário (usada nos ETags)
+    get_contas_para_previsao,  # Função para buscar as colunas usadas na previsão de fluxo de caixa
+    get_totais_faturas,  # Função que calcula no banco o total de cada fatura de um cartão
+    get_lancamentos_fatura,  # Função para buscar os lançamentos de uma fatura
+    adjust_tipo_pagamento_saldo,  # Função que soma um valor ao limite/saldo e grava a movimentação
+    get_movimentacoes,  # Função para buscar as movimentações (livro-razão) de um tipo de pagamento
+    conferir_saldo,  # Função que compara o limite/saldo gravado com o calculado pelo livro-razão
+    MOTIVO_CONTA_ADICIONADA,
+    MOTIVO_CONTA_EDITADA,
+    MOTIVO_CONTA_ESTORNO,
+    MOTIVO_ESTORNO_DESFEITO,
+    MOTIVO_CONTA_EXCLUIDA,
 )
 
 # Assumindo que os formulários Flask-WTF estão definidos em forms.py
@@ -59,6 +74,44 @@ from forms import (
     CategoriaForm,
 )
 
+# API JSON versionada (Blueprint com prefixo /api/v1)
+from api import api_bp
+
+# Arquivos estáticos com hash na URL e cache longo
+import assets
+
+# Perfil (cProfile) de requisições sob demanda
+import profiling
+
+# Métricas no formato do Prometheus (/metrics)
+import metrics
+
+# Hash de senhas em um pool de processos (fora das threads de requisição)
+import senhas
+
+# Rastreador de SQL por requisição (N+1 e consultas lentas)
+import sql_tracer
+
+# Cache de fragmentos HTML (tabelas do dashboard e do relatório)
+import fragment_cache
+from fragment_cache import FragmentCache
+
+# Cronograma de parcelas calculado sob demanda
+import parcelas
+
+# Previsão de fluxo de caixa (projeção vetorizada com numpy)
+import previsao
+
+# Ciclos de fatura de cartão (dias de fechamento e vencimento)
+import faturas
+
+# Escritor único: escritas de cada arquivo do banco em uma só thread (ver escritor.py)
+import escritor
+
+# Conexões somente leitura e réplica para relatórios, exportações e análises
+import leitura
+from leitura import somente_leitura
+
 # --- Funções Auxiliares Globais ---
 
 
@@ -102,26 +155,53 @@ def formatar_br(valor):
         return "Valor inválido"
 
 
-# --- Configuração da Aplicação Flask ---
-app = Flask(__name__)
-app.config["SECRET_KEY"] = os.environ.get(
-    "FLASK_SECRET_KEY", "dev_fallback_secret_key_123!@#"
-)
-app.config["DATABASE"] = "contas.db"
+# --- Registro de Rotas ---
+# As rotas e hooks deste módulo são declarados com @rotas.route(...), @rotas.context_processor etc.
+# e só são ligados a um app Flask dentro de create_app() (mais abaixo). Assim importar este módulo
+# não cria app nem toca no banco, e os nomes de endpoint continuam os mesmos (url_for('dashboard')).
+class RegistroRotas:
+    """Guarda chamadas de decoradores no formato do Flask para repeti-las em cada app criado."""
 
+    def __init__(self):
+        self._registros = []  # (nome do método do Flask, args, kwargs, função)
 
-# --- Executa Verificação/Atualização do Schema ---
-with app.app_context():
-    print("Executando verificação do schema...")
-    check_and_apply_schema_updates()
-    print("Verificação do schema finalizada.")
+    def _adiar(self, metodo, *args, **kwargs):
+        def decorador(f):
+            self._registros.append((metodo, args, kwargs, f))
+            return f
+
+        return decorador
+
+    def route(self, rule, **options):
+        return self._adiar("route", rule, **options)
+
+    def teardown_appcontext(self, f):
+        return self._adiar("teardown_appcontext")(f)
+
+    def context_processor(self, f):
+        return self._adiar("context_processor")(f)
+
+    def before_request(self, f):
+        return self._adiar("before_request")(f)
+
+    def init_app(self, app):
+        for metodo, args, kwargs, f in self._registros:
+            decorador = getattr(app, metodo)
+            if args or kwargs:
+                decorador = decorador(*args, **kwargs)
+            decorador(f)
+
+
+rotas = RegistroRotas()
 
 # --- Configuração do Flask-Login ---
+# (ligado ao app em create_app)
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = "login"  # Rota para redirecionar se não logado
 login_manager.login_message = "Por favor, faça login para acessar esta página."
 login_manager.login_message_category = "info"
+# Na API, requisições sem login recebem 401 em vez de redirecionar para a página de login
+login_manager.blueprint_login_views = {api_bp.name: None}
 
 
 @login_manager.user_loader
@@ -129,7 +209,7 @@ def load_user(user_id):
     """Carrega um usuário pelo ID para o Flask-Login."""
     try:
         user_id_int = int(user_id)
-        conn = get_db_connection()
+        conn = get_db_connection(get_main_db_path())
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM users WHERE id = ?", (user_id_int,))
         row = cursor.fetchone()
@@ -145,30 +225,44 @@ def load_user(user_id):
 
 # --- Gerenciamento de Conexão com Banco (por requisição) ---
 def get_db():
-    """Obtém uma conexão com o banco de dados para a requisição atual."""
+    """Obtém uma conexão com o banco de dados para a requisição atual
+    (somente leitura nas views marcadas com @somente_leitura, ver leitura.py)."""
+    if g.get("somente_leitura"):
+        if "db_leitura" not in g:
+            g.db_leitura = get_db_connection()
+        return g.db_leitura
     if "db" not in g:
         g.db = get_db_connection()
     return g.db
 
 
-@app.teardown_appcontext
+@rotas.before_request
+def definir_shard_usuario():
+    """Com shards por usuário, as conexões sem user_id explícito (get_db, get_tipo_pagamento_by_id)
+    usam o shard do usuário logado (ver database.get_db_path)."""
+    if current_app.config["DATABASE_SHARDS"] and request.endpoint != "static" and current_user.is_authenticated:
+        g.usuario_shard = current_user.id
+
+
+@rotas.teardown_appcontext
 def close_db(e=None):
     """Fecha a conexão com o banco ao final da requisição."""
-    db = g.pop("db", None)
-    if db is not None:
-        db.close()
+    for chave in ("db", "db_leitura"):
+        db = g.pop(chave, None)
+        if db is not None:
+            db.close()
     if e:
         print(f"Erro no teardown: {e}")
 
 
 # --- Processadores de Contexto (funções disponíveis nos templates) ---
-@app.context_processor
+@rotas.context_processor
 def inject_formatar_br():
     """Injeta a função formatar_br nos templates."""
     return dict(formatar_br=formatar_br)
 
 
-@app.context_processor
+@rotas.context_processor
 def inject_get_tipo_pagamento():
     """Injeta uma função para buscar nome do tipo de pagamento nos templates."""
 
@@ -186,8 +280,9 @@ def inject_get_tipo_pagamento():
 
 
 # --- Funções Auxiliares Específicas da App ---
-def atualizar_limite_saldo(tipo_pagamento, valor_decimal, adicionar=False, total_parcelas=None):
-    """Atualiza limite (Cartao) ou saldo (ContaBancaria)."""
+def atualizar_limite_saldo(tipo_pagamento, valor_decimal, adicionar=False, total_parcelas=None,
+                           motivo=None, conta_id=None):
+    """Atualiza limite (Cartao) ou saldo (ContaBancaria), registrando a movimentação no livro-razão."""
     if not isinstance(valor_decimal, decimal.Decimal):
         valor_decimal = valor_para_decimal(str(valor_decimal))
         if valor_decimal is None:
@@ -195,20 +290,18 @@ def atualizar_limite_saldo(tipo_pagamento, valor_decimal, adicionar=False, total
             return
     if tipo_pagamento:
         try:
+            delta = valor_decimal if adicionar else -valor_decimal
+            # UPDATE relativo + movimentação na mesma transação (ver adjust_tipo_pagamento_saldo)
+            if not adjust_tipo_pagamento_saldo(
+                tipo_pagamento.id, tipo_pagamento.user_id, delta, motivo=motivo, conta_id=conta_id
+            ):
+                print(f"ERRO ao salvar atualização limite/saldo TP ID {tipo_pagamento.id}")
+                return
+            # Mantém o objeto em memória coerente com o banco
             if isinstance(tipo_pagamento, Cartao):
-                limite_disp = decimal.Decimal(str(tipo_pagamento.limite_disponivel))
-                tipo_pagamento.limite_disponivel = (
-                    limite_disp + valor_decimal
-                    if adicionar
-                    else limite_disp - valor_decimal
-                )
-                if not update_tipo_pagamento(tipo_pagamento):
-                    print(f"ERRO ao salvar atualização limite TP ID {tipo_pagamento.id}")
+                tipo_pagamento.limite_disponivel = decimal.Decimal(str(tipo_pagamento.limite_disponivel)) + delta
             elif isinstance(tipo_pagamento, ContaBancaria):
-                saldo = decimal.Decimal(str(tipo_pagamento.saldo))
-                tipo_pagamento.saldo = saldo + valor_decimal if adicionar else saldo - valor_decimal
-                if not update_tipo_pagamento(tipo_pagamento):
-                    print(f"ERRO ao salvar atualização saldo TP ID {tipo_pagamento.id}")
+                tipo_pagamento.saldo = decimal.Decimal(str(tipo_pagamento.saldo)) + delta
         except Exception as e:
             print(
                 f"Erro ao atualizar limite/saldo TP ID {tipo_pagamento.id if tipo_pagamento else 'N/A'}: {e}"
@@ -244,35 +337,27 @@ def proximo_vencimento(vencimento_atual):
             return date.today() + timedelta(days=30)
 
 
+@metrics.cronometrar(metrics.ROLLOVER)
 def update_parcelas_recorrentes():
-    """Verifica e atualiza contas parceladas/recorrentes vencidas."""
+    """Avança o vencimento das contas recorrentes vencidas (e debita o tipo de pagamento).
+
+    Parceladas não são mais reescritas aqui: a parcela atual é calculada na leitura a partir
+    do cronograma (ver parcelas.py e database.aplicar_cronograma).
+
+    Cada conta avança no máximo um mês por chamada.
+
+    Returns:
+        int: Quantidade de contas atualizadas (None em caso de erro).
+    """
     today = date.today()
     conn = get_db()
     cursor = conn.cursor()
-    updated_count = 0
+    # Vencimentos novos e débitos gravados juntos, em uma única escrita (ver database.avancar_recorrentes)
+    atualizacoes = []
     try:
-        # Parceladas
-        cursor.execute(
-            "SELECT id, parcela_atual, total_parcelas, vencimento FROM contas "
-            "WHERE total_parcelas IS NOT NULL AND total_parcelas > 0 "
-            "AND parcela_atual < total_parcelas AND date(vencimento) < ?",
-            (today.isoformat(),),
-        )
-        for row in cursor.fetchall():
-            new_parc = (row["parcela_atual"] or 0) + 1
-            try:
-                new_venc = proximo_vencimento(date.fromisoformat(row["vencimento"]))
-            except:
-                print(f"Erro data parc ID {row['id']}")
-                continue
-            cursor.execute(
-                "UPDATE contas SET parcela_atual = ?, vencimento = ? WHERE id = ?",
-                (new_parc, new_venc.isoformat(), row["id"]),
-            )
-            updated_count += 1
         # Recorrentes
         cursor.execute(
-            "SELECT id, vencimento, tipo_pagamento_id, valor FROM contas "
+            "SELECT id, user_id, vencimento, tipo_pagamento_id, valor FROM contas "
             "WHERE recorrente = 1 AND date(vencimento) < ?",
             (today.isoformat(),),
         )
@@ -282,22 +367,15 @@ def update_parcelas_recorrentes():
             except:
                 print(f"Erro data recorr ID {row['id']}")
                 continue
-            cursor.execute(
-                "UPDATE contas SET vencimento = ? WHERE id = ?", (new_venc.isoformat(), row["id"])
+            atualizacoes.append(
+                (row["id"], row["user_id"], new_venc.isoformat(), row["tipo_pagamento_id"], row["valor"])
             )
-            if row["tipo_pagamento_id"]:
-                tp = get_tipo_pagamento_by_id(row["tipo_pagamento_id"])
-                if tp:
-                    try:
-                        atualizar_limite_saldo(
-                            tp, decimal.Decimal(str(row["valor"])), adicionar=False
-                        )
-                    except:
-                        print(f"Aviso: Valor inválido recorr ID {row['id']}")
-            updated_count += 1
+        # Fecha a transação de leitura antes da escrita (que pode usar outra conexão)
+        conn.commit()
+        updated_count = avancar_recorrentes(atualizacoes)
         if updated_count > 0:
-            conn.commit()
             print(f"{updated_count} contas atualizadas.")
+        return updated_count
     except sqlite3.Error as sql_e:
         conn.rollback()
         print(f"Erro DB ao atualizar parcelas/recorrentes: {sql_e}")
@@ -306,59 +384,70 @@ def update_parcelas_recorrentes():
         print(f"Erro ao atualizar parcelas/recorrentes: {e}")
 
 
-# ======================================================================
-#               INÍCIO DAS ROTAS PRINCIPAIS E LANDING PAGE
-# ======================================================================
+# --- Cache HTTP (ETag) pela Versão dos Dados do Usuário ---
+# Guarda, por usuário, o (dia, versão) em que update_parcelas_recorrentes rodou sem nada a atualizar.
+# Se nada mudou desde então no mesmo dia, não há vencimentos novos a processar. Um LRU por app
+# (app.extensions["rollover_verificado"]), limitado a MAX_ROLLOVER_VERIFICADO usuários.
+MAX_ROLLOVER_VERIFICADO = 10000
 
-# --- ROTA RAIZ '/' - LANDING PAGE ---
-# Esta rota será a primeira página que um usuário vê.
-# Se ele não estiver logado, mostra a página de apresentação ('landing_page.html').
-# Se ele JÁ estiver logado, redireciona automaticamente para o dashboard principal.
-@app.route("/")
-def landing_page():
-    """Exibe a landing page para usuários não logados
-    ou redireciona usuários logados para o dashboard.
+
+def garantir_parcelas_atualizadas(user_id):
+    """Roda update_parcelas_recorrentes só se os dados do usuário mudaram (ou o dia virou)
+    desde a última execução sem atualizações. Retorna a versão dos dados após a atualização.
+
+    Uma execução que atualizou contas não é guardada: cada uma avança só um mês por vez, então
+    uma recorrente atrasada vários meses continua avançando nos próximos acessos, como antes do cache.
     """
-    # Verifica se o usuário atual (gerenciado pelo Flask-Login) está autenticado.
-    if current_user.is_authenticated:
-        # Se sim, redireciona para a função 'dashboard' (que responde pela rota '/dashboard').
-        print("DEBUG: Usuário logado acessou '/', redirecionando para /dashboard.")
-        return redirect(url_for("dashboard"))  # Redireciona para a rota do dashboard
-    else:
-        # Se não, renderiza o template da landing page.
-        print("DEBUG: Usuário não logado acessou '/', mostrando landing_page.html.")
-        return render_template("landing_page.html")
+    verificados = current_app.extensions["rollover_verificado"]
+    hoje = date.today()
+    versao = get_data_version(user_id)
+    if verificados.get(user_id) != (hoje, versao):
+        atualizadas = update_parcelas_recorrentes()
+        versao = get_data_version(user_id)
+        if atualizadas == 0:
+            verificados.set(user_id, (hoje, versao))
+    return versao
+
+
+def etag_dados_usuario(versao, *extras):
+    """Monta o ETag de uma página a partir do usuário, da versão dos seus dados e do dia
+    (as páginas destacam contas vencidas em relação a hoje)."""
+    base = f"{current_user.id}:{current_user.username}:{versao}:{date.today().isoformat()}"
+    for extra in extras:
+        base += f":{extra}"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+
+def resposta_nao_modificada(etag):
+    """Retorna uma resposta 304 se o navegador já tem a versão 'etag' da página, senão None.
+    Mensagens flash pendentes mudam o HTML, então nesse caso a página é sempre renderizada."""
+    if session.get("_flashes"):
+        return None
+    if request.if_none_match.contains(etag):
+        resp = make_response("", 304)
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+    return None
 
 
-# --- ROTA '/dashboard' - DASHBOARD PRINCIPAL ---
-# Esta é a página principal da aplicação para usuários LOGADOS.
-# Acessível somente após o login (devido ao @login_required).
-# A função foi renomeada de 'index' para 'dashboard'.
-@app.route("/dashboard")
-@login_required
-def dashboard():
-    print("DEBUG: Entrando na rota /dashboard...")
+def resposta_com_etag(html, etag):
+    """Envelopa o HTML renderizado com ETag e exige revalidação a cada acesso."""
+    resp = make_response(html)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
 
-    try:
-        update_parcelas_recorrentes()
-        print("DEBUG: update_parcelas_recorrentes executado com sucesso em /dashboard.")
-    except Exception as update_err:
-        print(f"ERRO durante update_parcelas_recorrentes no /dashboard: {update_err}")
-        flash(
-            "Ocorreu um erro ao atualizar os vencimentos automáticos das contas.", "warning"
-        )
 
-    todas_as_contas = get_contas_by_user(current_user.id)
-    contas = todas_as_contas
+def agrupar_contas_dashboard(user_id):
+    """Busca as contas do usuário e calcula o total geral e os totais/listas por categoria.
 
-    print(f"DEBUG: User ID: {current_user.id}")
-    print(
-        f"DEBUG: Número de contas retornadas por get_contas_by_user: {len(todas_as_contas)}"
-    )
-    for conta in todas_as_contas:
-        print(
-            f"  - ID: {conta.id}, Nome: {conta.nome}, Categoria Nome: {conta.categoria_nome}, Valor: {conta.valor}, Vencimento: {conta.vencimento}"
-        )
+    Returns:
+        tuple: (total_geral, total_por_categoria, contas_por_categoria)
+    """
+    todas_as_contas = get_contas_by_user(user_id)
+    contas = todas_as_contas
+    metrics.DASHBOARD_CONTAS.observe(len(todas_as_contas))
 
     total_por_categoria = {}
     contas_por_categoria = {}
@@ -386,15 +475,11 @@ def dashboard():
                 print(
                     f"Erro processando conta ID {conta.id} no loop de categorias dashboard: {inner_e}"
                 )
-        print("DEBUG Dashboard: Agrupamento por categoria concluído.")
     except Exception as e:
         print(f"ERRO durante o processamento de contas: {e}")
         flash("Erro ao processar suas contas.", "error")
         contas = []  # Garantir que a variável contas existe, mesmo que esteja vazia.
 
-    print(f"DEBUG: total_por_categoria: {total_por_categoria}")
-    print(f"DEBUG: contas_por_categoria: {contas_por_categoria}")
-
     total_geral = decimal.Decimal("0.00")
     if contas:
         try:
@@ -408,10 +493,83 @@ def dashboard():
                         )
         except Exception as e_sum:
             print(f"Erro ao calcular total_geral dashboard: {e_sum}")
-    print(f"DEBUG Dashboard: Total geral calculado: {total_geral}")
+    return total_geral, total_por_categoria, contas_por_categoria
+
+
+# ======================================================================
+#               INÍCIO DAS ROTAS PRINCIPAIS E LANDING PAGE
+# ======================================================================
+
+# --- ROTA RAIZ '/' - LANDING PAGE ---
+# Esta rota será a primeira página que um usuário vê.
+# Se ele não estiver logado, mostra a página de apresentação ('landing_page.html').
+# Se ele JÁ estiver logado, redireciona automaticamente para o dashboard principal.
+@rotas.route("/")
+def landing_page():
+    """Exibe a landing page para usuários não logados
+    ou redireciona usuários logados para o dashboard.
+    """
+    # Verifica se o usuário atual (gerenciado pelo Flask-Login) está autenticado.
+    if current_user.is_authenticated:
+        # Se sim, redireciona para a função 'dashboard' (que responde pela rota '/dashboard').
+        print("DEBUG: Usuário logado acessou '/', redirecionando para /dashboard.")
+        return redirect(url_for("dashboard"))  # Redireciona para a rota do dashboard
+    else:
+        # Se não, renderiza o template da landing page.
+        print("DEBUG: Usuário não logado acessou '/', mostrando landing_page.html.")
+        return render_template("landing_page.html")
+
+
+# --- ROTA '/dashboard' - DASHBOARD PRINCIPAL ---
+# Esta é a página principal da aplicação para usuários LOGADOS.
+# Acessível somente após o login (devido ao @login_required).
+# A função foi renomeada de 'index' para 'dashboard'.
+@rotas.route("/dashboard")
+@login_required
+def dashboard():
+    print("DEBUG: Entrando na rota /dashboard...")
+
+    versao = None
+    try:
+        versao = garantir_parcelas_atualizadas(current_user.id)
+        print("DEBUG: update_parcelas_recorrentes executado com sucesso em /dashboard.")
+    except Exception as update_err:
+        print(f"ERRO durante update_parcelas_recorrentes no /dashboard: {update_err}")
+        flash(
+            "Ocorreu um erro ao atualizar os vencimentos automáticos das contas.", "warning"
+        )
+
+    # Se nada mudou desde a última visita, responde 304 antes de buscar e agrupar as contas
+    etag = etag_dados_usuario(versao) if versao is not None else None
+    if etag:
+        nao_modificada = resposta_nao_modificada(etag)
+        if nao_modificada:
+            return nao_modificada
 
     data_hoje = date.today()
 
+    def renderizar_fragmentos():
+        total_geral, total_por_categoria, contas_por_categoria = agrupar_contas_dashboard(
+            current_user.id
+        )
+        return {
+            "total_geral": formatar_br(total_geral),
+            "categorias": render_template(
+                "fragmentos/dashboard_categorias.html",
+                total_por_categoria=total_por_categoria,
+                contas_por_categoria=contas_por_categoria,
+                hoje=data_hoje,
+            ),
+        }
+
+    # Tabelas por categoria já renderizadas para esta versão dos dados (e dia) são reaproveitadas
+    if versao is not None:
+        fragmentos = fragment_cache.obter().get_or_render(
+            ("dashboard", current_user.id, data_hoje.isoformat(), versao), renderizar_fragmentos
+        )
+    else:
+        fragmentos = renderizar_fragmentos()
+
     try:
         cartoes = [
             tp
@@ -448,18 +606,15 @@ def dashboard():
 
     print("DEBUG: Tentando renderizar index.html a partir de /dashboard...")
     try:
-        return render_template(
+        html = render_template(
             "index.html",
-            contas=contas,
-            total_geral=total_geral,
-            total_por_categoria=total_por_categoria,
-            contas_por_categoria=contas_por_categoria,
-            hoje=data_hoje,
+            fragmentos=fragmentos,
             cartoes=cartoes,
             contas_bancarias=contas_bancarias,
             total_cartao=total_cartao,
             total_conta_bancaria=total_conta_bancaria,
         )
+        return resposta_com_etag(html, etag) if etag else html
     except Exception as e:
         print(f"ERRO FATAL ao renderizar index.html a partir de /dashboard: {e}")
         import traceback
@@ -474,7 +629,7 @@ def dashboard():
 
 
 # --- Rotas de Gerenciamento de Categorias --- (Sem alterações lógicas necessárias)
-@app.route("/categorias")
+@rotas.route("/categorias")
 @login_required
 def listar_categorias():
     try:
@@ -486,7 +641,7 @@ def listar_categorias():
         return redirect(url_for("dashboard"))  # REDIRECIONA PARA O DASHBOARD
 
 
-@app.route("/categorias/add", methods=["GET", "POST"])
+@rotas.route("/categorias/add", methods=["GET", "POST"])
 @login_required
 def add_categoria():
     form = CategoriaForm()
@@ -504,7 +659,7 @@ def add_categoria():
     return render_template("add_categoria.html", form=form, title="Adicionar Categoria")
 
 
-@app.route("/categorias/edit/<int:id>", methods=["GET", "POST"])
+@rotas.route("/categorias/edit/<int:id>", methods=["GET", "POST"])
 @login_required
 def edit_categoria(id):
     categoria = get_categoria_by_id(id, current_user.id)
@@ -530,7 +685,7 @@ def edit_categoria(id):
         "add_categoria.html", form=form, title="Editar Categoria", categoria=categoria
     )
 
-@app.route("/categorias/delete/<int:id>", methods=["POST"])
+@rotas.route("/categorias/delete/<int:id>", methods=["POST"])
 @login_required
 def delete_categoria_route(id):  # Renomeei para evitar conflito com a função do banco
     categoria = get_categoria_by_id(id, current_user.id)
@@ -565,7 +720,7 @@ def _populate_conta_form_choices(form):
         form.tipo_pagamento.choices = [(0, "-- Erro --")]
 
 
-@app.route("/add", methods=["GET", "POST"])
+@rotas.route("/add", methods=["GET", "POST"])
 @login_required
 def add_conta():
     form = ContaForm()
@@ -598,25 +753,22 @@ def add_conta():
             flash("Parcela atual > total.", "error")
             return render_template("add_conta.html", form=form, title="Adicionar Conta")
 
-        conn = get_db()
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO contas (nome, valor, valor_total_compra, vencimento, categoria_id, parcela_atual, total_parcelas, user_id, recorrente, tipo_pagamento_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    form.nome.data.strip(),
-                    float(val_dec),
-                    float(val_total_compra_dec),
-                    venc_date.isoformat(),
-                    cat_id,
-                    parc_atual,
-                    total_parc,
-                    current_user.id,
-                    int(form.recorrente.data),
-                    tp_id,
-                ),
-            )
-            conn.commit()
+        # Parcelada: create_conta grava o cronograma (1ª e última parcela) uma vez só
+        conta_id = create_conta(
+            form.nome.data.strip(),
+            float(val_dec),
+            venc_date,
+            cat_id,
+            parc_atual,
+            total_parc,
+            current_user.id,
+            int(form.recorrente.data),
+            tp_id,
+            float(val_total_compra_dec),
+        )
+        if conta_id is None:
+            flash("Erro ao adicionar conta.", "error")
+        else:
             if tp_id:
                 tp = get_tipo_pagamento_by_id(tp_id)
                 if tp:
@@ -625,17 +777,15 @@ def add_conta():
                         val_total_compra_dec,
                         adicionar=False,
                         total_parcelas=total_parc,
+                        motivo=MOTIVO_CONTA_ADICIONADA,
+                        conta_id=conta_id,
                     )  # Usa o valor TOTAL para atualizar o limite
             flash("Conta adicionada!", "success")
             return redirect(url_for("dashboard"))
-        except Exception as e:
-            conn.rollback()
-            flash(f"Erro: {e}", "error")
-            print(f"ERRO INSERT CONTA: {e}")
     return render_template("add_conta.html", form=form, title="Adicionar Conta")
 
 
-@app.route("/edit/<int:id>", methods=["GET", "POST"])
+@rotas.route("/edit/<int:id>", methods=["GET", "POST"])
 @login_required
 def edit_conta(id):
     conta = get_conta_by_id(id, current_user.id)
@@ -697,7 +847,8 @@ def edit_conta(id):
                 tp_antigo = get_tipo_pagamento_by_id(tp_id_orig)
                 if tp_antigo:
                     atualizar_limite_saldo(
-                        tp_antigo, val_total_orig, adicionar=True, total_parcelas=tot_parc_orig
+                        tp_antigo, val_total_orig, adicionar=True, total_parcelas=tot_parc_orig,
+                        motivo=MOTIVO_CONTA_ESTORNO, conta_id=conta.id,
                     )
                     reverted_step1 = True
             # Passo 2: Atualiza objeto
@@ -724,7 +875,9 @@ def edit_conta(id):
                             tp_novo,
                             val_novo_tot_dec,
                             adicionar=False,
-                                                                          total_parcelas=conta.total_parcelas,
+                            total_parcelas=conta.total_parcelas,
+                            motivo=MOTIVO_CONTA_EDITADA,
+                            conta_id=conta.id,
                         )  # Usar o valor TOTAL
                 flash("Conta atualizada!", "success")
                 return redirect(url_for("dashboard"))  # REDIRECIONA PARA O DASHBOARD
@@ -738,6 +891,8 @@ def edit_conta(id):
                             val_total_orig,
                             adicionar=False,
                             total_parcelas=tot_parc_orig,
+                            motivo=MOTIVO_ESTORNO_DESFEITO,
+                            conta_id=conta.id,
                         )  # usa valor total
         except Exception as e:  # Erro geral ou de validação
             flash(f"Erro: {e}", "error")
@@ -750,11 +905,13 @@ def edit_conta(id):
                         val_total_orig,
                         adicionar=False,
                         total_parcelas=tot_parc_orig,
+                        motivo=MOTIVO_ESTORNO_DESFEITO,
+                        conta_id=conta.id,
                     )  # usa valor total
     return render_template("edit_conta.html", form=form, conta=conta, title="Editar Conta")
 
 
-@app.route("/delete/<int:id>", methods=["POST"])
+@rotas.route("/delete/<int:id>", methods=["POST"])
 @login_required
 def delete_conta(id):
     conta = get_conta_by_id(id, current_user.id)
@@ -766,13 +923,8 @@ def delete_conta(id):
     val_total_conta = conta.valor_total_compra  # valor total
     tp_id_conta = conta.tipo_pagamento_id
     tot_parc_conta = conta.total_parcelas
-    conn = get_db()
-    cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM contas WHERE id = ? AND user_id = ?", (id, current_user.id))
-        deleted_rows = cursor.rowcount
-        conn.commit()
-        if deleted_rows > 0:
+        if excluir_conta(id, current_user.id):
             if tp_id_conta:
                 tp = get_tipo_pagamento_by_id(tp_id_conta)
                 if tp:
@@ -781,20 +933,22 @@ def delete_conta(id):
                         val_total_conta,
                         adicionar=True,
                         total_parcelas=tot_parc_conta,
+                        motivo=MOTIVO_CONTA_EXCLUIDA,
+                        conta_id=id,
                     )  # DEVOLVER O VALOR TOTAL!
             flash("Conta excluída!", "success")
         else:
             flash("Conta não encontrada.", "warning")
     except Exception as e:
-        conn.rollback()
         flash(f"Erro: {e}", "error")
         print(f"ERRO DELETE CONTA: {e}")
     return redirect(url_for("dashboard"))  # REDIRECIONA PARA O DASHBOARD
 
 
 # --- Rota view para visualizar detalhes de uma conta ---
-@app.route("/detalhes_financeiros")
+@rotas.route("/detalhes_financeiros")
 @login_required
+@somente_leitura(replica=False)
 def detalhes_financeiros():
     """Exibe detalhes individuais de cartões e contas bancárias."""
     try:
@@ -858,8 +1012,9 @@ def detalhes_financeiros():
 
 
 # --- Rotas de Relatórios --- (Sem alterações lógicas necessárias, exceto link Voltar)
-@app.route("/relatorio/selecionar", methods=["GET"])
+@rotas.route("/relatorio/selecionar", methods=["GET"])
 @login_required
+@somente_leitura(replica=False)
 def selecionar_relatorio():
     now = datetime.now()
     ano_atual = now.year
@@ -881,8 +1036,9 @@ def selecionar_relatorio():
         mes_atual=mes_atual,
     )
 
-@app.route("/relatorio/visualizar", methods=["GET"])
+@rotas.route("/relatorio/visualizar", methods=["GET"])
 @login_required
+@somente_leitura
 def visualizar_relatorio_mensal():
     try:
         mes = int(request.args.get("mes"))
@@ -901,8 +1057,14 @@ def visualizar_relatorio_mensal():
         flash("Mês ou Ano inválidos.", "error")
         return redirect(url_for("selecionar_relatorio"))
 
+    # O ETag considera a versão dos dados e os filtros; se o navegador já tem esta página, 304
+    versao = get_data_version(current_user.id)
+    etag = etag_dados_usuario(versao, ano, mes, sorted(cat_ids))
+    nao_modificada = resposta_nao_modificada(etag)
+    if nao_modificada:
+        return nao_modificada
+
     mes_str = f"{mes:02d}"
-    ano_str = str(ano)
     sel_cat_names = []
     try:  # Busca nomes das categorias selecionadas
         if cat_ids:
@@ -912,21 +1074,39 @@ def visualizar_relatorio_mensal():
         print(f"Erro nomes cats: {e}")
         flash("Erro filtro cats.", "warning")
 
-    conn = get_db()
-    cursor = conn.cursor()
-    query = "SELECT c.*, cat.nome as categoria_nome FROM contas c LEFT JOIN categorias cat ON c.categoria_id = cat.id WHERE c.user_id = ? AND strftime('%Y', c.vencimento) = ? AND strftime('%m', c.vencimento) = ?"
-    params = [current_user.id, ano_str, mes_str]
-    if cat_ids:
-        placeholders = ", ".join("?" * len(cat_ids))
-        query += f" AND c.categoria_id IN ({placeholders})";
-        params.extend(cat_ids)
-    query += " ORDER BY c.vencimento"
+    def renderizar_fragmentos():
+        conn = get_db()
+        cursor = conn.cursor()
+        # Intervalo [dia 1 do mês, dia 1 do mês seguinte): usa os índices (user_id, vencimento) e
+        # (user_id, ultimo_vencimento), o que strftime(c.vencimento) não permitiria
+        ano_fim, mes_fim = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        inicio_mes, fim_mes = f"{ano:04d}-{mes_str}-01", f"{ano_fim:04d}-{mes_fim:02d}-01"
+        filtro_cat = ""
+        if cat_ids:
+            filtro_cat = f" AND c.categoria_id IN ({', '.join('?' * len(cat_ids))})"
+        base = "SELECT c.*, cat.nome as categoria_nome FROM contas c LEFT JOIN categorias cat ON c.categoria_id = cat.id WHERE c.user_id = ?"
+
+        # Não parceladas com vencimento no mês
+        cursor.execute(
+            base + " AND c.vencimento >= ? AND c.vencimento < ? AND c.primeiro_vencimento IS NULL" + filtro_cat,
+            [current_user.id, inicio_mes, fim_mes, *cat_ids],
+        )
+        linhas = [dict(row) for row in cursor.fetchall()]
+        # Parceladas com alguma parcela no mês (pelo cronograma): a parcela e o vencimento são os do mês
+        cursor.execute(
+            base + " AND c.ultimo_vencimento >= ? AND c.primeiro_vencimento < ?" + filtro_cat,
+            [current_user.id, inicio_mes, fim_mes, *cat_ids],
+        )
+        for row in cursor.fetchall():
+            parcela = parcelas.parcela_no_mes(date.fromisoformat(row["primeiro_vencimento"]), row["total_parcelas"], ano, mes)
+            if parcela:
+                linha = dict(row)
+                linha["parcela_atual"], linha["vencimento"] = parcela[0], parcela[1].isoformat()
+                linhas.append(linha)
+        linhas.sort(key=lambda l: (l["vencimento"], l["id"]))
 
-    try:
-        cursor.execute(query, params)
-        contas_raw = cursor.fetchall()
         contas_mes = []
-        for row in contas_raw:
+        for row in linhas:
             try:
                 c_obj = Conta(
                     id=row["id"],
@@ -961,21 +1141,36 @@ def visualizar_relatorio_mensal():
             except:
                 print(f"Aviso: Ignorando valor '{c.valor}' total cat relat.")
 
+        return {
+            "tabelas": render_template(
+                "fragmentos/relatorio_tabelas.html",
+                contas_mes=contas_mes,
+                total_mes=total_mes,
+                total_por_categoria_mes=total_por_cat,
+            )
+        }
+
+    try:
+        # Mesma versão dos dados e mesmos filtros: reaproveita as tabelas já renderizadas (sem consultar o banco)
+        fragmentos = fragment_cache.obter().get_or_render(
+            ("relatorio", current_user.id, ano, mes, tuple(sorted(cat_ids)), versao),
+            renderizar_fragmentos,
+        )
+
         try:
             nome_mes = calendar.month_name[mes].capitalize()
         except IndexError:
             nome_mes = f"Mês {mes}"
 
-        return render_template(
+        html = render_template(
             "visualizar_relatorio_mensal.html",
-            contas_mes=contas_mes,
-            total_mes=total_mes,
-            total_por_categoria_mes=total_por_cat,
+            fragmentos=fragmentos,
             mes=mes,
             ano=ano,
             nome_mes=nome_mes,
             selected_categories_display=sel_cat_names,
         )
+        return resposta_com_etag(html, etag)
     except sqlite3.Error as sql_e:
         flash(f"Erro DB: {sql_e}", "error")
         print(f"ERRO SQL relat: {sql_e}")
@@ -989,8 +1184,65 @@ def visualizar_relatorio_mensal():
         return redirect(url_for("selecionar_relatorio"))
 
 
+# --- Rota de Previsão de Fluxo de Caixa ---
+@rotas.route("/previsao", methods=["GET"])
+@login_required
+@somente_leitura(replica=False)  # Roda o rollover antes de projetar
+def previsao_fluxo_caixa():
+    """Projeta, mês a mês, as saídas (recorrentes, parcelas restantes e avulsas) e o saldo das
+    contas bancárias para os próximos `meses` (parâmetro da URL; padrão PREVISAO_MESES)."""
+    try:
+        meses = int(request.args.get("meses", current_app.config["PREVISAO_MESES"]))
+    except (TypeError, ValueError):
+        meses = current_app.config["PREVISAO_MESES"]
+    meses = max(1, min(meses, previsao.MESES_MAXIMO))
+
+    # As recorrentes vencidas precisam estar no vencimento atual antes de projetar
+    versao = garantir_parcelas_atualizadas(current_user.id)
+    etag = etag_dados_usuario(versao, "previsao", meses)
+    nao_modificada = resposta_nao_modificada(etag)
+    if nao_modificada:
+        return nao_modificada
+
+    data_hoje = date.today()
+
+    def renderizar_fragmentos():
+        contas_bancarias = [
+            tp
+            for tp in get_tipos_pagamento_by_user(current_user.id)
+            if isinstance(tp, ContaBancaria)
+        ]
+        saldo_atual = sum(
+            (decimal.Decimal(str(c.saldo)) for c in contas_bancarias if c.saldo is not None),
+            decimal.Decimal("0.00"),
+        )
+        projecao = previsao.projetar(
+            get_contas_para_previsao(current_user.id), saldo_atual, data_hoje, meses
+        )
+        return {
+            "tabela": render_template(
+                "fragmentos/previsao_tabela.html",
+                projecao=projecao,
+                saldo_atual=saldo_atual,
+                total_saidas=sum((m["saidas"] for m in projecao), decimal.Decimal("0.00")),
+            )
+        }
+
+    # Uma projeção por usuário, dia, horizonte e versão dos dados: qualquer escrita gera uma nova
+    fragmentos = fragment_cache.obter().get_or_render(
+        ("previsao", current_user.id, data_hoje.isoformat(), meses, versao), renderizar_fragmentos
+    )
+    html = render_template(
+        "previsao.html",
+        fragmentos=fragmentos,
+        meses=meses,
+        opcoes_meses=(3, 6, 12, 24, 36),
+    )
+    return resposta_com_etag(html, etag)
+
+
 # --- Rotas de Gerenciamento de Cartões --- (Sem alterações lógicas necessárias, exceto redirecionamentos)
-@app.route("/cartoes")
+@rotas.route("/cartoes")
 @login_required
 def listar_cartoes():
     try:
@@ -1006,7 +1258,7 @@ def listar_cartoes():
         return redirect(url_for("dashboard"))  # REDIRECIONA PARA O DASHBOARD
 
 
-@app.route("/cartoes/add", methods=["GET", "POST"])
+@rotas.route("/cartoes/add", methods=["GET", "POST"])
 @login_required
 def add_cartao():
     form = CartaoForm()
@@ -1022,6 +1274,8 @@ def add_cartao():
                 limite=lim_dec,
                 limite_disponivel=lim_dec,
                 user_id=current_user.id,
+                dia_fechamento=form.dia_fechamento.data,
+                dia_vencimento=form.dia_vencimento.data,
             )
             flash("Cartão adicionado!", "success")
             return redirect(url_for("listar_cartoes"))
@@ -1031,7 +1285,7 @@ def add_cartao():
     return render_template("add_cartao.html", form=form, title="Adicionar Cartão")
 
 
-@app.route("/cartoes/edit/<int:id>", methods=["GET", "POST"])
+@rotas.route("/cartoes/edit/<int:id>", methods=["GET", "POST"])
 @login_required
 def edit_cartao(id):
     cartao = get_tipo_pagamento_by_id(id)
@@ -1054,6 +1308,8 @@ def edit_cartao(id):
             cartao.nome = form.nome.data.strip()
             cartao.limite = lim_novo
             cartao.limite_disponivel += dif
+            cartao.dia_fechamento = form.dia_fechamento.data
+            cartao.dia_vencimento = form.dia_vencimento.data
             if update_tipo_pagamento(cartao):
                 flash("Cartão atualizado!", "success")
                 return redirect(url_for("listar_cartoes"))
@@ -1065,7 +1321,7 @@ def edit_cartao(id):
     return render_template("edit_cartao.html", form=form, cartao=cartao, title="Editar Cartão")
 
 
-@app.route("/cartoes/delete/<int:id>", methods=["POST"])
+@rotas.route("/cartoes/delete/<int:id>", methods=["POST"])
 @login_required
 def delete_cartao(id):
     cartao = get_tipo_pagamento_by_id(id)
@@ -1079,8 +1335,79 @@ def delete_cartao(id):
     return redirect(url_for("listar_cartoes"))
 
 
+@rotas.route("/cartoes/<int:id>/faturas", methods=["GET"])
+@login_required
+@somente_leitura(replica=False)  # Roda o rollover antes de montar os ciclos
+def faturas_cartao(id):
+    """Faturas do cartão (fechadas, aberta e futuras) com o total de cada uma, e os lançamentos
+    da fatura escolhida em ?ciclo=AAAA-MM (padrão: a fatura aberta)."""
+    cartao = get_tipo_pagamento_by_id(id)
+    if not cartao or not isinstance(cartao, Cartao) or cartao.user_id != current_user.id:
+        flash("Cartão não encontrado.", "error")
+        return redirect(url_for("listar_cartoes"))
+    if not cartao.tem_ciclo_fatura:
+        flash("Informe os dias de fechamento e de vencimento da fatura para ver as faturas.", "warning")
+        return redirect(url_for("edit_cartao", id=id))
+
+    data_hoje = date.today()
+    aberta = faturas.ciclo_de(data_hoje, cartao.dia_fechamento)
+    try:
+        selecionado = datetime.strptime(request.args.get("ciclo", ""), "%Y-%m").date()
+    except ValueError:
+        selecionado = aberta
+
+    # As recorrentes entram a partir do vencimento atual: o rollover precisa ter rodado
+    versao = garantir_parcelas_atualizadas(current_user.id)
+    etag = etag_dados_usuario(versao, "faturas", id, selecionado.isoformat())
+    nao_modificada = resposta_nao_modificada(etag)
+    if nao_modificada:
+        return nao_modificada
+
+    # Um único intervalo de datas cobre todos os ciclos exibidos; os totais por ciclo vêm do banco
+    inicio, _ = faturas.periodo(aberta - relativedelta(months=faturas.FATURAS_ANTERIORES), cartao.dia_fechamento)
+    _, fim = faturas.periodo(aberta + relativedelta(months=faturas.FATURAS_FUTURAS), cartao.dia_fechamento)
+    lista_faturas = faturas.montar_faturas(
+        cartao, get_totais_faturas(cartao, current_user.id, inicio, fim), data_hoje
+    )
+    inicio_sel, fim_sel = faturas.periodo(selecionado, cartao.dia_fechamento)
+    lancamentos = get_lancamentos_fatura(cartao, current_user.id, inicio_sel, fim_sel)
+
+    html = render_template(
+        "faturas_cartao.html",
+        cartao=cartao,
+        faturas=lista_faturas,
+        selecionado=selecionado,
+        periodo_selecionado=(inicio_sel, fim_sel - timedelta(days=1)),
+        vencimento_selecionado=faturas.vencimento(selecionado, cartao.dia_fechamento, cartao.dia_vencimento),
+        lancamentos=lancamentos,
+        total_selecionado=sum((decimal.Decimal(str(l["valor"])) for l in lancamentos if l["valor"] is not None),
+                              decimal.Decimal("0.00")),
+    )
+    return resposta_com_etag(html, etag)
+
+
+@rotas.route("/tipos_pagamento/<int:id>/movimentacoes")
+@login_required
+@somente_leitura(replica=False)
+def movimentacoes_tipo_pagamento(id):
+    """Livro-razão do cartão (limite disponível) ou da conta bancária (saldo): últimas movimentações
+    e a conferência do valor gravado com o calculado pelas movimentações."""
+    tipo_pagamento = get_tipo_pagamento_by_id(id)
+    if not tipo_pagamento or tipo_pagamento.user_id != current_user.id:
+        flash("Tipo de pagamento não encontrado.", "error")
+        return redirect(url_for("dashboard"))
+    voltar = "listar_cartoes" if isinstance(tipo_pagamento, Cartao) else "listar_contas_bancarias"
+    return render_template(
+        "movimentacoes.html",
+        tipo_pagamento=tipo_pagamento,
+        eh_cartao=isinstance(tipo_pagamento, Cartao),
+        conferencia=conferir_saldo(id, current_user.id),
+        movimentacoes=get_movimentacoes(id, current_user.id),
+        voltar=voltar,
+    )
+
 # --- Rotas de Gerenciamento de Contas Bancárias --- (Sem alterações lógicas necessárias, exceto redirecionamentos)
-@app.route("/contas_bancarias")
+@rotas.route("/contas_bancarias")
 @login_required
 def listar_contas_bancarias():
     try:
@@ -1096,7 +1423,7 @@ def listar_contas_bancarias():
         return redirect(url_for("dashboard"))  # REDIRECIONA PARA O DASHBOARD
 
 
-@app.route("/contas_bancarias/add", methods=["GET", "POST"])
+@rotas.route("/contas_bancarias/add", methods=["GET", "POST"])
 @login_required
 def add_conta_bancaria():
     form = ContaBancariaForm()
@@ -1121,7 +1448,7 @@ def add_conta_bancaria():
     )
 
 
-@app.route("/contas_bancarias/edit/<int:id>", methods=["GET", "POST"])
+@rotas.route("/contas_bancarias/edit/<int:id>", methods=["GET", "POST"])
 @login_required
 def edit_conta_bancaria(id):
     conta_b = get_tipo_pagamento_by_id(id)
@@ -1157,7 +1484,7 @@ def edit_conta_bancaria(id):
     )
 
 
-@app.route("/contas_bancarias/delete/<int:id>", methods=["POST"])
+@rotas.route("/contas_bancarias/delete/<int:id>", methods=["POST"])
 @login_required
 def delete_conta_bancaria(id):
     conta_b = get_tipo_pagamento_by_id(id)
@@ -1172,14 +1499,30 @@ def delete_conta_bancaria(id):
 
 
 # --- Rotas de Autenticação --- (Ajustar redirecionamentos)
-@app.route("/login", methods=["GET", "POST"])
+def resposta_senhas_ocupadas(template, **contexto):
+    """503 com Retry-After quando o pool de hash de senhas está cheio (ver senhas.py)."""
+    flash("Muitos acessos ao mesmo tempo. Tente novamente em instantes.", "warning")
+    return render_template(template, **contexto), 503, {"Retry-After": "2"}
+
+
+@rotas.route("/login", methods=["GET", "POST"])
 def login():
     if current_user.is_authenticated:
         return redirect(url_for("dashboard"))  # REDIRECIONA PARA O DASHBOARD
     form = LoginForm()
     if form.validate_on_submit():
         user = get_user_by_username(form.username.data)
-        if user and user.check_password(form.password.data):
+        try:
+            senha_ok = user is not None and senhas.verificar(user.password_hash, form.password.data)
+        except senhas.FilaCheia:
+            return resposta_senhas_ocupadas("login.html", form=form)
+        if senha_ok:
+            # Hash com parâmetros antigos: refaz agora, enquanto temos a senha em texto
+            if senhas.precisa_rehash(user.password_hash):
+                try:
+                    update_user_password(user.id, senhas.gerar_hash(form.password.data))
+                except senhas.FilaCheia:
+                    pass  # Fica para o próximo login
             login_user(user)
             flash("Login realizado com sucesso!", "success")
             print("DEBUG: Redirecionando para o dashboard após login.")
@@ -1189,7 +1532,7 @@ def login():
     return render_template("login.html", form=form)
 
 
-@app.route("/logout")
+@rotas.route("/logout")
 @login_required
 def logout():
     logout_user()
@@ -1197,7 +1540,7 @@ def logout():
     return redirect(url_for("login"))  # Após logout, vai para login
 
 
-@app.route("/register", methods=["GET", "POST"])
+@rotas.route("/register", methods=["GET", "POST"])
 def register():
     if current_user.is_authenticated:
         return redirect(url_for("dashboard"))  # REDIRECIONA PARA O DASHBOARD
@@ -1206,7 +1549,10 @@ def register():
         if get_user_by_username(form.username.data):
             flash("Nome de usuário já em uso.", "warning")
         else:
-            hashed_pw = generate_password_hash(form.password.data)
+            try:
+                hashed_pw = senhas.gerar_hash(form.password.data)
+            except senhas.FilaCheia:
+                return resposta_senhas_ocupadas("register.html", form=form)
             if create_user(form.username.data, hashed_pw):
                 flash("Conta criada com sucesso! Faça login.", "success")
                 return redirect(url_for("login"))
@@ -1215,7 +1561,7 @@ def register():
     return render_template("register.html", form=form)
 
 
-@app.route("/reset_password", methods=["GET", "POST"])
+@rotas.route("/reset_password", methods=["GET", "POST"])
 @login_required
 def reset_password():
     form = ResetPasswordForm()
@@ -1225,27 +1571,116 @@ def reset_password():
         user = get_user_by_username(current_user.username)  # Pega o usuário logado
         if user:
             # Idealmente, verificar a senha ATUAL aqui antes de permitir a mudança
-            new_hashed_pw = generate_password_hash(form.new_password.data)
-            conn = get_db()
-            cursor = conn.cursor()
             try:
-                cursor.execute("UPDATE users SET password = ? WHERE id = ?", (new_hashed_pw, user.id))
-                conn.commit()
+                new_hashed_pw = senhas.gerar_hash(form.new_password.data)
+            except senhas.FilaCheia:
+                return resposta_senhas_ocupadas(
+                    "reset_password.html", form=form, current_username=current_user.username
+                )
+            if update_user_password(user.id, new_hashed_pw):
                 flash("Senha alterada com sucesso!", "success")
                 return redirect(url_for("dashboard"))  # !! ALTERADO: Redireciona para 'dashboard' !!
-            except Exception as e:
-                conn.rollback()
-                flash(f"Erro ao alterar senha: {e}", "error")
-                print(f"ERRO reset_password DB: {e}")
+            flash("Erro ao alterar senha.", "error")
         else:
             flash("Usuário não encontrado.", "error")
     # Passa o username atual para o template (pode ser usado no título ou texto)
     return render_template("reset_password.html", form=form, current_username=current_user.username)
 
 
+# --- Fábrica da Aplicação ---
+def configuracao_padrao():
+    """Configuração padrão do app, lida de variáveis de ambiente."""
+    return {
+        "SECRET_KEY": os.environ.get("FLASK_SECRET_KEY", "dev_fallback_secret_key_123!@#"),
+        "DATABASE": os.environ.get("DATABASE", "contas.db"),
+        # Arquivos de dados por usuário (0 = tudo em DATABASE; ver "Shards por Usuário" em database.py)
+        "DATABASE_SHARDS": int(os.environ.get("DATABASE_SHARDS", 0)),
+        # Backend das funções de database.py: 'sqlite3' (padrão) ou 'sqlalchemy' (ver database_sqlalchemy.py)
+        "DATABASE_BACKEND": os.environ.get("DATABASE_BACKEND", "sqlite3"),
+        "DATABASE_URL": os.environ.get("DATABASE_URL"),
+        "DATABASE_POOL_TAMANHO": int(os.environ.get("DATABASE_POOL_TAMANHO", 5)),
+        "DATABASE_POOL_EXTRA": int(os.environ.get("DATABASE_POOL_EXTRA", 10)),
+        "DATABASE_POOL_TIMEOUT": float(os.environ.get("DATABASE_POOL_TIMEOUT", 30)),
+        "DATABASE_CACHE_COMANDOS": int(os.environ.get("DATABASE_CACHE_COMANDOS", 500)),
+        # Aplica as migrações pendentes ao criar o app. Sob o gunicorn fica desligado:
+        # as migrações rodam uma única vez no processo master (gunicorn.conf.py), antes do fork.
+        "APLICAR_MIGRACOES": True,
+        # Perfil de requisições (ver profiling.py)
+        "PROFILING_ATIVO": os.environ.get("PROFILING_ATIVO") == "1",
+        "PROFILING_TOKEN": os.environ.get("PROFILING_TOKEN"),
+        "PROFILING_AMOSTRAGEM": float(os.environ.get("PROFILING_AMOSTRAGEM", 0)),
+        "PROFILING_DIR": os.environ.get("PROFILING_DIR", "perfis"),
+        # Token exigido em /metrics (ver metrics.py); sem ele a rota fica aberta
+        "METRICAS_TOKEN": os.environ.get("METRICAS_TOKEN"),
+        # Rastreador de SQL (ver sql_tracer.py)
+        "SQL_TRACE_ATIVO": os.environ.get("SQL_TRACE_ATIVO") == "1",
+        "SQL_TRACE_LENTO_MS": float(os.environ.get("SQL_TRACE_LENTO_MS", 100)),
+        "SQL_TRACE_N1_MINIMO": int(os.environ.get("SQL_TRACE_N1_MINIMO", 5)),
+        "SQL_TRACE_LOG": os.environ.get("SQL_TRACE_LOG", "sql_trace.log"),
+        # Hash de senhas (ver senhas.py)
+        "SENHA_METODO": os.environ.get("SENHA_METODO", senhas.METODO_PADRAO),
+        "SENHA_PROCESSOS": int(os.environ.get("SENHA_PROCESSOS", 2)),
+        "SENHA_FILA_MAXIMA": int(os.environ.get("SENHA_FILA_MAXIMA", 16)),
+        "SENHA_TIMEOUT": float(os.environ.get("SENHA_TIMEOUT", 30)),
+        # Horizonte padrão da previsão de fluxo de caixa, em meses (ver previsao.py)
+        "PREVISAO_MESES": int(os.environ.get("PREVISAO_MESES", previsao.MESES_PADRAO)),
+        # Escritor único, com escritas agrupadas em transações (ver escritor.py)
+        "ESCRITOR_ATIVO": os.environ.get("ESCRITOR_ATIVO") == "1",
+        "ESCRITOR_LOTE": int(os.environ.get("ESCRITOR_LOTE", escritor.LOTE_PADRAO)),
+        "ESCRITOR_TIMEOUT": float(os.environ.get("ESCRITOR_TIMEOUT", escritor.TIMEOUT_PADRAO)),
+        # Réplica de leitura para as views somente leitura (ver leitura.py)
+        "LEITURA_REPLICA": os.environ.get("LEITURA_REPLICA") == "1",
+        "LEITURA_REPLICA_INTERVALO": float(os.environ.get("LEITURA_REPLICA_INTERVALO", leitura.INTERVALO_PADRAO)),
+    }
+
+
+def create_app(config=None):
+    """Cria e configura uma instância do app Flask.
+
+    Args:
+        config (dict, optional): Valores que sobrescrevem configuracao_padrao()
+            (ex: {"DATABASE": "/caminho/contas.db", "APLICAR_MIGRACOES": False}).
+
+    Returns:
+        Flask: O app pronto para ser servido (waitress, gunicorn, flask run).
+    """
+    app = Flask(__name__)
+    app.config.update(configuracao_padrao())
+    if config:
+        app.config.update(config)
+
+    if app.config["APLICAR_MIGRACOES"]:
+        # Se o banco já está na versão atual, é só uma leitura de 'PRAGMA user_version'.
+        versao = apply_migrations_all(app.config["DATABASE"], app.config["DATABASE_SHARDS"])
+        print(f"Schema do banco de dados na versão {versao}.")
+
+    if app.config["DATABASE_BACKEND"] == "sqlalchemy":
+        # Importado só quando escolhido: o backend padrão não carrega o SQLAlchemy
+        import database_sqlalchemy
+
+        database_sqlalchemy.init_app(app)
+    elif app.config["DATABASE_BACKEND"] != "sqlite3":
+        raise ValueError(f"DATABASE_BACKEND inválido: {app.config['DATABASE_BACKEND']!r} (use 'sqlite3' ou 'sqlalchemy').")
+
+    assets.init_app(app)
+    metrics.init_app(app)  # Antes do perfil: a latência medida inclui os demais hooks
+    profiling.init_app(app)
+    sql_tracer.init_app(app)
+    fragment_cache.init_app(app)
+    senhas.init_app(app)
+    escritor.init_app(app)
+    leitura.init_app(app)
+    login_manager.init_app(app)
+    rotas.init_app(app)
+    app.extensions["rollover_verificado"] = FragmentCache(MAX_ROLLOVER_VERIFICADO)
+    app.register_blueprint(api_bp)
+    return app
+
+
 # --- Execução Principal ---
 if __name__ == "__main__":
     print("Iniciando servidor Waitress em http://0.0.0.0:5000")
     # Use Waitress para servir a aplicação em produção ou para testes mais robustos
     # O servidor de desenvolvimento do Flask (app.run()) é ideal apenas para desenvolvimento.
-    serve(app, host="0.0.0.0", port=5000)
+    # Para vários processos (workers), use o gunicorn: ver gunicorn.conf.py
+    serve(create_app(), host="0.0.0.0", port=5000)
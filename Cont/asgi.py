@@ -0,0 +1,181 @@
+"""Ponto de entrada ASGI (servidor assíncrono, ex: uvicorn).
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000      # dentro de Cont/
+
+As conexões HTTP são tratadas pelo loop asyncio do servidor; cada requisição é executada pelo
+app Flask (create_app) em um de dois pools de threads de tamanho fixo, e é ali que acontecem
+todas as chamadas a database.py (SQLite bloqueante):
+
+- RELATORIOS: rotas pesadas (relatório mensal, detalhes financeiros). Poucas threads, para que
+  vários relatórios simultâneos não ocupem todas as threads.
+- GERAL: todo o resto (dashboard, cadastros, API, login...).
+
+Requisições além do número de threads esperam na fila do seu pool sem ocupar thread nenhuma,
+então o número de conexões abertas pode ser bem maior que o de threads. Cada fila tem um limite;
+acima dele a resposta é 503 com Retry-After, em vez de acumular espera sem fim.
+
+Variáveis de ambiente:
+    ASGI_THREADS_GERAL        Threads do pool geral (padrão 8)
+    ASGI_THREADS_RELATORIOS   Threads do pool de relatórios (padrão 2)
+    ASGI_FILA_MAXIMA          Requisições em espera por pool antes de responder 503 (padrão 100)
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+
+# Prefixos de caminho atendidos pelo pool de relatórios
+ROTAS_RELATORIOS = ("/relatorio/visualizar", "/detalhes_financeiros")
+
+
+class PoolLimitado:
+    """Pool de threads com limite de requisições em andamento (executando + esperando)."""
+
+    def __init__(self, nome, threads, fila_maxima):
+        self.nome = nome
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"asgi-{nome}")
+        self.limite = threads + fila_maxima
+        self.em_andamento = 0  # Reservadas + executando. Só é alterado no loop asyncio, não precisa de lock
+
+    def reservar(self):
+        """Ocupa uma vaga do pool; False se ele já está cheio. A vaga fica ocupada até liberar()."""
+        if self.em_andamento >= self.limite:
+            return False
+        self.em_andamento += 1
+        return True
+
+    def liberar(self):
+        self.em_andamento -= 1
+
+    async def executar(self, funcao, *args):
+        """Executa funcao(*args) em uma thread do pool, com a vaga já reservada.
+
+        A vaga é liberada quando a função termina de fato: se a requisição for cancelada antes
+        (ex: o cliente desconectou), a thread continua ocupada e a vaga também.
+        """
+        futuro = asyncio.get_running_loop().run_in_executor(self.executor, funcao, *args)
+        futuro.add_done_callback(lambda _: self.liberar())
+        return await asyncio.shield(futuro)
+
+
+class AdaptadorWSGI:
+    """Aplicação ASGI que executa um app WSGI (Flask) nos pools de threads."""
+
+    def __init__(self, wsgi_app, geral, relatorios):
+        self.wsgi_app = wsgi_app
+        self.geral = geral
+        self.relatorios = relatorios
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        # Outros tipos (ex: websocket) não são suportados: a conexão é simplesmente encerrada
+
+    async def _lifespan(self, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif mensagem["type"] == "lifespan.shutdown":
+                for pool in (self.geral, self.relatorios):
+                    pool.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _escolher_pool(self, caminho):
+        return self.relatorios if caminho.startswith(ROTAS_RELATORIOS) else self.geral
+
+    async def _http(self, scope, receive, send):
+        pool = self._escolher_pool(scope["path"])
+        # A vaga é reservada já aqui, antes de ler o corpo: requisições que ainda estão enviando o
+        # corpo também contam para o limite
+        if not pool.reservar():
+            await self._enviar(send, 503, [(b"retry-after", b"1"), (b"content-type", b"text/plain; charset=utf-8")],
+                               "Servidor ocupado, tente novamente.".encode("utf-8"))
+            return
+
+        executando = False
+        try:
+            corpo = bytearray()
+            while True:
+                mensagem = await receive()
+                if mensagem["type"] == "http.disconnect":
+                    return
+                corpo += mensagem.get("body", b"")
+                if not mensagem.get("more_body", False):
+                    break
+
+            environ = self._montar_environ(scope, bytes(corpo))
+            executando = True  # Daqui em diante a vaga é liberada por pool.executar
+            status, headers, resposta = await pool.executar(self._executar_wsgi, environ)
+        finally:
+            if not executando:
+                pool.liberar()
+        await self._enviar(send, status, headers, resposta)
+
+    @staticmethod
+    async def _enviar(send, status, headers, corpo):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": corpo})
+
+    @staticmethod
+    def _montar_environ(scope, corpo):
+        servidor = scope.get("server") or ("localhost", 80)
+        cliente = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            # WSGI (PEP 3333) espera os bytes do caminho em uma str latin-1
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": servidor[0],
+            "SERVER_PORT": str(servidor[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": cliente[0],
+            "REMOTE_PORT": str(cliente[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(corpo),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for nome, valor in scope.get("headers", []):
+            nome = nome.decode("latin-1").upper().replace("-", "_")
+            valor = valor.decode("latin-1")
+            if nome in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                chave = nome
+            else:
+                chave = f"HTTP_{nome}"
+            environ[chave] = f"{environ[chave]},{valor}" if chave in environ else valor
+        return environ
+
+    def _executar_wsgi(self, environ):
+        """Executa o app WSGI (na thread do pool) e retorna (status, headers, corpo)."""
+        resposta = {}
+
+        def start_response(status, headers, exc_info=None):
+            resposta["status"] = int(status.split(" ", 1)[0])
+            resposta["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+        resultado = self.wsgi_app(environ, start_response)
+        try:
+            corpo = b"".join(resultado)
+        finally:
+            if hasattr(resultado, "close"):
+                resultado.close()
+        return resposta["status"], resposta["headers"], corpo
+
+
+_fila_maxima = int(os.environ.get("ASGI_FILA_MAXIMA", 100))
+app = AdaptadorWSGI(
+    create_app(),
+    geral=PoolLimitado("geral", int(os.environ.get("ASGI_THREADS_GERAL", 8)), _fila_maxima),
+    relatorios=PoolLimitado("relatorios", int(os.environ.get("ASGI_THREADS_RELATORIOS", 2)), _fila_maxima),
+)
@@ -0,0 +1,177 @@
+"""Pipeline de arquivos estáticos.
+
+- Bibliotecas de terceiros (jQuery, Bootstrap, Font Awesome, ...) em versões fixas são baixadas
+  para static/vendor/ e concatenadas em pacotes (bundles) em static/dist/, servidos pelo próprio app.
+- Toda URL gerada por url_for('static', ...) recebe '?v=<hash do conteúdo>'. Como a URL muda
+  quando o arquivo muda, essas respostas podem ser cacheadas pelo navegador por um ano (immutable).
+- Enquanto os pacotes não forem gerados, os templates continuam usando as CDNs originais.
+
+Para gerar/atualizar os pacotes (ex: no deploy):
+    python assets.py
+"""
+import hashlib
+import os
+import re
+import sys
+import urllib.request
+
+from flask import request, url_for
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+VENDOR_DIR = "vendor"  # Relativo a STATIC_DIR
+DIST_DIR = "dist"  # Relativo a STATIC_DIR
+
+CACHE_IMUTAVEL = 365 * 24 * 60 * 60  # Um ano, em segundos
+
+_FA = "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4"
+_FA_WEBFONTS = [
+    f"fa-{familia}.{ext}"
+    for familia in ("brands-400", "regular-400", "solid-900")
+    for ext in ("eot", "svg", "ttf", "woff", "woff2")
+]
+
+# Arquivo em static/vendor/ -> URL de origem (versões fixas)
+VENDOR_FILES = {
+    "jquery-3.6.0.min.js": "https://code.jquery.com/jquery-3.6.0.min.js",
+    "jquery.mask-1.14.16.min.js": "https://cdnjs.cloudflare.com/ajax/libs/jquery.mask/1.14.16/jquery.mask.min.js",
+    # Bootstrap 4.5 depende da API do Popper 1.x
+    "popper-1.16.1.min.js": "https://cdn.jsdelivr.net/npm/popper.js@1.16.1/dist/umd/popper.min.js",
+    "bootstrap-4.5.2.min.css": "https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/css/bootstrap.min.css",
+    "bootstrap-4.5.2.min.js": "https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/js/bootstrap.min.js",
+    "bootstrap-5.3.0.min.css": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css",
+    "bootstrap-5.3.0.bundle.min.js": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js",
+    "animate-4.1.1.min.css": "https://cdnjs.cloudflare.com/ajax/libs/animate.css/4.1.1/animate.min.css",
+    "fontawesome-5.15.4/css/all.min.css": f"{_FA}/css/all.min.css",
+    **{f"fontawesome-5.15.4/webfonts/{nome}": f"{_FA}/webfonts/{nome}" for nome in _FA_WEBFONTS},
+}
+
+# Pacote em static/dist/ -> arquivos de static/vendor/ concatenados, na ordem
+BUNDLES = {
+    "vendor.css": ["bootstrap-4.5.2.min.css"],
+    "icons.css": ["fontawesome-5.15.4/css/all.min.css"],
+    "vendor.js": [
+        "jquery-3.6.0.min.js",
+        "jquery.mask-1.14.16.min.js",
+        "popper-1.16.1.min.js",
+        "bootstrap-4.5.2.min.js",
+    ],
+    "landing-vendor.css": ["bootstrap-5.3.0.min.css", "animate-4.1.1.min.css"],
+    "landing-vendor.js": ["bootstrap-5.3.0.bundle.min.js"],
+}
+
+_URL_CSS = re.compile(r"""url\((['"]?)(?!data:|https?:|//|/)([^'")]+)\1\)""")
+
+# Cache de hashes: caminho absoluto -> (mtime, hash)
+_hashes = {}
+
+
+def fingerprint(filename):
+    """Retorna um hash curto do conteúdo de static/<filename> (None se o arquivo não existe).
+    O hash é recalculado apenas quando a data de modificação do arquivo muda."""
+    caminho = os.path.join(STATIC_DIR, filename)
+    try:
+        mtime = os.stat(caminho).st_mtime
+    except OSError:
+        return None
+    em_cache = _hashes.get(caminho)
+    if em_cache and em_cache[0] == mtime:
+        return em_cache[1]
+    with open(caminho, "rb") as f:
+        digest = hashlib.md5(f.read()).hexdigest()[:12]
+    _hashes[caminho] = (mtime, digest)
+    return digest
+
+
+def asset_urls(bundle):
+    """URLs a incluir na página para um pacote: o arquivo local com hash, se já foi gerado,
+    ou as URLs originais das CDNs (uma por arquivo) como alternativa."""
+    arquivo = f"{DIST_DIR}/{bundle}"
+    if os.path.exists(os.path.join(STATIC_DIR, arquivo)):
+        return [url_for("static", filename=arquivo)]
+    return [VENDOR_FILES[origem] for origem in BUNDLES[bundle]]
+
+
+def init_app(app):
+    """Registra o hash automático nas URLs estáticas, os headers de cache e a função
+    'asset_urls' nos templates."""
+    app.jinja_env.globals["asset_urls"] = asset_urls
+
+    @app.url_defaults
+    def adicionar_hash_estatico(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            versao = fingerprint(values["filename"])
+            if versao:
+                values["v"] = versao
+
+    @app.after_request
+    def cache_estatico_imutavel(response):
+        if request.endpoint != "static" or response.status_code != 200:
+            return response
+        filename = (request.view_args or {}).get("filename")
+        versao = request.args.get("v")
+        # Só é seguro cachear para sempre se a URL aponta para o conteúdo atual do arquivo
+        if filename and versao and versao == fingerprint(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = CACHE_IMUTAVEL
+            response.cache_control.immutable = True
+        return response
+
+
+# --- Geração dos Pacotes ---
+def _reescrever_urls_css(css, origem, destino):
+    """Ajusta url(...) relativos de um CSS movido de 'origem' para 'destino' (caminhos em static/)."""
+    dir_origem = os.path.dirname(origem)
+    dir_destino = os.path.dirname(destino)
+
+    def trocar(m):
+        alvo, sufixo = m.group(2), ""
+        for sep in ("?", "#"):
+            if sep in alvo:
+                alvo, resto = alvo.split(sep, 1)
+                sufixo = sep + resto + sufixo
+        novo = os.path.relpath(os.path.normpath(os.path.join(dir_origem, alvo)), dir_destino)
+        return f"url({m.group(1)}{novo.replace(os.sep, '/')}{sufixo}{m.group(1)})"
+
+    return _URL_CSS.sub(trocar, css)
+
+
+def baixar_vendor(forcar=False):
+    """Baixa para static/vendor/ os arquivos de VENDOR_FILES que ainda não existem."""
+    for nome, url in VENDOR_FILES.items():
+        destino = os.path.join(STATIC_DIR, VENDOR_DIR, nome)
+        if os.path.exists(destino) and not forcar:
+            continue
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        print(f"Baixando {url}")
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            conteudo = resp.read()
+        with open(destino, "wb") as f:
+            f.write(conteudo)
+
+
+def gerar_bundles():
+    """Concatena os arquivos de cada pacote em static/dist/."""
+    os.makedirs(os.path.join(STATIC_DIR, DIST_DIR), exist_ok=True)
+    for bundle, origens in BUNDLES.items():
+        destino = f"{DIST_DIR}/{bundle}"
+        partes = []
+        for origem in origens:
+            caminho = f"{VENDOR_DIR}/{origem}"
+            with open(os.path.join(STATIC_DIR, caminho), encoding="utf-8") as f:
+                conteudo = f.read()
+            if bundle.endswith(".css"):
+                conteudo = _reescrever_urls_css(conteudo, caminho, destino)
+            # Remove comentários de source map: os .map não são baixados
+            conteudo = re.sub(r"^\s*(//|/\*)# sourceMappingURL=.*$", "", conteudo, flags=re.M)
+            partes.append(f"/* {origem} */\n{conteudo.strip()}\n")
+        # ';' entre arquivos JS evita que um arquivo sem ';' final quebre o seguinte
+        separador = ";\n" if bundle.endswith(".js") else "\n"
+        with open(os.path.join(STATIC_DIR, destino), "w", encoding="utf-8") as f:
+            f.write(separador.join(partes))
+        print(f"Gerado static/{destino} (v={fingerprint(destino)})")
+
+
+if __name__ == "__main__":
+    baixar_vendor(forcar="--forcar" in sys.argv)
+    gerar_bundles()
@@ -0,0 +1,257 @@
+"""Benchmark das rotas e funções mais pesadas do app.
+
+Cria um banco SQLite temporário com dados sintéticos (gerar_dados.py), mede cada caso várias
+vezes (pelo cliente de teste do Flask, sem servidor HTTP) e grava p50/p95 em um arquivo JSON
+para comparar execuções (antes/depois de uma mudança).
+
+Uso (dentro de Cont/):
+    python benchmark.py
+    python benchmark.py --usuarios 5 --contas 2000 --repeticoes 50 --saida depois.json --comparar antes.json
+
+Casos medidos:
+    get_contas_by_user                  função de database.py, direto
+    dashboard_frio / dashboard_quente   GET /dashboard sem / com cache de fragmentos e rollover já verificado
+    relatorio_frio / relatorio_quente   GET /relatorio/visualizar (mês com contas), idem
+    update_parcelas_recorrentes         rollover de vencimentos, sempre sobre uma cópia nova do banco
+    add_conta / edit_conta              POST /add e POST /edit/<id>
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import app as app_module
+import database
+from app import create_app
+from gerar_dados import gerar
+
+SENHA = "senha123"
+
+
+# --- Dados Sintéticos ---
+def semear_banco(caminho, args):
+    """Cria o banco de teste com gerar_dados.gerar.
+
+    Os tipos de pagamento são divididos entre cartões e contas bancárias, e uma parte das
+    recorrentes/parcelas fica com vencimento passado, para o rollover ter o que processar.
+    """
+    gerar(
+        caminho,
+        usuarios=args.usuarios,
+        anos=args.anos,
+        contas=args.contas,
+        categorias=args.categorias,
+        cartoes=(args.tipos + 1) // 2,
+        contas_bancarias=args.tipos // 2,
+        seed=args.seed,
+        atrasadas=args.atrasadas,
+        prefixo="bench",
+        senha=SENHA,
+    )
+
+
+# --- Medição ---
+def resumir(tempos_ms):
+    """Estatísticas de uma lista de tempos em milissegundos."""
+    ordenados = sorted(tempos_ms)
+
+    def percentil(p):
+        # Interpolação linear entre os vizinhos (mesmo método do numpy por padrão)
+        pos = (len(ordenados) - 1) * p
+        baixo = int(pos)
+        alto = min(baixo + 1, len(ordenados) - 1)
+        return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (pos - baixo)
+
+    return {
+        "n": len(ordenados),
+        "p50_ms": round(percentil(0.50), 3),
+        "p95_ms": round(percentil(0.95), 3),
+        "media_ms": round(statistics.fmean(ordenados), 3),
+        "min_ms": round(ordenados[0], 3),
+        "max_ms": round(ordenados[-1], 3),
+    }
+
+
+def medir(funcao, repeticoes, preparar=None, aquecimento=2):
+    """Executa `funcao` `repeticoes` vezes e retorna o resumo dos tempos.
+    `preparar` (opcional) roda antes de cada execução, fora do tempo medido."""
+    tempos = []
+    for i in range(aquecimento + repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        duracao = (time.perf_counter() - inicio) * 1000
+        if i >= aquecimento:
+            tempos.append(duracao)
+    return resumir(tempos)
+
+
+def _esperar_status(resposta, *esperados):
+    if resposta.status_code not in esperados:
+        raise RuntimeError(f"Status inesperado {resposta.status_code} em {resposta.request.path}")
+
+
+def _limpar_caches(app):
+    app.extensions["fragment_cache"].clear()
+    app.extensions["rollover_verificado"].clear()
+
+
+def _cliente_logado(app):
+    cliente = app.test_client()
+    resp = cliente.post("/login", data={"username": "bench1", "password": SENHA})
+    _esperar_status(resp, 302)
+    return cliente
+
+
+def executar(args):
+    pasta = tempfile.mkdtemp(prefix="benchmark_")
+    original = os.path.join(pasta, "original.db")
+    try:
+        semear_banco(original, args)
+
+        # Banco de trabalho: recebe as escritas de add/edit; o original fica intacto para o rollover
+        trabalho = os.path.join(pasta, "trabalho.db")
+        shutil.copyfile(original, trabalho)
+        app = create_app({"DATABASE": trabalho, "WTF_CSRF_ENABLED": False, "TESTING": True})
+        cliente = _cliente_logado(app)
+
+        with app.app_context():
+            conn = database.get_db_connection()
+            user_id = conn.execute("SELECT id FROM users WHERE username = 'bench1'").fetchone()[0]
+            mes_ref = conn.execute(
+                "SELECT strftime('%Y', vencimento), strftime('%m', vencimento) FROM contas WHERE user_id = ? "
+                "GROUP BY 1, 2 ORDER BY COUNT(*) DESC LIMIT 1",
+                (user_id,),
+            ).fetchone()
+            categoria_id = conn.execute("SELECT id FROM categorias WHERE user_id = ? LIMIT 1", (user_id,)).fetchone()
+            conta_id = conn.execute("SELECT id FROM contas WHERE user_id = ? LIMIT 1", (user_id,)).fetchone()
+            conn.close()
+        url_relatorio = f"/relatorio/visualizar?ano={int(mes_ref[0])}&mes={int(mes_ref[1])}" if mes_ref else None
+
+        resultados = {}
+        rep = args.repeticoes
+
+        with app.app_context():
+            resultados["get_contas_by_user"] = medir(lambda: database.get_contas_by_user(user_id), rep)
+
+        def dashboard():
+            _esperar_status(cliente.get("/dashboard"), 200)
+
+        resultados["dashboard_frio"] = medir(dashboard, rep, preparar=lambda: _limpar_caches(app))
+        resultados["dashboard_quente"] = medir(dashboard, rep)
+
+        if url_relatorio:
+            def relatorio():
+                _esperar_status(cliente.get(url_relatorio), 200)
+
+            resultados["relatorio_frio"] = medir(relatorio, rep, preparar=lambda: _limpar_caches(app))
+            resultados["relatorio_quente"] = medir(relatorio, rep)
+
+        # Rollover: cada execução parte de uma cópia nova do banco original (com vencimentos atrasados)
+        rollover_db = os.path.join(pasta, "rollover.db")
+        app_rollover = create_app({"DATABASE": rollover_db, "APLICAR_MIGRACOES": False})
+
+        def rollover():
+            with app_rollover.app_context():
+                app_module.update_parcelas_recorrentes()
+
+        resultados["update_parcelas_recorrentes"] = medir(
+            rollover, rep, preparar=lambda: shutil.copyfile(original, rollover_db)
+        )
+
+        if categoria_id and conta_id:
+            form = {
+                "nome": "Conta benchmark",
+                "valor": "123,45",
+                "valor_total_compra": "",
+                "vencimento": date.today().isoformat(),
+                "categoria_id": str(categoria_id[0]),
+                "parcela_atual": "",
+                "total_parcelas": "",
+                "tipo_pagamento": "0",
+            }
+
+            def add_conta():
+                _esperar_status(cliente.post("/add", data=form), 302)
+
+            def edit_conta():
+                _esperar_status(cliente.post(f"/edit/{conta_id[0]}", data=form), 302)
+
+            resultados["add_conta"] = medir(add_conta, rep)
+            resultados["edit_conta"] = medir(edit_conta, rep)
+
+        return resultados
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def comparar(atual, anterior):
+    """Imprime a variação de p50/p95 em relação a um resultado anterior."""
+    print(f"\nComparação com {anterior['arquivo']}:")
+    for nome, res in atual.items():
+        ant = anterior["resultados"].get(nome)
+        if not ant:
+            continue
+        variacoes = []
+        for chave in ("p50_ms", "p95_ms"):
+            if ant[chave]:
+                variacoes.append(f"{chave[:3]} {(res[chave] - ant[chave]) / ant[chave] * 100:+.1f}%")
+        print(f"  {nome:30} {'  '.join(variacoes)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do Registro Financeiro.")
+    parser.add_argument("--usuarios", type=int, default=3)
+    parser.add_argument("--categorias", type=int, default=10, help="por usuário")
+    parser.add_argument("--tipos", type=int, default=4, help="tipos de pagamento por usuário")
+    parser.add_argument("--contas", type=int, default=500, help="por usuário")
+    parser.add_argument("--anos", type=int, default=2, help="anos de histórico")
+    parser.add_argument("--atrasadas", type=float, default=0.3,
+                        help="fração de recorrentes/parcelas com vencimento passado (rollover das recorrentes)")
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON de resultado (padrão: benchmark_<data>.json)")
+    parser.add_argument("--comparar", help="arquivo JSON de uma execução anterior")
+    args = parser.parse_args(argv)
+
+    # O app imprime bastante (DEBUG); durante as medições isso vai para /dev/null
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        resultados = executar(args)
+
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("saida", "comparar")},
+        "ambiente": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+        },
+        "resultados": resultados,
+    }
+    saida = args.saida or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+
+    print(f"{'caso':30} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for nome, res in resultados.items():
+        print(f"{nome:30} {res['p50_ms']:>10.2f} {res['p95_ms']:>10.2f}")
+    print(f"\nResultado gravado em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        anterior["arquivo"] = args.comparar
+        comparar(resultados, anterior)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""Teste de carga HTTP contra uma instância local do app (Waitress).
+
+Sobe o app em uma porta local (thread em segundo plano) apontando para um banco gerado por
+gerar_dados.py, faz login com vários usuários sintéticos e dispara, com clientes concorrentes,
+uma mistura configurável de requisições:
+
+    dashboard   GET  /dashboard
+    relatorio   GET  /relatorio/visualizar?mes=..&ano=..   (mês aleatório dos últimos 12)
+    add         POST /add
+    edit        POST /edit/<id>                            (uma conta do próprio usuário)
+
+Ao final mostra vazão, percentis de latência e erros por tipo de requisição, e quantas vezes
+"database is locked" apareceu (nas respostas ou no log do app).
+
+Uso (dentro de Cont/):
+    python carga.py                                    # banco temporário, escala pequena
+    python carga.py --banco dados.db --clientes 20 --duracao 60 --mix dashboard=60,relatorio=20,add=10,edit=10
+    python carga.py --threads-servidor 8 --saida carga.json
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from waitress.server import create_server
+
+import database
+from app import create_app
+from benchmark import resumir
+from gerar_dados import ESCALAS, SENHA_PADRAO, gerar
+
+MIX_PADRAO = "dashboard=60,relatorio=20,add=10,edit=10"
+TRAVADO = "database is locked"
+_CSRF = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+class ContadorSaida:
+    """Substitui stdout/stderr durante o teste: descarta o log do app (muito DEBUG)
+    e conta as ocorrências de 'database is locked'."""
+
+    def __init__(self):
+        self.travamentos = 0
+        self._lock = threading.Lock()
+
+    def write(self, texto):
+        if TRAVADO in texto:
+            with self._lock:
+                self.travamentos += texto.count(TRAVADO)
+        return len(texto)
+
+    def flush(self):
+        pass
+
+
+class _SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    """Mantém o 302 como resposta (para conferir o resultado de POSTs)."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Cliente:
+    """Um usuário logado, com seu cookie de sessão e os IDs de que precisa."""
+
+    def __init__(self, base, username, senha, categoria_id, conta_ids, rnd):
+        self.base = base
+        self.categoria_id = categoria_id
+        self.conta_ids = conta_ids
+        self.rnd = rnd
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _SemRedirecionar()
+        )
+        status, corpo = self.abrir("/login")
+        self.csrf = _CSRF.search(corpo).group(1)  # Vale para a sessão inteira (Flask-WTF)
+        status, _ = self.abrir("/login", {"username": username, "password": senha})
+        if status != 302:
+            raise RuntimeError(f"Login falhou para {username} (status {status})")
+
+    def abrir(self, caminho, dados=None):
+        """Faz a requisição e retorna (status, corpo)."""
+        if dados is not None:
+            dados = urllib.parse.urlencode({"csrf_token": getattr(self, "csrf", ""), **dados}).encode()
+        try:
+            with self.opener.open(self.base + caminho, dados, timeout=60) as resp:
+                return resp.status, resp.read().decode("utf-8", "replace")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8", "replace")
+
+    def _form_conta(self):
+        return {
+            "nome": f"Carga {self.rnd.randint(1, 10**6)}",
+            "valor": f"{self.rnd.randint(1, 500)},{self.rnd.randint(0, 99):02d}",
+            "valor_total_compra": "",
+            "vencimento": (date.today() + relativedelta(days=self.rnd.randint(0, 60))).isoformat(),
+            "categoria_id": str(self.categoria_id),
+            "parcela_atual": "",
+            "total_parcelas": "",
+            "tipo_pagamento": "0",
+        }
+
+    def executar(self, tipo):
+        """Executa uma requisição do tipo dado e retorna (ok, travou)."""
+        if tipo == "dashboard":
+            esperado, (status, corpo) = 200, self.abrir("/dashboard")
+        elif tipo == "relatorio":
+            mes = date.today() - relativedelta(months=self.rnd.randint(0, 11))
+            esperado, (status, corpo) = 200, self.abrir(f"/relatorio/visualizar?mes={mes.month}&ano={mes.year}")
+        elif tipo == "add":
+            esperado, (status, corpo) = 302, self.abrir("/add", self._form_conta())
+        elif tipo == "edit":
+            conta_id = self.rnd.choice(self.conta_ids)
+            esperado, (status, corpo) = 302, self.abrir(f"/edit/{conta_id}", self._form_conta())
+        else:
+            raise ValueError(f"Tipo de requisição desconhecido: {tipo}")
+        return status == esperado, TRAVADO in corpo
+
+
+def servir(servidor, parar):
+    """Loop do Waitress até `parar` ser sinalizado; fecha tudo na própria thread do loop
+    (servidor.run() só termina quando os sockets são fechados, o que não é seguro de outra thread)."""
+    while not parar.is_set():
+        servidor.asyncore.loop(timeout=0.2, map=servidor._map, use_poll=servidor.adj.asyncore_use_poll, count=1)
+    servidor.task_dispatcher.shutdown()
+    servidor.asyncore.close_all(servidor._map)
+
+
+def ler_mix(texto):
+    """'dashboard=60,add=10' -> ([tipos], [pesos])."""
+    tipos, pesos = [], []
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        tipos.append(nome.strip())
+        pesos.append(float(peso or 1))
+    return tipos, pesos
+
+
+def carregar_usuarios(caminho, quantidade):
+    """Usuários do banco com pelo menos uma categoria e uma conta: [(username, categoria_id, [conta_ids])]."""
+    conn = database.get_db_connection(caminho)
+    try:
+        usuarios = []
+        for u in conn.execute("SELECT id, username FROM users ORDER BY id"):
+            cat = conn.execute("SELECT id FROM categorias WHERE user_id = ? LIMIT 1", (u["id"],)).fetchone()
+            contas = [r[0] for r in conn.execute("SELECT id FROM contas WHERE user_id = ? LIMIT 50", (u["id"],))]
+            if cat and contas:
+                usuarios.append((u["username"], cat[0], contas))
+            if len(usuarios) >= quantidade:
+                break
+        return usuarios
+    finally:
+        conn.close()
+
+
+def executar(args):
+    pasta = None
+    banco = args.banco
+    if not banco:
+        pasta = tempfile.mkdtemp(prefix="carga_")
+        banco = os.path.join(pasta, "carga.db")
+        gerar(banco, senha=args.senha, seed=args.seed, **ESCALAS[args.escala])
+
+    contador = ContadorSaida()
+    stdout, stderr = sys.stdout, sys.stderr
+    parar = threading.Event()
+    thread_servidor = None
+    try:
+        app = create_app({"DATABASE": banco})
+        servidor = create_server(app, host="127.0.0.1", port=args.porta, threads=args.threads_servidor)
+        base = f"http://127.0.0.1:{servidor.effective_port}"
+        thread_servidor = threading.Thread(target=servir, args=(servidor, parar), daemon=True)
+        thread_servidor.start()
+
+        usuarios = carregar_usuarios(banco, args.clientes)
+        if not usuarios:
+            raise RuntimeError("Nenhum usuário com categorias e contas no banco.")
+        print(f"Servidor em {base} ({args.threads_servidor} threads), {len(usuarios)} clientes, "
+              f"{args.duracao}s, mix {args.mix}")
+
+        sys.stdout = sys.stderr = contador
+        rnd_base = random.Random(args.seed)
+        clientes = [Cliente(base, nome, args.senha, cat, contas, random.Random(rnd_base.random()))
+                    for nome, cat, contas in usuarios]
+        tipos, pesos = ler_mix(args.mix)
+
+        resultados = {t: {"tempos": [], "erros": 0, "travados": 0} for t in tipos}
+        lock = threading.Lock()
+        fim = time.perf_counter() + args.duracao
+
+        def rodar(cliente):
+            while time.perf_counter() < fim:
+                tipo = cliente.rnd.choices(tipos, pesos)[0]
+                inicio = time.perf_counter()
+                try:
+                    ok, travou = cliente.executar(tipo)
+                except Exception:
+                    ok, travou = False, False
+                duracao = (time.perf_counter() - inicio) * 1000
+                with lock:
+                    r = resultados[tipo]
+                    r["tempos"].append(duracao)
+                    r["erros"] += 0 if ok else 1
+                    r["travados"] += 1 if travou else 0
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(clientes)) as executor:
+            list(executor.map(rodar, clientes))
+        decorrido = time.perf_counter() - inicio
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        if thread_servidor:
+            parar.set()
+            thread_servidor.join()
+        if pasta:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    total = sum(len(r["tempos"]) for r in resultados.values())
+    return {
+        "duracao_s": round(decorrido, 2),
+        "requisicoes": total,
+        "vazao_rps": round(total / decorrido, 2) if decorrido else 0,
+        "erros": sum(r["erros"] for r in resultados.values()),
+        "database_is_locked": {
+            "respostas": sum(r["travados"] for r in resultados.values()),
+            "log": contador.travamentos,
+        },
+        "por_tipo": {
+            tipo: {**(resumir(r["tempos"]) if r["tempos"] else {"n": 0}), "erros": r["erros"],
+                   "travados": r["travados"]}
+            for tipo, r in resultados.items()
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga HTTP do Registro Financeiro.")
+    parser.add_argument("--banco", help="banco já gerado (padrão: gera um temporário com --escala)")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    parser.add_argument("--senha", default=SENHA_PADRAO, help="senha dos usuários do banco")
+    parser.add_argument("--clientes", type=int, default=10, help="clientes concorrentes (um usuário cada)")
+    parser.add_argument("--duracao", type=float, default=30, help="segundos de carga")
+    parser.add_argument("--mix", default=MIX_PADRAO, help=f"pesos por tipo (padrão: {MIX_PADRAO})")
+    parser.add_argument("--threads-servidor", type=int, default=4, help="threads do Waitress")
+    parser.add_argument("--porta", type=int, default=0, help="porta local (0 = qualquer livre)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args)
+
+    print(f"\n{resultado['requisicoes']} requisições em {resultado['duracao_s']}s "
+          f"= {resultado['vazao_rps']} req/s, {resultado['erros']} erros")
+    travados = resultado["database_is_locked"]
+    print(f"'database is locked': {travados['respostas']} em respostas, {travados['log']} no log do app\n")
+    print(f"{'tipo':12} {'n':>7} {'p50 (ms)':>10} {'p95 (ms)':>10} {'max (ms)':>10} {'erros':>7}")
+    for tipo, r in resultado["por_tipo"].items():
+        if r["n"]:
+            print(f"{tipo:12} {r['n']:>7} {r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f} {r['max_ms']:>10.1f} {r['erros']:>7}")
+        else:
+            print(f"{tipo:12} {0:>7}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\nResultado gravado em {args.saida}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
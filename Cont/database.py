@@ -1,18 +1,180 @@
+import functools
+import os
+import re
 import sqlite3
+import time
+import urllib.parse
+from flask import current_app, g, has_app_context
 from models import Conta, User, Cartao, ContaBancaria, Categoria  # Importa todos os modelos definidos em models.py
+import parcelas  # Cronograma de parcelas calculado sob demanda
 from datetime import date, datetime  # Garante que date e datetime estão importados para manipulação de datas
 import decimal  # Importa decimal para tratamento preciso de valores monetários
 
-# Define o nome do arquivo do banco de dados SQLite
-DB_FILE = 'contas.db'
+# Define o nome padrão do arquivo do banco de dados SQLite.
+# Dentro de um app Flask vale app.config["DATABASE"] (ver create_app em app.py).
+DB_FILE = os.environ.get('DATABASE', 'contas.db')
+
+
+# --- Backend Alternativo (SQLAlchemy Core) ---
+# Com DATABASE_BACKEND = 'sqlalchemy', create_app registra database_sqlalchemy em
+# app.extensions["database_backend"]; as funções marcadas com @_backend_alternativo passam a chamar
+# a função de mesmo nome de lá (mesma assinatura e mesmo retorno). Fora de um app, ou com o backend
+# padrão, rodam aqui mesmo, em sqlite3.
+def _backend_alternativo(funcao):
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        if has_app_context():
+            backend = current_app.extensions.get('database_backend')
+            if backend is not None:
+                return getattr(backend, funcao.__name__)(*args, **kwargs)
+        return funcao(*args, **kwargs)
+    return envolvida
+
+
+# --- Shards por Usuário ---
+# Com DATABASE_SHARDS = N > 0, os dados de cada usuário (categorias, tipos de pagamento, contas,
+# movimentações) ficam em um de N arquivos, escolhido por user_id % N: contas.db -> contas.shard0.db,
+# contas.shard1.db, ... O arquivo principal (DATABASE) guarda a tabela 'users' (login). Cada shard
+# tem uma cópia mínima dos usuários dele (sem a senha), para as chaves estrangeiras e para a versão
+# dos dados (users.data_version, incrementada por triggers). Escritas de usuários em shards
+# diferentes não disputam o mesmo lock. Todos os arquivos recebem as mesmas migrações.
+# Com N = 0 (padrão) tudo fica em DATABASE, como antes. Para dividir um banco existente, ver
+# dividir_banco.py; N não pode mudar depois sem dividir de novo.
+def get_main_db_path():
+    """Retorna o caminho do banco principal: app.config["DATABASE"] do app ativo ou, fora de um app, DB_FILE."""
+    if has_app_context():
+        return current_app.config.get('DATABASE', DB_FILE)
+    return DB_FILE
+
+
+def get_num_shards():
+    """Quantidade de shards (0 = desligado): app.config["DATABASE_SHARDS"] ou a variável de ambiente."""
+    if has_app_context():
+        return int(current_app.config.get('DATABASE_SHARDS', 0) or 0)
+    return int(os.environ.get('DATABASE_SHARDS', 0) or 0)
+
+
+def caminho_shard(db_file, numero):
+    """Arquivo do shard 'numero' de um banco: 'contas.db' -> 'contas.shard3.db'."""
+    raiz, extensao = os.path.splitext(db_file)
+    return f"{raiz}.shard{numero}{extensao or '.db'}"
+
+
+def caminho_replica(db_file):
+    """Arquivo da réplica de leitura de um banco: 'contas.db' -> 'contas.replica.db' (ver leitura.py)."""
+    raiz, extensao = os.path.splitext(db_file)
+    return f"{raiz}.replica{extensao or '.db'}"
+
+
+def get_shard_paths(db_file=None, shards=None):
+    """Arquivos de todos os shards (lista vazia se os shards estiverem desligados)."""
+    shards = get_num_shards() if shards is None else shards
+    return [caminho_shard(db_file or get_main_db_path(), numero) for numero in range(shards)]
+
+
+def get_db_path(user_id=None):
+    """Retorna o caminho do banco com os dados do usuário.
+
+    Sem shards, é sempre o banco principal. Com shards, é o shard do usuário; sem 'user_id', vale o
+    usuário da requisição atual (g.usuario_shard, definido em app.py) e, fora de uma requisição
+    autenticada, o banco principal.
+    """
+    shards = get_num_shards()
+    if not shards:
+        return get_main_db_path()
+    if user_id is None and has_app_context():
+        user_id = g.get('usuario_shard')
+    if user_id is None:
+        return get_main_db_path()
+    return caminho_shard(get_main_db_path(), int(user_id) % shards)
+
+
+# --- Instrumentação ---
+# Observadores (ex: metrics.ObservadorBanco, sql_tracer.ObservadorTracer) recebem conexao_aberta(conn)
+# e comando_executado(segundos).
+# Sem observadores, get_db_connection devolve uma conexão sqlite3 comum, sem custo extra.
+_observadores = []
+
+
+def add_db_observer(observador):
+    """Registra um observador de conexões e comandos SQL (uma vez só, mesmo se chamado de novo)."""
+    if observador not in _observadores:
+        _observadores.append(observador)
+
+
+def remove_db_observer(observador):
+    """Remove um observador registrado com add_db_observer (nada acontece se não estiver registrado)."""
+    if observador in _observadores:
+        _observadores.remove(observador)
+
 
+def _notificar_comando(inicio):
+    segundos = time.perf_counter() - inicio
+    for observador in _observadores:
+        observador.comando_executado(segundos)
 
-def get_db_connection():
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mede o tempo de cada execute/executemany/executescript."""
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            _notificar_comando(inicio)
+
+    def executemany(self, sql, parametros):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            _notificar_comando(inicio)
+
+    def executescript(self, script):
+        inicio = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            _notificar_comando(inicio)
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de conn.execute) são CursorInstrumentado."""
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+def get_db_connection(db_file=None, user_id=None):
     """Estabelece e retorna uma conexão com o banco de dados SQLite.
        Configura a conexão para retornar linhas como objetos semelhantes a dicionários
        e habilita o suporte a chaves estrangeiras.
+
+    Args:
+        db_file (str, optional): Caminho do banco. Se omitido, usa get_db_path(user_id).
+        user_id (int, optional): Usuário dono dos dados (escolhe o shard, se houver).
+
+    Sem 'db_file', dentro de uma view marcada com leitura.somente_leitura, a conexão é somente
+    leitura ('mode=ro'), na réplica do arquivo se a view aceitar e LEITURA_REPLICA estiver ligado.
     """
-    conn = sqlite3.connect(DB_FILE)  # Conecta ao arquivo do banco de dados
+    destino, uri = db_file or get_db_path(user_id), False
+    if db_file is None and has_app_context() and g.get('somente_leitura'):
+        # View somente leitura (ver leitura.py): 'mode=ro', na réplica se houver
+        destino, uri = uri_somente_leitura(_caminho_leitura(destino)), True
+    # Conecta ao arquivo do banco de dados (instrumentada só se houver observadores)
+    conn = sqlite3.connect(destino, uri=uri, factory=ConexaoInstrumentada if _observadores else sqlite3.Connection)
+    for observador in _observadores:
+        observador.conexao_aberta(conn)
     # Configura a fábrica de linhas para sqlite3.Row, permitindo acesso às colunas por nome (ex: row['nome'])
     conn.row_factory = sqlite3.Row
     # Habilita a verificação de restrições de chave estrangeira (FOREIGN KEY)
@@ -20,85 +182,58 @@ def get_db_connection():
     return conn  # Retorna o objeto de conexão
 
 
+def uri_somente_leitura(caminho):
+    """URI 'file:' do SQLite que abre 'caminho' somente para leitura."""
+    return f"file:{urllib.parse.quote(os.path.abspath(caminho))}?mode=ro"
 
-def init_db():
-    """Inicializa o schema do banco de dados.
-       Cria as tabelas necessárias ('users', 'categorias', 'tipos_pagamento', 'contas')
-       se elas ainda não existirem.
-    """
-    conn = get_db_connection()  # Obtém uma conexão com o DB
-    cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
 
-    # --- Criação da Tabela de Usuários ---
-    # Guarda informações de login dos usuários.
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, -- Chave primária única e auto-incremental
-            username TEXT UNIQUE NOT NULL,        -- Nome de usuário (deve ser único)
-            password TEXT NOT NULL                 -- Hash da senha do usuário
-        )
-    """)
+def _caminho_leitura(caminho):
+    """Arquivo lido por uma view somente leitura: a réplica de 'caminho', se a view aceita e houver."""
+    replica = current_app.extensions.get('replica')
+    if replica is not None and g.get('leitura_replica'):
+        return replica.caminho(caminho)
+    return caminho
 
-    # --- Criação da Tabela de Categorias ---
-    # Armazena as categorias criadas pelos usuários para classificar contas.
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS categorias (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, -- Chave primária da categoria
-            nome TEXT NOT NULL,                   -- Nome da categoria (ex: "Alimentação", "Transporte")
-            user_id INTEGER NOT NULL,             -- Chave estrangeira referenciando o usuário dono da categoria
-            UNIQUE(nome, user_id),                -- Garante que um mesmo usuário não pode ter duas categorias com o mesmo nome
-            FOREIGN KEY (user_id) REFERENCES users(id) -- Define a relação com a tabela 'users'
-                ON DELETE CASCADE                     -- IMPORTANTE: Se um usuário for deletado, suas categorias também serão (efeito cascata)
-        )
-    """)
 
-    # --- Criação da Tabela de Tipos de Pagamento ---
-    # Armazena informações de Cartões de Crédito e Contas Bancárias usados para pagar/receber contas.
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tipos_pagamento (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, -- Chave primária do tipo de pagamento
-            nome TEXT NOT NULL,                   -- Nome dado pelo usuário (ex: "Cartão Nubank", "Conta Itaú")
-            tipo TEXT NOT NULL,                   -- Tipo: 'cartao' ou 'conta' (para diferenciar a lógica)
-            limite REAL,                          -- Limite total (usado apenas para 'cartao', armazena como número real/float)
-            limite_disponivel REAL,               -- Limite disponível (usado apenas para 'cartao', armazena como real/float)
-            saldo REAL,                           -- Saldo atual (usado apenas para 'conta', armazena como real/float)
-            user_id INTEGER NOT NULL,             -- Chave estrangeira referenciando o usuário dono
-            FOREIGN KEY (user_id) REFERENCES users(id) -- Define a relação com 'users'
-                ON DELETE CASCADE                     -- IMPORTANTE: Se um usuário for deletado, seus tipos de pagamento também serão
-        )
-    """)
+# --- Escritas (direto ou pelo escritor único) ---
+def _comando(conn, sql, parametros):
+    """Executa um comando de escrita; devolve (rowcount, lastrowid)."""
+    cursor = conn.execute(sql, parametros)
+    return cursor.rowcount, cursor.lastrowid
 
-    # --- Criação da Tabela de Contas (Despesas/Receitas) ---
-    # Armazena os registros de contas a pagar ou receber.
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS contas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, -- Chave primária da conta
-            nome TEXT NOT NULL,                   -- Descrição da conta (ex: "Supermercado", "Salário")
-            valor REAL NOT NULL,                  -- Valor da conta (armazena como número real/float)
-            valor_total_compra REAL,                -- Valor total da compra (para parcelamentos)
-            vencimento TEXT NOT NULL,             -- Data de vencimento (armazena como texto no formato ISO 'YYYY-MM-DD')
-            categoria_id INTEGER,                 -- Chave estrangeira referenciando a categoria (opcional)
-            parcela_atual INTEGER,                -- Número da parcela atual (se for conta parcelada)
-            total_parcelas INTEGER,               -- Número total de parcelas (se for conta parcelada)
-            user_id INTEGER NOT NULL,             -- Chave estrangeira referenciando o usuário dono
-            recorrente INTEGER DEFAULT 0,         -- Flag para conta recorrente (0 = Não, 1 = Sim)
-            tipo_pagamento_id INTEGER,            -- Chave estrangeira referenciando o tipo de pagamento usado (opcional)
-            FOREIGN KEY (user_id) REFERENCES users(id) -- Relação com 'users'
-                ON DELETE CASCADE,                    -- Deleta contas se o usuário for deletado
-            FOREIGN KEY (tipo_pagamento_id) REFERENCES tipos_pagamento(id) -- Relação com 'tipos_pagamento'
-                ON DELETE SET NULL,                   -- IMPORTANTE: Se o tipo de pagamento for deletado, define este campo como NULL na conta (não deleta a conta)
-            FOREIGN KEY (categoria_id) REFERENCES categorias(id) -- Relação com 'categorias'
-                ON DELETE SET NULL                    -- IMPORTANTE: Se a categoria for deletada, define este campo como NULL na conta (não deleta a conta)
-        )
-    """)
 
-    conn.commit()  # Salva todas as alterações (criação das tabelas) no banco de dados
-    conn.close()  # Fecha a conexão
+def _executar_escrita(user_id, funcao, *args):
+    """Roda funcao(conn, *args) em uma transação no banco do usuário e devolve o resultado.
+
+    Com o escritor único ligado (ESCRITOR_ATIVO, ver escritor.py), a operação entra na fila do
+    escritor do arquivo e é gravada junto com as que estiverem esperando. Sem ele, abre uma conexão,
+    roda, faz commit e fecha. Em erro, nada da operação é gravado e a exceção é propagada.
+    """
+    caminho = get_db_path(user_id)
+    escritor = current_app.extensions.get('escritor') if has_app_context() else None
+    if escritor is not None:
+        return escritor.executar(caminho, funcao, *args)
+    conn = get_db_connection(caminho)
+    try:
+        with conn:  # commit no sucesso, rollback na exceção
+            return funcao(conn, *args)
+    finally:
+        conn.close()
+
+
+def init_db(db_file=None):
+    """Inicializa o schema do banco de dados.
+       Cria as tabelas necessárias ('users', 'categorias', 'tipos_pagamento', 'contas')
+       e aplica as migrações pendentes (ver apply_migrations). Se o banco já estiver
+       na versão atual, não faz nada além de ler 'PRAGMA user_version'.
+    """
+    apply_migrations(db_file)
     print("Schema do banco de dados inicializado/verificado com sucesso.")
 
 
 # --- Funções CRUD (Create, Read, Update, Delete) para Categorias ---
 
+@_backend_alternativo
 def create_categoria(nome, user_id):
     """Cria uma nova categoria para um usuário específico no banco de dados.
 
@@ -109,7 +244,7 @@ def create_categoria(nome, user_id):
     Returns:
         int: O ID da categoria recém-criada se sucesso, None caso contrário (ex: nome duplicado).
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     try:
         # Tenta inserir a nova categoria
@@ -134,6 +269,7 @@ def create_categoria(nome, user_id):
         return None
 
 
+@_backend_alternativo
 def get_categorias_by_user(user_id):
     """Busca todas as categorias pertencentes a um usuário específico.
 
@@ -144,7 +280,7 @@ def get_categorias_by_user(user_id):
         list[Categoria]: Uma lista de objetos Categoria, ordenada por nome.
                          Retorna lista vazia se o usuário não tiver categorias ou ocorrer erro.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     try:
         # Seleciona todas as colunas da tabela categorias onde user_id corresponde, ordenado por nome
@@ -160,6 +296,7 @@ def get_categorias_by_user(user_id):
         return []  # Retorna lista vazia em caso de erro
 
 
+@_backend_alternativo
 def get_categoria_by_id(categoria_id, user_id):
     """Busca uma categoria específica pelo seu ID, garantindo que ela pertença ao usuário informado.
 
@@ -170,7 +307,7 @@ def get_categoria_by_id(categoria_id, user_id):
     Returns:
         Categoria or None: O objeto Categoria se encontrado e pertencente ao usuário, None caso contrário.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     try:
         # Busca a categoria pelo ID E pelo user_id
@@ -188,6 +325,7 @@ def get_categoria_by_id(categoria_id, user_id):
         return None
 
 
+@_backend_alternativo
 def get_categoria_by_name_and_user(nome, user_id):
     """Verifica se uma categoria com um nome específico já existe para um determinado usuário.
        Útil para evitar a criação de categorias duplicadas.
@@ -199,7 +337,7 @@ def get_categoria_by_name_and_user(nome, user_id):
     Returns:
         Categoria or None: O objeto Categoria se existir, None caso contrário.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     try:
         # Busca pela combinação exata de nome e user_id
@@ -217,6 +355,7 @@ def get_categoria_by_name_and_user(nome, user_id):
         return None
 
 
+@_backend_alternativo
 def update_categoria(categoria_id, nome, user_id):
     """Atualiza o nome de uma categoria existente, verificando propriedade e duplicidade.
 
@@ -229,7 +368,7 @@ def update_categoria(categoria_id, nome, user_id):
         bool: True se a atualização foi bem-sucedida, False caso contrário
               (ex: nome duplicado, categoria não encontrada, erro).
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     try:
         # --- Verificação de Duplicidade ---
@@ -262,6 +401,7 @@ def update_categoria(categoria_id, nome, user_id):
         conn.close()
         return False
     
+@_backend_alternativo
 def delete_categoria(categoria_id, user_id):
     """Deleta uma categoria específica, se ela pertencer ao usuário.
        As contas associadas a esta categoria terão seu campo 'categoria_id'
@@ -274,7 +414,7 @@ def delete_categoria(categoria_id, user_id):
     Returns:
         bool: True se a exclusão foi bem-sucedida, False caso contrário.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     try:
         # Tenta deletar a categoria, verificando o ID e o user_id
@@ -297,6 +437,64 @@ def delete_categoria(categoria_id, user_id):
 
 # --- Funções CRUD para Contas (Despesas/Receitas) ---
 
+# --- Cronograma de Parcelas ---
+# Contas parceladas guardam primeiro_vencimento/ultimo_vencimento (ver parcelas.py). Nelas,
+# 'vencimento' e 'parcela_atual' da linha são os da última gravação; quem lê usa os valores
+# calculados para o dia (aplicar_cronograma), e a linha não é mais reescrita todo mês.
+
+def _limites_para_gravar(vencimento, parcela_atual, total_parcelas):
+    """(primeiro_vencimento, ultimo_vencimento) em texto ISO para gravar, ou (None, None)."""
+    if isinstance(vencimento, str):
+        try:
+            vencimento = date.fromisoformat(vencimento)
+        except ValueError:
+            return None, None
+    primeiro, ultimo = parcelas.limites(vencimento, parcela_atual, total_parcelas)
+    if primeiro is None:
+        return None, None
+    return primeiro.isoformat(), ultimo.isoformat()
+
+
+def aplicar_cronograma(linha, referencia=None):
+    """Troca 'vencimento' e 'parcela_atual' de uma conta parcelada (dict) pelos da parcela atual
+    em `referencia` (padrão: hoje). Contas não parceladas ficam como estão.
+
+    Returns:
+        dict: A própria linha.
+    """
+    primeiro = linha.get('primeiro_vencimento')
+    total = linha.get('total_parcelas')
+    if primeiro and total:
+        numero, vencimento = parcelas.parcela_em(date.fromisoformat(primeiro), total, referencia or date.today())
+        if 'parcela_atual' in linha:
+            linha['parcela_atual'] = numero
+        if 'vencimento' in linha:
+            linha['vencimento'] = vencimento.isoformat()
+    return linha
+
+
+def _conta_da_linha(row, referencia=None):
+    """Cria o objeto Conta (com 'categoria_nome') de uma linha de 'SELECT c.*, cat.nome as categoria_nome',
+    já com a parcela atual calculada."""
+    linha = aplicar_cronograma(dict(row), referencia)
+    conta_obj = Conta(
+        id=linha['id'],
+        nome=linha['nome'],
+        valor=linha['valor'],
+        valor_total_compra=linha['valor_total_compra'],
+        vencimento=linha['vencimento'],  # O modelo Conta converte a string ISO para date
+        categoria_id=linha['categoria_id'],
+        parcela_atual=linha['parcela_atual'],
+        total_parcelas=linha['total_parcelas'],
+        user_id=linha['user_id'],
+        recorrente=linha['recorrente'],
+        tipo_pagamento_id=linha['tipo_pagamento_id']
+    )
+    conta_obj.categoria_nome = linha['categoria_nome']
+    return conta_obj
+
+
+@_backend_alternativo
 def create_conta(nome, valor, vencimento, categoria_id, parcela_atual, total_parcelas, user_id, recorrente,
                  tipo_pagamento_id, valor_total_compra):
     """Cria uma nova conta no banco de dados.
@@ -316,32 +514,30 @@ def create_conta(nome, valor, vencimento, categoria_id, parcela_atual, total_par
     Returns:
         int or None: O ID da conta criada, ou None em caso de erro.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
         # Converte a data de vencimento para string no formato ISO
         vencimento_str = vencimento.isoformat() if isinstance(vencimento, (date, datetime)) else str(vencimento)  # type: ignore
 
-        cursor.execute(
+        primeiro_str, ultimo_str = _limites_para_gravar(vencimento_str, parcela_atual, total_parcelas)
+
+        _, conta_id = _executar_escrita(
+            user_id, _comando,
             """
             INSERT INTO contas (nome, valor, valor_total_compra, vencimento, categoria_id, parcela_atual,
-                                total_parcelas, user_id, recorrente, tipo_pagamento_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                total_parcelas, user_id, recorrente, tipo_pagamento_id,
+                                primeiro_vencimento, ultimo_vencimento)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (nome, valor, valor_total_compra, vencimento_str, categoria_id, parcela_atual, total_parcelas, user_id,
-             recorrente, tipo_pagamento_id)
+             recorrente, tipo_pagamento_id, primeiro_str, ultimo_str)
         )
-        conn.commit()
-        conta_id = cursor.lastrowid
-        conn.close()
         return conta_id
     except Exception as e:
         print(f"Erro ao criar conta: {e}")
-        conn.rollback()
-        conn.close()
         return None
 
 
+@_backend_alternativo
 def update_conta(conta):
     """Atualiza os dados de uma conta existente no banco de dados.
 
@@ -354,8 +550,6 @@ def update_conta(conta):
         bool: True se a atualização foi bem-sucedida, False caso contrário.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
         # Garante que a data de vencimento está no formato ISO 'YYYY-MM-DD' para salvar como TEXT
         vencimento_str = None
         if isinstance(conta.vencimento, (date, datetime)):
@@ -380,19 +574,21 @@ def update_conta(conta):
             print(f"Erro: Valor inválido não pode ser convertido para float para salvar conta ID {conta.id}.")
             return False  # Impede salvar com valor inválido
 
+        # Parcelada: o cronograma é recalculado a partir da parcela e do vencimento informados
+        primeiro_str, ultimo_str = _limites_para_gravar(vencimento_str, conta.parcela_atual, conta.total_parcelas)
+
         # Executa o UPDATE, incluindo user_id na cláusula WHERE para segurança
-        cursor.execute(
+        updated_rows, _ = _executar_escrita(
+            conta.user_id, _comando,
             """UPDATE contas
                SET nome = ?, valor = ?, valor_total_compra = ?, vencimento = ?, categoria_id = ?,
-                   parcela_atual = ?, total_parcelas = ?, recorrente = ?, tipo_pagamento_id = ?
+                   parcela_atual = ?, total_parcelas = ?, recorrente = ?, tipo_pagamento_id = ?,
+                   primeiro_vencimento = ?, ultimo_vencimento = ?
                WHERE id = ? AND user_id = ?""",  # Verifica ID e User ID
             (conta.nome, valor_float, valor_total_compra_float, vencimento_str, conta.categoria_id,
-             conta.parcela_atual, conta.total_parcelas, conta.recorrente, conta.tipo_pagamento_id, conta.id,
-             conta.user_id)
+             conta.parcela_atual, conta.total_parcelas, conta.recorrente, conta.tipo_pagamento_id,
+             primeiro_str, ultimo_str, conta.id, conta.user_id)
         )
-        updated_rows = cursor.rowcount  # Verifica se alguma linha foi atualizada
-        conn.commit()  # Salva a alteração
-        conn.close()
         if updated_rows == 0:
             # Se nenhuma linha foi atualizada, a conta não foi encontrada ou não pertence ao usuário
             print(
@@ -400,16 +596,34 @@ def update_conta(conta):
         return updated_rows > 0  # Retorna True se a atualização ocorreu
     except Exception as e:
         print(f"Erro inesperado ao atualizar conta ID {getattr(conta, 'id', 'N/A')}: {e}")
-        # Tentar rollback e fechar conexão em caso de erro
-        try:
-            if conn:
-                conn.rollback()
-                conn.close()
-        except:
-            pass  # Ignora erros ao tentar fechar/rollback
         return False
 
 
+@_backend_alternativo
+def delete_conta(conta_id, user_id):
+    """Deleta uma conta específica, se ela pertencer ao usuário.
+       NÃO ajusta limite/saldo do tipo de pagamento vinculado; isso é responsabilidade de quem chama.
+
+    Args:
+        conta_id (int): O ID da conta a ser deletada.
+        user_id (int): O ID do usuário dono da conta.
+
+    Returns:
+        bool: True se a exclusão foi bem-sucedida, False caso contrário.
+    """
+    try:
+        deleted_rows, _ = _executar_escrita(
+            user_id, _comando, "DELETE FROM contas WHERE id = ? AND user_id = ?", (conta_id, user_id)
+        )
+        if deleted_rows == 0:
+            print(f"Aviso: Nenhuma conta encontrada com ID {conta_id} para o usuário ID {user_id} para deletar.")
+        return deleted_rows > 0
+    except Exception as e:
+        print(f"Erro ao deletar conta ID {conta_id}: {e}")
+        return False
+
+
+@_backend_alternativo
 def get_conta_by_id(id, user_id):
     """Busca uma conta específica pelo ID, garantindo que pertence ao usuário
        e incluindo o nome da categoria associada (se houver).
@@ -421,7 +635,7 @@ def get_conta_by_id(id, user_id):
     Returns:
         Conta or None: O objeto Conta (com atributo extra 'categoria_nome') se encontrado, None caso contrário.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     try:
         # Seleciona todas as colunas da conta ('c.*') e o nome da categoria ('cat.nome')
@@ -435,23 +649,8 @@ def get_conta_by_id(id, user_id):
         row = cursor.fetchone()  # Pega o resultado
         conn.close()
         if row:
-            # Se encontrou a linha, cria o objeto Conta
-            conta_obj = Conta(
-                id=row['id'],
-                nome=row['nome'],
-                valor=row['valor'],
-                valor_total_compra=row['valor_total_compra'],  # Inclui o valor total da compra
-                vencimento=row['vencimento'],  # O modelo Conta deve converter string ISO para date
-                categoria_id=row['categoria_id'],
-                parcela_atual=row['parcela_atual'],
-                total_parcelas=row['total_parcelas'],
-                user_id=row['user_id'],
-                recorrente=row['recorrente'],
-                tipo_pagamento_id=row['tipo_pagamento_id']
-            )
-            # Adiciona o nome da categoria como um atributo extra ao objeto
-            conta_obj.categoria_nome = row['categoria_nome']
-            return conta_obj  # Retorna o objeto Conta
+            # Se encontrou a linha, cria o objeto Conta (parcelada: com a parcela atual de hoje)
+            return _conta_da_linha(row)
         return None  # Retorna None se não encontrou
     except Exception as e:
         print(f"Erro ao buscar conta ID {id} para user ID {user_id}: {e}")
@@ -460,6 +659,7 @@ def get_conta_by_id(id, user_id):
         return None
 
 
+@_backend_alternativo
 def get_contas_by_user(user_id):
     """Busca todas as contas pertencentes a um usuário específico, incluindo os nomes das categorias.
 
@@ -470,7 +670,7 @@ def get_contas_by_user(user_id):
         list[Conta]: Uma lista de objetos Conta (com atributo extra 'categoria_nome'),
                      ordenada por vencimento mais recente. Retorna lista vazia se erro.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     contas = []  # Inicializa a lista de contas
     try:
@@ -483,26 +683,12 @@ def get_contas_by_user(user_id):
             ORDER BY c.vencimento DESC, c.id DESC  -- Ordena por vencimento mais recente, depois por ID
         """, (user_id,))
 
-        # Itera sobre cada linha retornada
-        for row in cursor.fetchall():
-            # Cria o objeto Conta para cada linha
-            conta_obj = Conta(
-                id=row['id'],
-                nome=row['nome'],
-                valor=row['valor'],
-                valor_total_compra=row['valor_total_compra'],
-                vencimento=row['vencimento'],
-                categoria_id=row['categoria_id'],
-                parcela_atual=row['parcela_atual'],
-                total_parcelas=row['total_parcelas'],
-                user_id=row['user_id'],
-                recorrente=row['recorrente'],
-                tipo_pagamento_id=row['tipo_pagamento_id']
-            )
-            # Adiciona o nome da categoria ao objeto
-            conta_obj.categoria_nome = row['categoria_nome']
-            contas.append(conta_obj)  # Adiciona o objeto à lista
+        # Cria o objeto Conta para cada linha (parceladas: com a parcela atual de hoje)
+        hoje = date.today()
+        contas = [_conta_da_linha(row, hoje) for row in cursor.fetchall()]
         conn.close()
+        # O vencimento das parceladas é calculado, então a ordem do SQL pode mudar para elas
+        contas.sort(key=lambda c: (c.vencimento or date.min, c.id), reverse=True)
         return contas  # Retorna a lista de objetos Conta
     except Exception as e:
         print(f"Erro ao buscar contas para user ID {user_id}: {e}")
@@ -511,8 +697,35 @@ def get_contas_by_user(user_id):
         return []  # Retorna lista vazia em caso de erro
 
 
+@_backend_alternativo
+def get_contas_para_previsao(user_id):
+    """Busca só as colunas usadas na previsão de fluxo de caixa (ver previsao.py).
+
+    Args:
+        user_id (int): O ID do usuário.
+
+    Returns:
+        list[sqlite3.Row]: valor, vencimento, recorrente, primeiro_vencimento e ultimo_vencimento
+                           de cada conta do usuário. Retorna lista vazia se erro.
+    """
+    conn = get_db_connection(user_id=user_id)
+    try:
+        linhas = conn.execute("""
+            SELECT valor, vencimento, recorrente, primeiro_vencimento, ultimo_vencimento
+            FROM contas
+            WHERE user_id = ?
+        """, (user_id,)).fetchall()
+        conn.close()
+        return linhas
+    except Exception as e:
+        print(f"Erro ao buscar contas para previsão do user ID {user_id}: {e}")
+        conn.close()
+        return []
+
+
 # --- Funções CRUD para Usuários ---
 
+@_backend_alternativo
 def get_user_by_username(username):
     """Busca um usuário no banco de dados pelo seu nome de usuário.
 
@@ -522,7 +735,7 @@ def get_user_by_username(username):
     Returns:
         User or None: O objeto User se encontrado, None caso contrário.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(get_main_db_path())
     cursor = conn.cursor()
     try:
         # Busca o usuário pelo nome de usuário (que é UNIQUE)
@@ -542,6 +755,7 @@ def get_user_by_username(username):
         return None
 
 
+@_backend_alternativo
 def create_user(username, hashed_password):
     """Cria um novo usuário no banco de dados.
 
@@ -552,7 +766,7 @@ def create_user(username, hashed_password):
     Returns:
         User or None: O objeto User recém-criado se sucesso, None caso contrário (ex: username duplicado).
     """
-    conn = get_db_connection()
+    conn = get_db_connection(get_main_db_path())
     cursor = conn.cursor()
     try:
         # Tenta inserir o novo usuário
@@ -563,6 +777,8 @@ def create_user(username, hashed_password):
         conn.commit()  # Salva a inserção
         user_id = cursor.lastrowid  # Pega o ID gerado para o novo usuário
         conn.close()
+        if get_num_shards():
+            _criar_usuario_no_shard(user_id, username)
         # Busca e retorna o usuário recém-criado para confirmar e obter o objeto completo
         return get_user_by_username(username)
     except sqlite3.IntegrityError:
@@ -578,8 +794,49 @@ def create_user(username, hashed_password):
         return None
 
 
+def _criar_usuario_no_shard(user_id, username, data_version=0, conn=None):
+    """Cópia mínima do usuário no shard dele (sem a senha): ver "Shards por Usuário"."""
+    propria = conn is None
+    conn = conn or get_db_connection(user_id=user_id)
+    try:
+        conn.execute(
+            "INSERT OR IGNORE INTO users (id, username, password, data_version) VALUES (?, ?, '', ?)",
+            (user_id, username, data_version),
+        )
+        if propria:
+            conn.commit()
+    finally:
+        if propria:
+            conn.close()
+
+
+@_backend_alternativo
+def update_user_password(user_id, hashed_password):
+    """Grava um novo hash de senha para o usuário.
+
+    Args:
+        user_id (int): O ID do usuário.
+        hashed_password (str): O novo hash da senha.
+
+    Returns:
+        bool: True se o usuário foi atualizado, False caso contrário.
+    """
+    conn = get_db_connection(get_main_db_path())
+    try:
+        cursor = conn.execute("UPDATE users SET password = ? WHERE id = ?", (hashed_password, user_id))
+        conn.commit()
+        return cursor.rowcount == 1
+    except Exception as e:
+        print(f"Erro ao atualizar a senha do usuário ID {user_id}: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
 # --- Funções CRUD para Tipos de Pagamento (Cartão/Conta Bancária) ---
 
+@_backend_alternativo
 def get_tipos_pagamento_by_user(user_id):
     """Busca todos os tipos de pagamento (Cartoes e Contas Bancarias) de um usuário.
 
@@ -590,7 +847,7 @@ def get_tipos_pagamento_by_user(user_id):
         list[Cartao | ContaBancaria]: Uma lista contendo objetos Cartao e/ou ContaBancaria,
                                        ordenada por nome. Retorna lista vazia se erro.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     tipos = []  # Inicializa a lista
     try:
@@ -602,7 +859,8 @@ def get_tipos_pagamento_by_user(user_id):
             if row['tipo'] == 'cartao':
                 # Cria um objeto Cartao. A classe Cartao deve lidar com a conversão
                 # dos valores REAL (limite, limite_disponivel) para Decimal internamente.
-                tipos.append(Cartao(row['id'], row['nome'], row['limite'], row['limite_disponivel'], row['user_id']))
+                tipos.append(Cartao(row['id'], row['nome'], row['limite'], row['limite_disponivel'], row['user_id'],
+                                     row['dia_fechamento'], row['dia_vencimento']))
             elif row['tipo'] == 'conta':
                 # Cria um objeto ContaBancaria. A classe deve converter saldo REAL para Decimal.
                 tipos.append(ContaBancaria(row['id'], row['nome'], row['saldo'], row['user_id']))
@@ -615,7 +873,9 @@ def get_tipos_pagamento_by_user(user_id):
         return []  # Retorna lista vazia em caso de erro
 
 
-def create_tipo_pagamento(nome, tipo, limite=None, limite_disponivel=None, saldo=None, user_id=None):
+@_backend_alternativo
+def create_tipo_pagamento(nome, tipo, limite=None, limite_disponivel=None, saldo=None, user_id=None,
+                          dia_fechamento=None, dia_vencimento=None):
     """Cria um novo tipo de pagamento (Cartão ou Conta Bancária) no banco.
 
     Args:
@@ -625,11 +885,13 @@ def create_tipo_pagamento(nome, tipo, limite=None, limite_disponivel=None, saldo
         limite_disponivel (Decimal, float, int, str, optional): Limite disponível (para cartao).
         saldo (Decimal, float, int, str, optional): Saldo inicial (para conta).
         user_id (int): ID do usuário dono.
+        dia_fechamento (int, optional): Dia de fechamento da fatura (para cartao).
+        dia_vencimento (int, optional): Dia de vencimento da fatura (para cartao).
 
     Returns:
         int or None: O ID do tipo de pagamento criado se sucesso, None caso contrário.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
 
     # Converte os valores numéricos (idealmente Decimal) para float antes de salvar no SQLite (tipo REAL)
@@ -646,12 +908,17 @@ def create_tipo_pagamento(nome, tipo, limite=None, limite_disponivel=None, saldo
     try:
         # Insere o novo registro na tabela tipos_pagamento
         cursor.execute(
-            """INSERT INTO tipos_pagamento (nome, tipo, limite, limite_disponivel, saldo, user_id)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (nome, tipo, limite_float, limite_disp_float, saldo_float, user_id)
+            """INSERT INTO tipos_pagamento (nome, tipo, limite, limite_disponivel, saldo, user_id,
+                                            dia_fechamento, dia_vencimento)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (nome, tipo, limite_float, limite_disp_float, saldo_float, user_id, dia_fechamento, dia_vencimento)
         )
-        conn.commit()  # Salva a inserção
         tipo_pagamento_id = cursor.lastrowid  # Pega o ID gerado
+        # Valor inicial do limite disponível/saldo como 1ª movimentação do livro-razão
+        inicial = limite_disp_float if tipo == 'cartao' else saldo_float
+        if inicial:
+            _registrar_movimentacao(cursor, tipo_pagamento_id, user_id, inicial, MOTIVO_ABERTURA)
+        conn.commit()  # Salva a inserção (e a movimentação) de uma vez
         conn.close()
         return tipo_pagamento_id  # Retorna o ID
     except Exception as e:
@@ -661,6 +928,7 @@ def create_tipo_pagamento(nome, tipo, limite=None, limite_disponivel=None, saldo
         return None
 
 
+@_backend_alternativo
 def get_tipo_pagamento_by_id(tipo_id):
     """Busca um tipo de pagamento específico (Cartao ou ContaBancaria) pelo ID.
 
@@ -684,7 +952,8 @@ def get_tipo_pagamento_by_id(tipo_id):
             # Se encontrou, verifica o tipo e cria o objeto apropriado
             if row['tipo'] == 'cartao':
                 # O modelo Cartao deve lidar com a conversão dos valores REAL para Decimal
-                return Cartao(row['id'], row['nome'], row['limite'], row['limite_disponivel'], row['user_id'])
+                return Cartao(row['id'], row['nome'], row['limite'], row['limite_disponivel'], row['user_id'],
+                              row['dia_fechamento'], row['dia_vencimento'])
             elif row['tipo'] == 'conta':
                 # O modelo ContaBancaria deve lidar com a conversão do saldo REAL para Decimal
                 return ContaBancaria(row['id'], row['nome'], row['saldo'], row['user_id'])
@@ -696,6 +965,7 @@ def get_tipo_pagamento_by_id(tipo_id):
         return None
 
 
+@_backend_alternativo
 def update_tipo_pagamento(tipo_pagamento):
     """Atualiza os dados de um tipo de pagamento (Cartao ou ContaBancaria) no banco.
 
@@ -706,14 +976,20 @@ def update_tipo_pagamento(tipo_pagamento):
     Returns:
         bool: True se a atualização foi bem-sucedida, False caso contrário.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=tipo_pagamento.user_id)
     cursor = conn.cursor()
     try:
+        # Leitura do valor anterior, UPDATE e movimentação na mesma transação (ninguém escreve no meio)
+        cursor.execute("BEGIN IMMEDIATE")
+        anterior = _valor_livro_atual(cursor, tipo_pagamento.id, tipo_pagamento.user_id)
         # Verifica o tipo do objeto passado para executar o UPDATE correto
         if isinstance(tipo_pagamento, Cartao):
             cursor.execute(
-                "UPDATE tipos_pagamento SET nome = ?, limite = ?, limite_disponivel = ? WHERE id = ? AND user_id = ?",
+                """UPDATE tipos_pagamento SET nome = ?, limite = ?, limite_disponivel = ?,
+                       dia_fechamento = ?, dia_vencimento = ?
+                   WHERE id = ? AND user_id = ?""",
                 (tipo_pagamento.nome, float(tipo_pagamento.limite), float(tipo_pagamento.limite_disponivel),
+                 tipo_pagamento.dia_fechamento, tipo_pagamento.dia_vencimento,
                  tipo_pagamento.id, tipo_pagamento.user_id)
             )
         elif isinstance(tipo_pagamento, ContaBancaria):
@@ -727,6 +1003,11 @@ def update_tipo_pagamento(tipo_pagamento):
             return False
 
         updated_rows = cursor.rowcount
+        if updated_rows:
+            # Edição do limite (cartão) ou do saldo (conta): a diferença entra no livro-razão
+            delta = _valor_livro_atual(cursor, tipo_pagamento.id, tipo_pagamento.user_id) - anterior
+            if delta:
+                _registrar_movimentacao(cursor, tipo_pagamento.id, tipo_pagamento.user_id, delta, MOTIVO_EDICAO)
         conn.commit()
         conn.close()
 
@@ -742,6 +1023,85 @@ def update_tipo_pagamento(tipo_pagamento):
         return False
 
 
+@_backend_alternativo
+def adjust_tipo_pagamento_saldo(tipo_id, user_id, delta, motivo=None, conta_id=None):
+    """Soma 'delta' ao limite disponível (cartão) ou ao saldo (conta bancária) em um único UPDATE.
+       Diferente de 'update_tipo_pagamento', não depende de um objeto lido antes,
+       então duas requisições simultâneas não sobrescrevem o ajuste uma da outra.
+       A movimentação correspondente é gravada no livro-razão na mesma transação.
+
+    Args:
+        tipo_id (int): O ID do tipo de pagamento.
+        user_id (int): O ID do usuário dono.
+        delta (Decimal | float): Valor a somar (negativo para debitar).
+        motivo (str, optional): Motivo da movimentação (ex: MOTIVO_CONTA_ADICIONADA).
+        conta_id (int, optional): Conta que originou a movimentação.
+
+    Returns:
+        bool: True se o tipo de pagamento foi encontrado e ajustado, False caso contrário.
+    """
+    try:
+        updated_rows = _executar_escrita(
+            user_id, _ajustar_saldo, tipo_id, user_id, float(delta), motivo or MOTIVO_AJUSTE, conta_id
+        )
+        return updated_rows > 0
+    except Exception as e:
+        print(f"Erro ao ajustar limite/saldo do tipo de pagamento ID {tipo_id}: {e}")
+        return False
+
+
+def _ajustar_saldo(conn, tipo_id, user_id, delta, motivo, conta_id=None):
+    """UPDATE relativo do limite disponível/saldo + movimentação no livro-razão; devolve o rowcount.
+
+    A soma é arredondada a centavos no próprio UPDATE: somas de float deixariam resíduos como 880.3000000000001.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """UPDATE tipos_pagamento
+           SET limite_disponivel = CASE WHEN tipo = 'cartao' THEN ROUND(COALESCE(limite_disponivel, 0) + ?, 2) ELSE limite_disponivel END,
+               saldo = CASE WHEN tipo = 'conta' THEN ROUND(COALESCE(saldo, 0) + ?, 2) ELSE saldo END
+           WHERE id = ? AND user_id = ?""",
+        (delta, delta, tipo_id, user_id)
+    )
+    updated_rows = cursor.rowcount
+    if updated_rows and delta:
+        _registrar_movimentacao(cursor, tipo_id, user_id, delta, motivo, conta_id)
+    return updated_rows
+
+
+@_backend_alternativo
+def avancar_recorrentes(atualizacoes):
+    """Grava um lote do rollover das recorrentes em uma única transação: o novo vencimento de cada
+       conta e o débito do valor no tipo de pagamento vinculado (com a movimentação no livro-razão).
+
+    Args:
+        atualizacoes (list[tuple]): (conta_id, user_id, novo vencimento ISO, tipo_pagamento_id ou None, valor).
+                                    Todas do mesmo banco (o do usuário da requisição, com shards).
+
+    Returns:
+        int: Quantidade de contas atualizadas (0 se erro; nada é gravado).
+    """
+    if not atualizacoes:
+        return 0
+    try:
+        return _executar_escrita(None, _avancar_recorrentes, atualizacoes)
+    except Exception as e:
+        print(f"Erro ao gravar o rollover das recorrentes: {e}")
+        return 0
+
+
+def _avancar_recorrentes(conn, atualizacoes):
+    conn.executemany(
+        "UPDATE contas SET vencimento = ? WHERE id = ?",
+        [(vencimento, conta_id) for conta_id, _, vencimento, _, _ in atualizacoes],
+    )
+    for conta_id, user_id, _, tipo_id, valor in atualizacoes:
+        if tipo_id:
+            _ajustar_saldo(conn, tipo_id, user_id, -float(valor), MOTIVO_RECORRENTE, conta_id)
+    return len(atualizacoes)
+
+
+@_backend_alternativo
 def delete_tipo_pagamento(tipo_id, user_id):
     """Deleta um tipo de pagamento (Cartao ou ContaBancaria), mas APENAS se não houver
        contas (despesas/receitas) vinculadas a ele.
@@ -754,7 +1114,7 @@ def delete_tipo_pagamento(tipo_id, user_id):
         bool: True se a exclusão foi bem-sucedida, False caso contrário
               (incluindo o caso de contas vinculadas existirem).
     """
-    conn = get_db_connection()
+    conn = get_db_connection(user_id=user_id)
     cursor = conn.cursor()
     try:
         # PASSO 1: Verificar se existem contas vinculadas a este tipo de pagamento para este usuário.
@@ -784,46 +1144,926 @@ def delete_tipo_pagamento(tipo_id, user_id):
         conn.close()
         return False
 
-def check_and_apply_schema_updates():
+
+# --- Livro-Razão de Limites e Saldos (movimentacoes + saldos_snapshot) ---
+# Toda alteração de tipos_pagamento.limite_disponivel (cartão) ou .saldo (conta bancária) grava uma
+# linha em 'movimentacoes' (delta, motivo, conta de origem, data/hora) na mesma transação do UPDATE.
+# A tabela só recebe INSERTs. A cada SNAPSHOT_A_CADA movimentações de um tipo de pagamento, o saldo
+# calculado pelo livro é gravado em 'saldos_snapshot'. Assim:
+#   - saldo atual: a própria coluna em tipos_pagamento (como antes);
+#   - saldo em uma data: último snapshot até a data + no máximo SNAPSHOT_A_CADA deltas;
+#   - conferência: último snapshot + deltas seguintes deve bater com a coluna (ver conferir_saldo).
+SNAPSHOT_A_CADA = 50
+
+MOTIVO_ABERTURA = 'abertura'
+MOTIVO_EDICAO = 'edição do limite/saldo'
+MOTIVO_AJUSTE = 'ajuste'
+MOTIVO_CONTA_ADICIONADA = 'conta adicionada'
+MOTIVO_CONTA_EDITADA = 'conta editada'
+MOTIVO_CONTA_ESTORNO = 'estorno de conta editada'
+MOTIVO_ESTORNO_DESFEITO = 'estorno desfeito (edição de conta não salva)'
+MOTIVO_CONTA_EXCLUIDA = 'conta excluída'
+MOTIVO_RECORRENTE = 'débito de recorrente'
+MOTIVO_MIGRACAO = 'saldo na criação do livro-razão'
+MOTIVO_RECONCILIACAO = 'reconciliação'
+
+# Coluna que o livro-razão acompanha, conforme o tipo
+_VALOR_LIVRO = "CASE WHEN tipo = 'cartao' THEN limite_disponivel ELSE saldo END"
+
+
+def _valor_livro_atual(cursor, tipo_id, user_id):
+    """Valor gravado (limite disponível ou saldo) do tipo de pagamento, como float (0 se não houver)."""
+    row = cursor.execute(
+        f"SELECT {_VALOR_LIVRO} FROM tipos_pagamento WHERE id = ? AND user_id = ?", (tipo_id, user_id)
+    ).fetchone()
+    return float(row[0] or 0) if row else 0.0
+
+
+def _saldo_pelo_livro(cursor, tipo_id, momento=None):
+    """Saldo calculado pelo livro-razão: último snapshot (até 'momento', se informado) + deltas seguintes.
+
+    Returns:
+        tuple: (saldo, id da última movimentação considerada).
     """
-    Verifica e aplica atualizações no schema do banco de dados.
+    filtro, params = ("", []) if momento is None else (" AND m.criado_em <= ?", [momento])
+    snapshot = cursor.execute(
+        "SELECT s.movimentacao_id, s.saldo FROM saldos_snapshot s "
+        "JOIN movimentacoes m ON m.id = s.movimentacao_id "
+        f"WHERE s.tipo_pagamento_id = ?{filtro} ORDER BY s.movimentacao_id DESC LIMIT 1",
+        [tipo_id, *params],
+    ).fetchone()
+    desde, saldo = (snapshot[0], snapshot[1]) if snapshot else (0, 0.0)
+    row = cursor.execute(
+        "SELECT COALESCE(SUM(m.delta), 0), MAX(m.id) FROM movimentacoes m "
+        f"WHERE m.tipo_pagamento_id = ? AND m.id > ?{filtro}",
+        [tipo_id, desde, *params],
+    ).fetchone()
+    return round(saldo + row[0], 2), row[1] or desde
+
+
+def _registrar_movimentacao(cursor, tipo_id, user_id, delta, motivo, conta_id=None):
+    """Grava uma movimentação (e, a cada SNAPSHOT_A_CADA, um snapshot) na transação do cursor."""
+    cursor.execute(
+        "INSERT INTO movimentacoes (tipo_pagamento_id, user_id, conta_id, delta, motivo) VALUES (?, ?, ?, ?, ?)",
+        (tipo_id, user_id, conta_id, round(float(delta), 2), motivo),
+    )
+    movimentacao_id = cursor.lastrowid
+    ultimo = cursor.execute(
+        "SELECT MAX(movimentacao_id) FROM saldos_snapshot WHERE tipo_pagamento_id = ?", (tipo_id,)
+    ).fetchone()[0] or 0
+    pendentes = cursor.execute(
+        "SELECT COUNT(*) FROM movimentacoes WHERE tipo_pagamento_id = ? AND id > ?", (tipo_id, ultimo)
+    ).fetchone()[0]
+    if pendentes >= SNAPSHOT_A_CADA:
+        # O snapshot vem do livro (e não da coluna), para que uma divergência não seja absorvida por ele
+        saldo, _ = _saldo_pelo_livro(cursor, tipo_id)
+        cursor.execute(
+            "INSERT INTO saldos_snapshot (tipo_pagamento_id, movimentacao_id, saldo) VALUES (?, ?, ?)",
+            (tipo_id, movimentacao_id, saldo),
+        )
+
+
+@_backend_alternativo
+def get_movimentacoes(tipo_id, user_id, limit=100):
+    """Últimas movimentações de um tipo de pagamento, da mais recente para a mais antiga.
 
-    Esta função é crucial para garantir que a estrutura do banco de dados
-    esteja sempre atualizada com as mudanças mais recentes na aplicação.
-    Ela realiza verificações para cada alteração necessária e aplica
-    apenas se a alteração ainda não tiver sido feita.
+    Returns:
+        list[dict]: id, delta, motivo, criado_em, conta_id e conta_nome (None se a conta foi excluída).
+                    Lista vazia se erro.
     """
+    conn = get_db_connection(user_id=user_id)
+    try:
+        cursor = conn.execute(
+            """SELECT m.id, m.delta, m.motivo, m.criado_em, m.conta_id, c.nome AS conta_nome
+               FROM movimentacoes m
+               LEFT JOIN contas c ON c.id = m.conta_id
+               WHERE m.tipo_pagamento_id = ? AND m.user_id = ?
+               ORDER BY m.id DESC
+               LIMIT ?""",
+            (tipo_id, user_id, limit),
+        )
+        movimentacoes = [dict(row) for row in cursor]
+        conn.close()
+        return movimentacoes
+    except Exception as e:
+        print(f"Erro ao buscar movimentações do tipo de pagamento ID {tipo_id}: {e}")
+        conn.close()
+        return []
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
+def get_saldo_em(tipo_id, user_id, momento):
+    """Limite disponível/saldo do tipo de pagamento em um momento passado, pelo livro-razão.
+
+    Args:
+        tipo_id (int): O ID do tipo de pagamento.
+        user_id (int): O ID do usuário dono.
+        momento (datetime): Data/hora (UTC, como 'movimentacoes.criado_em').
+
+    Returns:
+        float or None: O saldo naquele momento, ou None se o tipo não for do usuário ou em caso de erro.
+    """
+    conn = get_db_connection(user_id=user_id)
     try:
-        # Exemplo 1: Adicionar a coluna 'valor_total_compra' à tabela 'contas'
-        # se ela não existir.
-        cursor.execute("PRAGMA table_info(contas)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'valor_total_compra' not in columns:
-            print("Coluna 'valor_total_compra' não encontrada. Adicionando...")
-            cursor.execute("ALTER TABLE contas ADD COLUMN valor_total_compra REAL")
-            conn.commit()
-            print("Coluna 'valor_total_compra' adicionada com sucesso.")
-
-        # Exemplo 2: Adicionar a coluna 'tipo_pagamento_id' à tabela 'contas'
-        # se ela não existir.  Este exemplo inclui a criação da chave estrangeira.
-        cursor.execute("PRAGMA table_info(contas)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'tipo_pagamento_id' not in columns:
-            print("Coluna 'tipo_pagamento_id' não encontrada. Adicionando...")
-            cursor.execute("ALTER TABLE contas ADD COLUMN tipo_pagamento_id INTEGER")
-            cursor.execute("CREATE INDEX idx_contas_tipo_pagamento_id ON contas (tipo_pagamento_id)")
-            cursor.execute("ALTER TABLE contas ADD CONSTRAINT fk_contas_tipos_pagamento FOREIGN KEY (tipo_pagamento_id) REFERENCES tipos_pagamento(id) ON DELETE SET NULL")
-            conn.commit()
-            print("Coluna 'tipo_pagamento_id' adicionada com sucesso.")
-    except sqlite3.Error as e:
-        print(f"Erro ao aplicar atualizações de schema: {e}")
+        if not conn.execute("SELECT 1 FROM tipos_pagamento WHERE id = ? AND user_id = ?", (tipo_id, user_id)).fetchone():
+            conn.close()
+            return None
+        saldo, _ = _saldo_pelo_livro(conn.cursor(), tipo_id, momento.isoformat(" ", "seconds"))
+        conn.close()
+        return saldo
+    except Exception as e:
+        print(f"Erro ao calcular saldo histórico do tipo de pagamento ID {tipo_id}: {e}")
+        conn.close()
+        return None
+
+
+def conferir_saldo(tipo_id, user_id):
+    """Compara o valor gravado em tipos_pagamento com o calculado pelo livro-razão.
+
+    Returns:
+        dict or None: 'gravado', 'calculado' e 'diferenca' (gravado - calculado; 0 = sem divergência).
+                      None se o tipo não for do usuário ou em caso de erro.
+    """
+    conn = get_db_connection(user_id=user_id)
+    try:
+        cursor = conn.cursor()
+        if not cursor.execute("SELECT 1 FROM tipos_pagamento WHERE id = ? AND user_id = ?", (tipo_id, user_id)).fetchone():
+            conn.close()
+            return None
+        # Mesma leitura (snapshot) para a coluna e para o livro
+        cursor.execute("BEGIN")
+        gravado = round(_valor_livro_atual(cursor, tipo_id, user_id), 2)
+        calculado, _ = _saldo_pelo_livro(cursor, tipo_id)
         conn.rollback()
+        conn.close()
+        return {'gravado': gravado, 'calculado': calculado, 'diferenca': round(gravado - calculado, 2)}
+    except Exception as e:
+        print(f"Erro ao conferir saldo do tipo de pagamento ID {tipo_id}: {e}")
+        conn.close()
+        return None
+
+
+# --- Reconciliação de Limites e Saldos ---
+# O ajuste de uma conta passa por vários passos separados (em edit_conta: estorno no tipo antigo,
+# UPDATE da conta, débito no tipo novo); se um falhar no meio, o limite/saldo fica com um valor que
+# as contas não explicam. O valor esperado é recalculado pelo livro-razão, conta a conta:
+#
+#   esperado = soma das movimentações - movimentações de reconciliação - desvio das contas
+#
+# Para cada conta com movimentações "de conta" (adicionada/editada/estorno/estorno desfeito/excluída) em um tipo de
+# pagamento, o efeito líquido delas deveria ser:
+#   + o valor devolvido pela primeira, se for um estorno/exclusão (conta anterior ao livro-razão)
+#   - o valor total da conta, se ela ainda está vinculada a este tipo de pagamento
+# O desvio é a diferença entre o efeito registrado e esse efeito esperado. Divergências anteriores à
+# migração 9 ficam no saldo de abertura do livro e não são detectadas.
+_MOTIVOS_CONTA = (
+    MOTIVO_CONTA_ADICIONADA, MOTIVO_CONTA_EDITADA, MOTIVO_CONTA_ESTORNO, MOTIVO_ESTORNO_DESFEITO, MOTIVO_CONTA_EXCLUIDA,
+)
+_MOTIVOS_DEVOLUCAO = (MOTIVO_CONTA_ESTORNO, MOTIVO_CONTA_EXCLUIDA)
+
+# Uma consulta agregada para todos os tipos de pagamento de um intervalo de usuários
+_RECONCILIACAO_SQL = f"""
+    WITH mov AS (
+        SELECT m.id, m.tipo_pagamento_id, m.conta_id, m.delta, m.motivo
+        FROM tipos_pagamento t
+        JOIN movimentacoes m ON m.tipo_pagamento_id = t.id
+        WHERE t.user_id BETWEEN :inicio AND :fim
+    ),
+    por_conta AS (
+        SELECT tipo_pagamento_id, conta_id, SUM(delta) AS liquido, MIN(id) AS primeira
+        FROM mov
+        WHERE conta_id IS NOT NULL AND motivo IN ({", ".join(f":m{i}" for i in range(1, len(_MOTIVOS_CONTA) + 1))})
+        GROUP BY tipo_pagamento_id, conta_id
+    ),
+    desvio AS (
+        SELECT p.tipo_pagamento_id,
+               SUM(p.liquido
+                   - CASE WHEN primeira.motivo IN ({", ".join(f":d{i}" for i in range(1, len(_MOTIVOS_DEVOLUCAO) + 1))}) THEN primeira.delta ELSE 0 END
+                   + CASE WHEN c.tipo_pagamento_id = p.tipo_pagamento_id
+                          THEN COALESCE(c.valor_total_compra, c.valor) ELSE 0 END) AS valor
+        FROM por_conta p
+        JOIN movimentacoes primeira ON primeira.id = p.primeira
+        LEFT JOIN contas c ON c.id = p.conta_id
+        GROUP BY p.tipo_pagamento_id
+    ),
+    livro AS (
+        SELECT tipo_pagamento_id,
+               SUM(delta) AS valor,
+               SUM(CASE WHEN motivo = :reconciliacao THEN delta ELSE 0 END) AS reconciliado
+        FROM mov
+        GROUP BY tipo_pagamento_id
+    )
+    SELECT t.id, t.user_id, t.nome, t.tipo,
+           ROUND(COALESCE({_VALOR_LIVRO}, 0), 2) AS gravado,
+           ROUND(COALESCE(l.valor, 0), 2) AS livro,
+           ROUND(COALESCE(l.valor, 0) - COALESCE(l.reconciliado, 0) - COALESCE(d.valor, 0), 2) AS esperado
+    FROM tipos_pagamento t
+    LEFT JOIN livro l ON l.tipo_pagamento_id = t.id
+    LEFT JOIN desvio d ON d.tipo_pagamento_id = t.id
+    WHERE t.user_id BETWEEN :inicio AND :fim
+    ORDER BY t.id
+"""
+
+
+def get_divergencias_saldo(user_inicio, user_fim, db_file=None):
+    """Tipos de pagamento dos usuários com ID entre user_inicio e user_fim (inclusive) cujo valor
+       gravado difere do esperado pelas contas (ver "Reconciliação de Limites e Saldos").
+
+    Returns:
+        list[dict]: id, user_id, nome, tipo, gravado, livro e esperado. Lista vazia se erro.
+    """
+    conn = get_db_connection(db_file)
+    try:
+        parametros = {
+            "inicio": user_inicio, "fim": user_fim, "reconciliacao": MOTIVO_RECONCILIACAO,
+            **{f"m{i}": motivo for i, motivo in enumerate(_MOTIVOS_CONTA, start=1)},
+            **{f"d{i}": motivo for i, motivo in enumerate(_MOTIVOS_DEVOLUCAO, start=1)},
+        }
+        divergencias = [
+            dict(row) for row in conn.execute(_RECONCILIACAO_SQL, parametros)
+            if abs(row["gravado"] - row["esperado"]) >= 0.005 or abs(row["gravado"] - row["livro"]) >= 0.005
+        ]
+        conn.close()
+        return divergencias
+    except Exception as e:
+        print(f"Erro ao reconciliar usuários {user_inicio}..{user_fim}: {e}")
+        conn.close()
+        return []
+
+
+def corrigir_saldos(divergencias, db_file=None):
+    """Grava o valor esperado nos tipos de pagamento divergentes, em uma única transação.
+
+    A correção é relativa (valor + (esperado - gravado lido)) e vem com uma movimentação de
+    reconciliação que leva o livro-razão ao mesmo valor: um ajuste feito pelo app entre a leitura e
+    a correção muda o gravado, o livro e o esperado igualmente e não é perdido.
+
+    Args:
+        divergencias (list[dict]): Itens de get_divergencias_saldo.
+
+    Returns:
+        int: Quantidade de tipos de pagamento corrigidos (0 se erro; nada é gravado).
+    """
+    conn = get_db_connection(db_file)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany(
+            """UPDATE tipos_pagamento
+               SET limite_disponivel = CASE WHEN tipo = 'cartao' THEN ROUND(COALESCE(limite_disponivel, 0) + ?, 2) ELSE limite_disponivel END,
+                   saldo = CASE WHEN tipo = 'conta' THEN ROUND(COALESCE(saldo, 0) + ?, 2) ELSE saldo END
+               WHERE id = ?""",
+            [(d["esperado"] - d["gravado"], d["esperado"] - d["gravado"], d["id"]) for d in divergencias],
+        )
+        for d in divergencias:
+            if round(d["esperado"] - d["livro"], 2):
+                _registrar_movimentacao(cursor, d["id"], d["user_id"], d["esperado"] - d["livro"], MOTIVO_RECONCILIACAO)
+        conn.commit()
+        conn.close()
+        return len(divergencias)
+    except Exception as e:
+        print(f"Erro ao corrigir limites/saldos: {e}")
+        conn.rollback()
+        conn.close()
+        return 0
+
+# --- Faturas de Cartão ---
+# Lançamentos de um cartão entre duas datas: avulsas pelo vencimento, parceladas com uma linha por
+# parcela no mês (mesma regra de parcelas.py: dia da 1ª parcela, limitado ao fim do mês) e recorrentes
+# com uma linha por mês a partir do vencimento atual. 'meses' tem um mês por linha, do início ao fim
+# do intervalo, então a expansão é proporcional ao intervalo pedido e não ao tamanho do histórico.
+# Cada ramo filtra pelo cartão e por intervalo de datas nos índices (tipo_pagamento_id, vencimento)
+# e (tipo_pagamento_id, ultimo_vencimento).
+_LANCAMENTOS_CARTAO = """
+    WITH RECURSIVE meses(mes) AS (
+        SELECT date(:inicio, 'start of month')
+        UNION ALL
+        SELECT date(mes, '+1 month') FROM meses WHERE mes < date(:fim, 'start of month')
+    ),
+    lancamentos(nome, valor, data, parcela_atual, total_parcelas) AS (
+        SELECT c.nome, c.valor, date(c.vencimento), NULL, NULL
+        FROM contas c
+        WHERE c.tipo_pagamento_id = :cartao AND c.user_id = :user_id
+          AND c.vencimento >= :inicio AND c.vencimento < :fim
+          AND c.primeiro_vencimento IS NULL AND c.recorrente = 0
+        UNION ALL
+        SELECT c.nome, c.valor,
+               MIN(date(m.mes, '+' || (CAST(strftime('%d', c.primeiro_vencimento) AS INTEGER) - 1) || ' days'),
+                   date(m.mes, '+1 month', '-1 day')),
+               (CAST(strftime('%Y', m.mes) AS INTEGER) - CAST(strftime('%Y', c.primeiro_vencimento) AS INTEGER)) * 12
+                 + CAST(strftime('%m', m.mes) AS INTEGER) - CAST(strftime('%m', c.primeiro_vencimento) AS INTEGER) + 1,
+               c.total_parcelas
+        FROM contas c
+        JOIN meses m ON m.mes >= date(c.primeiro_vencimento, 'start of month') AND m.mes <= c.ultimo_vencimento
+        WHERE c.tipo_pagamento_id = :cartao AND c.user_id = :user_id
+          AND c.ultimo_vencimento >= :inicio AND c.primeiro_vencimento < :fim
+        UNION ALL
+        SELECT c.nome, c.valor,
+               MIN(date(m.mes, '+' || (CAST(strftime('%d', c.vencimento) AS INTEGER) - 1) || ' days'),
+                   date(m.mes, '+1 month', '-1 day')),
+               NULL, NULL
+        FROM contas c
+        JOIN meses m ON m.mes >= date(c.vencimento, 'start of month')
+        WHERE c.tipo_pagamento_id = :cartao AND c.user_id = :user_id
+          AND c.vencimento < :fim
+          AND c.primeiro_vencimento IS NULL AND c.recorrente = 1
+    )
+"""
+
+# Ciclo (dia 1 do mês do fechamento) de um lançamento, como em faturas.ciclo_de
+_CICLO_SQL = """CASE WHEN CAST(strftime('%d', data) AS INTEGER) <= :dia_fechamento
+                     THEN date(data, 'start of month')
+                     ELSE date(data, 'start of month', '+1 month') END"""
+
+
+def _parametros_fatura(cartao, user_id, inicio, fim):
+    return {'cartao': cartao.id, 'user_id': user_id, 'inicio': inicio.isoformat(), 'fim': fim.isoformat(),
+            'dia_fechamento': cartao.dia_fechamento}
+
+
+def get_totais_faturas(cartao, user_id, inicio, fim):
+    """Quantidade de lançamentos e total de cada fatura do cartão, calculados no banco.
+
+    Args:
+        cartao (Cartao): Cartão (com dia_fechamento definido).
+        user_id (int): O ID do usuário dono.
+        inicio (date): Primeiro dia do intervalo (inclusivo).
+        fim (date): Último dia do intervalo (exclusivo).
+
+    Returns:
+        dict: ciclo (date, dia 1 do mês do fechamento) -> (quantidade, total). Vazio se erro.
+    """
+    conn = get_db_connection(user_id=user_id)
+    try:
+        cursor = conn.execute(
+            _LANCAMENTOS_CARTAO + f"""
+            SELECT {_CICLO_SQL} AS ciclo, COUNT(*) AS quantidade, ROUND(SUM(valor), 2) AS total
+            FROM lancamentos
+            WHERE data >= :inicio AND data < :fim
+            GROUP BY ciclo
+            """,
+            _parametros_fatura(cartao, user_id, inicio, fim),
+        )
+        totais = {date.fromisoformat(row['ciclo']): (row['quantidade'], row['total']) for row in cursor}
+        conn.close()
+        return totais
+    except Exception as e:
+        print(f"Erro ao calcular faturas do cartão ID {cartao.id}: {e}")
+        conn.close()
+        return {}
+
+
+def get_lancamentos_fatura(cartao, user_id, inicio, fim):
+    """Lançamentos do cartão entre 'inicio' (inclusivo) e 'fim' (exclusivo), em ordem de data.
+
+    Returns:
+        list[dict]: nome, valor, data (date), parcela_atual e total_parcelas. Vazia se erro.
+    """
+    conn = get_db_connection(user_id=user_id)
+    try:
+        cursor = conn.execute(
+            _LANCAMENTOS_CARTAO + "SELECT * FROM lancamentos WHERE data >= :inicio AND data < :fim",
+            _parametros_fatura(cartao, user_id, inicio, fim),
+        )
+        lancamentos = [dict(row, data=date.fromisoformat(row['data'])) for row in cursor]
+        conn.close()
+        # Ordenado aqui: são poucas linhas e a ordem não vem de um índice
+        lancamentos.sort(key=lambda l: (l['data'], l['nome']))
+        return lancamentos
+    except Exception as e:
+        print(f"Erro ao buscar lançamentos da fatura do cartão ID {cartao.id}: {e}")
+        conn.close()
+        return []
+
+# --- Consultas da API JSON (seleção de campos e paginação por chave) ---
+
+# Colunas que a API pode devolver para cada tabela. Serve como lista branca:
+# somente nomes presentes aqui são interpolados no SELECT.
+API_COLUMNS = {
+    'contas': ('id', 'nome', 'valor', 'valor_total_compra', 'vencimento', 'categoria_id',
+               'parcela_atual', 'total_parcelas', 'recorrente', 'tipo_pagamento_id', 'user_id',
+               'primeiro_vencimento', 'ultimo_vencimento'),
+    'categorias': ('id', 'nome', 'user_id'),
+    'tipos_pagamento': ('id', 'nome', 'tipo', 'limite', 'limite_disponivel', 'saldo', 'user_id',
+                        'dia_fechamento', 'dia_vencimento'),
+}
+
+
+def _colunas_api(tabela, colunas):
+    """Valida as colunas pedidas à API; devolve (colunas a ler, extras só para o cronograma)."""
+    if tabela not in API_COLUMNS:
+        raise ValueError(f"Tabela não exposta pela API: {tabela}")
+    colunas = list(colunas) if colunas else list(API_COLUMNS[tabela])
+    invalidas = [c for c in colunas if c not in API_COLUMNS[tabela]]
+    if invalidas:
+        raise ValueError(f"Campos inválidos para {tabela}: {', '.join(invalidas)}")
+    # O id é necessário para montar o cursor da próxima página
+    if 'id' not in colunas:
+        colunas.insert(0, 'id')
+    # Vencimento/parcela das parceladas são calculados a partir do cronograma
+    extras = []
+    if tabela == 'contas' and ('vencimento' in colunas or 'parcela_atual' in colunas):
+        extras = [c for c in ('primeiro_vencimento', 'total_parcelas') if c not in colunas]
+        colunas += extras
+    return colunas, extras
+
+
+def _linhas_api(linhas, extras):
+    """Aplica o cronograma às linhas (dicts) e remove as colunas extras."""
+    if extras:
+        hoje = date.today()
+        for linha in linhas:
+            aplicar_cronograma(linha, hoje)
+            for coluna in extras:
+                del linha[coluna]
+    return linhas
+
+
+@_backend_alternativo
+def get_rows_by_user(tabela, user_id, colunas=None, after_id=None, limit=None, ids=None):
+    """Busca linhas de uma tabela pertencentes ao usuário, como dicionários, lendo apenas as colunas pedidas.
+
+    A ordenação é sempre por 'id', o que permite paginação por chave (keyset):
+    a próxima página começa no primeiro id maior que o último recebido, sem OFFSET.
+
+    Args:
+        tabela (str): 'contas', 'categorias' ou 'tipos_pagamento' (ver API_COLUMNS).
+        user_id (int): O ID do usuário dono das linhas.
+        colunas (list[str], optional): Colunas desejadas. None devolve todas as colunas expostas.
+        after_id (int, optional): Retorna apenas linhas com id maior que este.
+        limit (int, optional): Quantidade máxima de linhas.
+        ids (list[int], optional): Restringe a busca a estes IDs (busca em lote).
+
+    Returns:
+        list[dict]: As linhas encontradas, ordenadas por id. Lista vazia em caso de erro.
+
+    Raises:
+        ValueError: Se a tabela ou alguma coluna não for exposta pela API.
+    """
+    colunas, extras = _colunas_api(tabela, colunas)
+    query = f"SELECT {', '.join(colunas)} FROM {tabela} WHERE user_id = ?"
+    params = [user_id]
+    if ids is not None:
+        if not ids:
+            return []
+        query += f" AND id IN ({', '.join('?' * len(ids))})"
+        params.extend(ids)
+    if after_id is not None:
+        query += " AND id > ?"
+        params.append(after_id)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    conn = get_db_connection(user_id=user_id)
+    try:
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        return _linhas_api([dict(row) for row in rows], extras)
+    except Exception as e:
+        print(f"Erro ao buscar {tabela} para user ID {user_id}: {e}")
+        conn.close()
+        return []
+
+
+# --- Busca Textual (FTS5) ---
+# contas_fts é uma tabela FTS5 de "conteúdo externo": guarda só o índice invertido de contas.nome
+# (o texto continua em contas, rowid = contas.id). Os triggers abaixo a mantêm em sincronia em
+# qualquer caminho de escrita. 'remove_diacritics 2' faz "agua" encontrar "Água".
+CONTAS_FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS trg_contas_fts_insert AFTER INSERT ON contas
+        BEGIN
+            INSERT INTO contas_fts (rowid, nome) VALUES (NEW.id, NEW.nome);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_contas_fts_delete AFTER DELETE ON contas
+        BEGIN
+            INSERT INTO contas_fts (contas_fts, rowid, nome) VALUES ('delete', OLD.id, OLD.nome);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_contas_fts_update AFTER UPDATE OF nome ON contas
+        BEGIN
+            INSERT INTO contas_fts (contas_fts, rowid, nome) VALUES ('delete', OLD.id, OLD.nome);
+            INSERT INTO contas_fts (rowid, nome) VALUES (NEW.id, NEW.nome);
+        END""",
+]
+
+_PALAVRA = re.compile(r"\w+")
+
+
+def montar_consulta_fts(texto):
+    """Converte o texto digitado em uma consulta FTS5: cada palavra vira um prefixo ("netf"*),
+    todas obrigatórias. Pontuação e operadores do FTS5 são descartados. None se não houver palavras."""
+    palavras = _PALAVRA.findall(texto or "")
+    if not palavras:
+        return None
+    return " ".join(f'"{p}"*' for p in palavras)
+
+
+def search_contas(user_id, texto, categoria_ids=None, data_inicio=None, data_fim=None, limit=20):
+    """Busca contas do usuário pelo nome (prefixo de cada palavra), das mais relevantes para as menos.
+
+    Args:
+        user_id (int): O ID do usuário dono das contas.
+        texto (str): O texto digitado (ex: "netf" encontra "Netflix").
+        categoria_ids (list[int], optional): Restringe às categorias informadas.
+        data_inicio, data_fim (date, optional): Intervalo de vencimento (inclusivo). Nas parceladas
+            vale o vencimento da parcela atual, o mesmo devolvido no resultado.
+        limit (int): Quantidade máxima de resultados.
+
+    Returns:
+        list[dict]: id, nome, valor, vencimento, categoria_id, categoria_nome, parcela_atual,
+            total_parcelas, primeiro_vencimento e relevancia (bm25; menor = mais relevante). Lista vazia se não houver palavras ou em caso de erro.
+    """
+    consulta = montar_consulta_fts(texto)
+    if consulta is None:
+        return []
+    query = (
+        "SELECT c.id, c.nome, c.valor, c.vencimento, c.categoria_id, cat.nome AS categoria_nome, "
+        "c.parcela_atual, c.total_parcelas, c.primeiro_vencimento, bm25(contas_fts) AS relevancia "
+        "FROM contas_fts JOIN contas c ON c.id = contas_fts.rowid "
+        "LEFT JOIN categorias cat ON cat.id = c.categoria_id "
+        "WHERE contas_fts MATCH ? AND c.user_id = ?"
+    )
+    params = [consulta, user_id]
+    if categoria_ids:
+        query += f" AND c.categoria_id IN ({', '.join('?' * len(categoria_ids))})"
+        params.extend(categoria_ids)
+    filtrar_datas = data_inicio is not None or data_fim is not None
+    if filtrar_datas:
+        # Parceladas: o 'vencimento' gravado não é atualizado (ver parcelas.py). No SQL fica só um
+        # pré-filtro pelo cronograma (primeiro/último vencimento, como no relatório mensal); a
+        # parcela atual é conferida depois de aplicar_cronograma
+        avulsas, parceladas, params_avulsas, params_parceladas = [], [], [], []
+        if data_inicio is not None:
+            avulsas.append("c.vencimento >= ?")
+            parceladas.append("c.ultimo_vencimento >= ?")
+            params_avulsas.append(data_inicio.isoformat())
+            params_parceladas.append(data_inicio.isoformat())
+        if data_fim is not None:
+            # Vencimentos podem ter hora ('AAAA-MM-DD HH:MM:SS'): compara com o dia seguinte
+            avulsas.append("c.vencimento < date(?, '+1 day')")
+            parceladas.append("c.primeiro_vencimento < date(?, '+1 day')")
+            params_avulsas.append(data_fim.isoformat())
+            params_parceladas.append(data_fim.isoformat())
+        query += (
+            f" AND ((c.primeiro_vencimento IS NULL AND {' AND '.join(avulsas)})"
+            f" OR (c.primeiro_vencimento IS NOT NULL AND {' AND '.join(parceladas)}))"
+        )
+        params.extend(params_avulsas + params_parceladas)
+    query += " ORDER BY relevancia, c.vencimento DESC"
+    if not filtrar_datas:
+        # Com datas, o limite é aplicado depois de conferir a parcela atual das parceladas
+        query += " LIMIT ?"
+        params.append(limit)
+
+    conn = get_db_connection(user_id=user_id)
+    try:
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        hoje = date.today()
+        resultado = []
+        for row in rows:
+            linha = aplicar_cronograma(dict(row), hoje)
+            vencimento = date.fromisoformat(str(linha['vencimento'])[:10])
+            if data_inicio is not None and vencimento < data_inicio:
+                continue
+            if data_fim is not None and vencimento > data_fim:
+                continue
+            resultado.append(linha)
+            if len(resultado) == limit:
+                break
+        return resultado
+    except Exception as e:
+        print(f"Erro na busca de contas para user ID {user_id}: {e}")
+        conn.close()
+        return []
+
+
+# --- Versão dos Dados por Usuário ---
+# Toda escrita em contas, categorias ou tipos_pagamento incrementa users.data_version do dono
+# da linha. Como é feito por trigger, vale para qualquer caminho de escrita (telas, API,
+# atualização automática de parcelas/recorrentes) sem depender de cada função lembrar disso.
+# A versão é usada para montar ETags e responder 304 sem refazer consultas pesadas.
+DATA_VERSION_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{evento.lower()}_data_version
+        AFTER {evento} ON {tabela}
+        BEGIN
+            UPDATE users SET data_version = data_version + 1 WHERE id = {linha}.user_id;
+        END"""
+    for tabela in ('contas', 'categorias', 'tipos_pagamento')
+    for evento, linha in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))
+]
+
+
+@_backend_alternativo
+def get_data_version(user_id):
+    """Retorna a versão atual dos dados do usuário (0 se não encontrado ou em caso de erro).
+
+    Args:
+        user_id (int): O ID do usuário.
+
+    Returns:
+        int: Número que só cresce a cada escrita nos dados do usuário.
+    """
+    conn = get_db_connection(user_id=user_id)
+    try:
+        row = conn.execute("SELECT data_version FROM users WHERE id = ?", (user_id,)).fetchone()
+        conn.close()
+        return row['data_version'] if row else 0
+    except Exception as e:
+        print(f"Erro ao buscar versão dos dados para user ID {user_id}: {e}")
+        conn.close()
+        return 0
+
+
+# --- Migrações do Schema ---
+# Cada migração é uma função que recebe o cursor e altera o schema. Elas são aplicadas em ordem
+# e o número da última aplicada fica gravado no próprio arquivo do banco ('PRAGMA user_version').
+# Para mudar o schema, adicione uma NOVA função ao final de MIGRATIONS (nunca altere as já
+# publicadas). As migrações também precisam funcionar em bancos antigos, criados antes
+# deste controle de versão (user_version = 0), que já podem ter parte das alterações.
+
+def _colunas(cursor, tabela):
+    """Retorna os nomes das colunas de uma tabela."""
+    cursor.execute(f"PRAGMA table_info({tabela})")
+    return [col[1] for col in cursor.fetchall()]
+
+
+def _migracao_tabelas_base(cursor):
+    """1: Tabelas 'users', 'categorias', 'tipos_pagamento' e 'contas'."""
+    # --- Criação da Tabela de Usuários ---
+    # Guarda informações de login dos usuários.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, -- Chave primária única e auto-incremental
+            username TEXT UNIQUE NOT NULL,        -- Nome de usuário (deve ser único)
+            password TEXT NOT NULL                 -- Hash da senha do usuário
+        )
+    """)
+
+    # --- Criação da Tabela de Categorias ---
+    # Armazena as categorias criadas pelos usuários para classificar contas.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categorias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, -- Chave primária da categoria
+            nome TEXT NOT NULL,                   -- Nome da categoria (ex: "Alimentação", "Transporte")
+            user_id INTEGER NOT NULL,             -- Chave estrangeira referenciando o usuário dono da categoria
+            UNIQUE(nome, user_id),                -- Garante que um mesmo usuário não pode ter duas categorias com o mesmo nome
+            FOREIGN KEY (user_id) REFERENCES users(id) -- Define a relação com a tabela 'users'
+                ON DELETE CASCADE                     -- IMPORTANTE: Se um usuário for deletado, suas categorias também serão (efeito cascata)
+        )
+    """)
+
+    # --- Criação da Tabela de Tipos de Pagamento ---
+    # Armazena informações de Cartões de Crédito e Contas Bancárias usados para pagar/receber contas.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tipos_pagamento (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, -- Chave primária do tipo de pagamento
+            nome TEXT NOT NULL,                   -- Nome dado pelo usuário (ex: "Cartão Nubank", "Conta Itaú")
+            tipo TEXT NOT NULL,                   -- Tipo: 'cartao' ou 'conta' (para diferenciar a lógica)
+            limite REAL,                          -- Limite total (usado apenas para 'cartao', armazena como número real/float)
+            limite_disponivel REAL,               -- Limite disponível (usado apenas para 'cartao', armazena como real/float)
+            saldo REAL,                           -- Saldo atual (usado apenas para 'conta', armazena como real/float)
+            user_id INTEGER NOT NULL,             -- Chave estrangeira referenciando o usuário dono
+            FOREIGN KEY (user_id) REFERENCES users(id) -- Define a relação com 'users'
+                ON DELETE CASCADE                     -- IMPORTANTE: Se um usuário for deletado, seus tipos de pagamento também serão
+        )
+    """)
+
+    # --- Criação da Tabela de Contas (Despesas/Receitas) ---
+    # Armazena os registros de contas a pagar ou receber.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS contas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, -- Chave primária da conta
+            nome TEXT NOT NULL,                   -- Descrição da conta (ex: "Supermercado", "Salário")
+            valor REAL NOT NULL,                  -- Valor da conta (armazena como número real/float)
+            valor_total_compra REAL,                -- Valor total da compra (para parcelamentos)
+            vencimento TEXT NOT NULL,             -- Data de vencimento (armazena como texto no formato ISO 'YYYY-MM-DD')
+            categoria_id INTEGER,                 -- Chave estrangeira referenciando a categoria (opcional)
+            parcela_atual INTEGER,                -- Número da parcela atual (se for conta parcelada)
+            total_parcelas INTEGER,               -- Número total de parcelas (se for conta parcelada)
+            user_id INTEGER NOT NULL,             -- Chave estrangeira referenciando o usuário dono
+            recorrente INTEGER DEFAULT 0,         -- Flag para conta recorrente (0 = Não, 1 = Sim)
+            tipo_pagamento_id INTEGER,            -- Chave estrangeira referenciando o tipo de pagamento usado (opcional)
+            FOREIGN KEY (user_id) REFERENCES users(id) -- Relação com 'users'
+                ON DELETE CASCADE,                    -- Deleta contas se o usuário for deletado
+            FOREIGN KEY (tipo_pagamento_id) REFERENCES tipos_pagamento(id) -- Relação com 'tipos_pagamento'
+                ON DELETE SET NULL,                   -- IMPORTANTE: Se o tipo de pagamento for deletado, define este campo como NULL na conta (não deleta a conta)
+            FOREIGN KEY (categoria_id) REFERENCES categorias(id) -- Relação com 'categorias'
+                ON DELETE SET NULL                    -- IMPORTANTE: Se a categoria for deletada, define este campo como NULL na conta (não deleta a conta)
+        )
+    """)
+
+
+def _migracao_valor_total_compra(cursor):
+    """2: Coluna 'valor_total_compra' em 'contas' (valor total de compras parceladas)."""
+    if 'valor_total_compra' not in _colunas(cursor, 'contas'):
+        cursor.execute("ALTER TABLE contas ADD COLUMN valor_total_compra REAL")
+
+
+def _migracao_tipo_pagamento_contas(cursor):
+    """3: Coluna 'tipo_pagamento_id' em 'contas' e índice correspondente."""
+    if 'tipo_pagamento_id' not in _colunas(cursor, 'contas'):
+        # SQLite não suporta 'ADD CONSTRAINT'; a chave estrangeira vai na própria coluna
+        cursor.execute(
+            "ALTER TABLE contas ADD COLUMN tipo_pagamento_id INTEGER "
+            "REFERENCES tipos_pagamento(id) ON DELETE SET NULL"
+        )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contas_tipo_pagamento_id ON contas (tipo_pagamento_id)")
+
+
+def _migracao_data_version(cursor):
+    """4: Versão dos dados por usuário: coluna em 'users' + triggers que a incrementam."""
+    if 'data_version' not in _colunas(cursor, 'users'):
+        cursor.execute("ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+    for sql in DATA_VERSION_TRIGGERS:
+        cursor.execute(sql)
+
+
+def _migracao_indices_consultas(cursor):
+    """5: Índices das consultas por usuário, por vencimento e do rollover (ver verificar_planos.py)."""
+    # Listagens por usuário e paginação da API (WHERE user_id = ? ORDER BY id; o rowid vem no índice)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contas_user_id ON contas (user_id)")
+    # Dashboard (ORDER BY vencimento DESC, id DESC) e relatório (intervalo de vencimento no mês)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contas_user_vencimento ON contas (user_id, vencimento)")
+    # Rollover: WHERE ... date(vencimento) < ? em todas as contas
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contas_data_vencimento ON contas (date(vencimento))")
+    # Tipos de pagamento: listagem por nome (telas) e por id (API)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tipos_pagamento_user_nome ON tipos_pagamento (user_id, nome)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tipos_pagamento_user_id ON tipos_pagamento (user_id)")
+
+
+def _migracao_contas_fts(cursor):
+    """6: Busca textual: tabela FTS5 'contas_fts' sobre contas.nome, com triggers de sincronia."""
+    cursor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS contas_fts USING fts5("
+        "nome, content='contas', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    for sql in CONTAS_FTS_TRIGGERS:
+        cursor.execute(sql)
+    # Indexa as contas já existentes
+    cursor.execute("INSERT INTO contas_fts (contas_fts) VALUES ('rebuild')")
+
+
+def _migracao_cronograma_parcelas(cursor):
+    """7: Cronograma de parcelas: colunas 'primeiro_vencimento'/'ultimo_vencimento' em 'contas'."""
+    colunas = _colunas(cursor, 'contas')
+    for coluna in ('primeiro_vencimento', 'ultimo_vencimento'):
+        if coluna not in colunas:
+            cursor.execute(f"ALTER TABLE contas ADD COLUMN {coluna} TEXT")
+    # Parceladas existentes: a 1ª parcela venceu (parcela_atual - 1) meses antes do vencimento gravado
+    linhas = cursor.execute(
+        "SELECT id, vencimento, parcela_atual, total_parcelas FROM contas "
+        "WHERE total_parcelas > 0 AND primeiro_vencimento IS NULL"
+    ).fetchall()
+    valores = []
+    for conta_id, vencimento, parcela_atual, total_parcelas in linhas:
+        primeiro, ultimo = _limites_para_gravar(str(vencimento)[:10], parcela_atual, total_parcelas)
+        if primeiro:
+            valores.append((primeiro, ultimo, conta_id))
+    cursor.executemany("UPDATE contas SET primeiro_vencimento = ?, ultimo_vencimento = ? WHERE id = ?", valores)
+    # Relatório: parcelas com vencimento no mês = ultimo_vencimento >= início e primeiro_vencimento < fim
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contas_user_ultimo_vencimento ON contas (user_id, ultimo_vencimento)")
+
+
+def _migracao_faturas_cartao(cursor):
+    """8: Faturas de cartão: dias de fechamento/vencimento em 'tipos_pagamento' e índices de contas por cartão."""
+    colunas = _colunas(cursor, 'tipos_pagamento')
+    for coluna in ('dia_fechamento', 'dia_vencimento'):
+        if coluna not in colunas:
+            cursor.execute(f"ALTER TABLE tipos_pagamento ADD COLUMN {coluna} INTEGER")
+    # Lançamentos de um cartão por intervalo de datas (ver _LANCAMENTOS_CARTAO)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contas_tipo_pagamento_vencimento "
+                   "ON contas (tipo_pagamento_id, vencimento)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contas_tipo_pagamento_ultimo_vencimento "
+                   "ON contas (tipo_pagamento_id, ultimo_vencimento)")
+
+
+def _migracao_livro_razao(cursor):
+    """9: Livro-razão de limites/saldos: tabelas 'movimentacoes' e 'saldos_snapshot'."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS movimentacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo_pagamento_id INTEGER NOT NULL,   -- Cartão ou conta bancária movimentado
+            user_id INTEGER NOT NULL,
+            conta_id INTEGER,                     -- Conta que originou (sem FK: a conta pode ser excluída depois)
+            delta REAL NOT NULL,                  -- Variação do limite disponível (cartão) ou do saldo (conta)
+            motivo TEXT NOT NULL,
+            criado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,  -- UTC, 'AAAA-MM-DD HH:MM:SS'
+            FOREIGN KEY (tipo_pagamento_id) REFERENCES tipos_pagamento(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS saldos_snapshot (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo_pagamento_id INTEGER NOT NULL,
+            movimentacao_id INTEGER NOT NULL,     -- Última movimentação incluída no saldo
+            saldo REAL NOT NULL,
+            FOREIGN KEY (tipo_pagamento_id) REFERENCES tipos_pagamento(id) ON DELETE CASCADE
+        )
+    """)
+    # (tipo_pagamento_id) também ordena por id (rowid) dentro do tipo de pagamento
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_movimentacoes_tipo_pagamento ON movimentacoes (tipo_pagamento_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_saldos_snapshot_tipo_pagamento "
+                   "ON saldos_snapshot (tipo_pagamento_id, movimentacao_id)")
+    # Tipos de pagamento existentes: o valor atual abre o livro, com um snapshot nele
+    linhas = cursor.execute(f"SELECT id, user_id, {_VALOR_LIVRO} FROM tipos_pagamento").fetchall()
+    for tipo_id, user_id, valor in linhas:
+        cursor.execute(
+            "INSERT INTO movimentacoes (tipo_pagamento_id, user_id, delta, motivo) VALUES (?, ?, ?, ?)",
+            (tipo_id, user_id, round(float(valor or 0), 2), MOTIVO_MIGRACAO),
+        )
+        cursor.execute(
+            "INSERT INTO saldos_snapshot (tipo_pagamento_id, movimentacao_id, saldo) VALUES (?, ?, ?)",
+            (tipo_id, cursor.lastrowid, round(float(valor or 0), 2)),
+        )
+
+
+# Ordem de aplicação: a posição na lista (a partir de 1) é o número da migração
+MIGRATIONS = [
+    _migracao_tabelas_base,
+    _migracao_valor_total_compra,
+    _migracao_tipo_pagamento_contas,
+    _migracao_data_version,
+    _migracao_indices_consultas,
+    _migracao_contas_fts,
+    _migracao_cronograma_parcelas,
+    _migracao_faturas_cartao,
+    _migracao_livro_razao,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn):
+    """Retorna o número da última migração aplicada ao banco da conexão."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(db_file=None):
+    """Aplica as migrações pendentes e retorna a versão do schema.
+
+    Caminho rápido: se 'PRAGMA user_version' já é SCHEMA_VERSION, retorna sem nenhuma
+    outra consulta. Caso contrário, todas as migrações pendentes rodam em uma única
+    transação (BEGIN IMMEDIATE): se alguma falhar, nada é aplicado e a versão não muda.
+    Com vários workers iniciando juntos, apenas um aplica; os outros esperam o lock e,
+    ao reler a versão dentro da transação, veem que não há mais nada a fazer.
+
+    Args:
+        db_file (str, optional): Caminho do banco. Se omitido, usa get_db_path().
+
+    Returns:
+        int: A versão do schema após a execução.
+
+    Raises:
+        sqlite3.Error: Se alguma migração falhar (o app não deve subir com schema inconsistente).
+    """
+    conn = get_db_connection(db_file)
+    try:
+        versao = get_schema_version(conn)
+        if versao >= SCHEMA_VERSION:
+            return versao
+
+        conn.isolation_level = None  # Controle manual da transação (inclui os comandos DDL)
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            versao = get_schema_version(conn)
+            for numero, migracao in enumerate(MIGRATIONS, start=1):
+                if numero <= versao:
+                    continue
+                print(f"Aplicando migração {numero}: {migracao.__doc__.split(':', 1)[1].strip()}")
+                migracao(cursor)
+            # PRAGMA não aceita parâmetros; SCHEMA_VERSION é uma constante inteira
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            cursor.execute("COMMIT")
+        except Exception as e:
+            print(f"Erro ao aplicar migrações (nenhuma alteração foi salva): {e}")
+            cursor.execute("ROLLBACK")
+            raise
+        return SCHEMA_VERSION
     finally:
         conn.close()
+
+
+def apply_migrations_all(db_file=None, shards=None):
+    """Aplica as migrações pendentes no banco principal e em todos os shards (ver apply_migrations).
+
+    Returns:
+        int: A versão do schema após a execução (a mesma em todos os arquivos).
+    """
+    versao = apply_migrations(db_file)
+    for caminho in get_shard_paths(db_file, shards):
+        versao = min(versao, apply_migrations(caminho))
+    return versao
+
+
+def check_and_apply_schema_updates():
+    """
+    Verifica e aplica atualizações no schema do banco de dados.
+
+    Mantida por compatibilidade: apenas chama apply_migrations(), que só faz
+    trabalho quando o banco está em uma versão anterior à atual.
+    """
+    return apply_migrations()
 # --- Funções Auxiliares de Migração/Atualização de Schema ---
 # Estas funções ajudam a adicionar colunas a tabelas existentes se elas não existirem.
 # São úteis quando se adiciona novas funcionalidades a uma aplicação já existente.
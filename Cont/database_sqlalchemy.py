@@ -0,0 +1,706 @@
+"""Backend SQLAlchemy Core: as funções de database.py sobre um Engine com pool de conexões.
+
+Com DATABASE_BACKEND = 'sqlalchemy', as funções de database.py marcadas com @_backend_alternativo
+(usuários, categorias, contas, tipos de pagamento, ajustes de limite/saldo com o livro-razão,
+rollover das recorrentes, movimentações, listagens da API e versão dos dados) rodam aqui, com a
+mesma assinatura e o mesmo retorno: as views não mudam. O Engine é o do Flask-SQLAlchemy (só o
+Core, sem modelos ORM), configurado por:
+
+    DATABASE_URL             URL do SQLAlchemy; precisa apontar para o arquivo de DATABASE (padrão)
+    DATABASE_POOL_TAMANHO    conexões mantidas no pool (padrão 5)
+    DATABASE_POOL_EXTRA      conexões além do pool nos picos (padrão 10)
+    DATABASE_POOL_TIMEOUT    segundos esperando uma conexão livre (padrão 30)
+    DATABASE_CACHE_COMANDOS  comandos compilados guardados pelo Engine (query_cache_size, padrão 500)
+
+Os comandos são montados uma vez, no carregamento do módulo, com bindparam(): o SQLAlchemy compila
+cada um na primeira execução e reaproveita a compilação (cache do Engine) nas seguintes.
+
+As tabelas abaixo descrevem o schema criado pelas migrações de database.py e são os metadados do
+Flask-Migrate (migrations/). No SQLite, a versão dos dados é incrementada pelos triggers; nos outros
+bancos, pelas escritas daqui.
+
+Continuam em sqlite3 (no arquivo de DATABASE): as consultas escritas direto nas views (get_db() em
+app.py: rollover, detalhes financeiros, relatório), a busca textual (FTS5), as faturas, a conferência
+e a reconciliação do livro-razão, o escritor único e as conexões somente leitura/réplica. Por isso a
+URL precisa ser a do mesmo arquivo: com outro banco, essas leituras e as escritas daqui iriam para
+lugares diferentes (e o schema só é criado em DATABASE). init_app recusa qualquer outra URL, assim
+como DATABASE_SHARDS.
+"""
+import os
+import sys
+from datetime import date, datetime
+
+from flask_migrate import Migrate
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import (
+    Column, Float, ForeignKey, Index, Integer, MetaData, Table, Text, UniqueConstraint,
+    bindparam, case, delete, event, func, insert, select, text, update,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+
+import database
+from models import Cartao, Categoria, ContaBancaria, User
+
+POOL_TAMANHO_PADRAO = 5
+POOL_EXTRA_PADRAO = 10
+POOL_TIMEOUT_PADRAO = 30
+CACHE_COMANDOS_PADRAO = 500
+
+# --- Schema (o mesmo das migrações de database.py) ---
+metadados = MetaData()
+
+users = Table(
+    "users", metadados,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("username", Text, unique=True, nullable=False),
+    Column("password", Text, nullable=False),
+    Column("data_version", Integer, nullable=False, server_default=text("0")),
+)
+
+categorias = Table(
+    "categorias", metadados,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("nome", Text, nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    UniqueConstraint("nome", "user_id"),
+)
+
+tipos_pagamento = Table(
+    "tipos_pagamento", metadados,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("nome", Text, nullable=False),
+    Column("tipo", Text, nullable=False),  # 'cartao' ou 'conta'
+    Column("limite", Float),
+    Column("limite_disponivel", Float),
+    Column("saldo", Float),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("dia_fechamento", Integer),
+    Column("dia_vencimento", Integer),
+    Index("idx_tipos_pagamento_user_nome", "user_id", "nome"),
+    Index("idx_tipos_pagamento_user_id", "user_id"),
+)
+
+contas = Table(
+    "contas", metadados,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("nome", Text, nullable=False),
+    Column("valor", Float, nullable=False),
+    Column("valor_total_compra", Float),
+    Column("vencimento", Text, nullable=False),  # ISO 'AAAA-MM-DD', como no SQLite
+    Column("categoria_id", Integer, ForeignKey("categorias.id", ondelete="SET NULL")),
+    Column("parcela_atual", Integer),
+    Column("total_parcelas", Integer),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("recorrente", Integer, server_default=text("0")),
+    Column("tipo_pagamento_id", Integer, ForeignKey("tipos_pagamento.id", ondelete="SET NULL")),
+    Column("primeiro_vencimento", Text),
+    Column("ultimo_vencimento", Text),
+    Index("idx_contas_tipo_pagamento_id", "tipo_pagamento_id"),
+    Index("idx_contas_user_id", "user_id"),
+    Index("idx_contas_user_vencimento", "user_id", "vencimento"),
+    Index("idx_contas_user_ultimo_vencimento", "user_id", "ultimo_vencimento"),
+    Index("idx_contas_tipo_pagamento_vencimento", "tipo_pagamento_id", "vencimento"),
+    Index("idx_contas_tipo_pagamento_ultimo_vencimento", "tipo_pagamento_id", "ultimo_vencimento"),
+)
+
+movimentacoes = Table(
+    "movimentacoes", metadados,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("tipo_pagamento_id", Integer, ForeignKey("tipos_pagamento.id", ondelete="CASCADE"), nullable=False),
+    Column("user_id", Integer, nullable=False),
+    Column("conta_id", Integer),  # Sem FK: a conta pode ser excluída depois
+    Column("delta", Float, nullable=False),
+    Column("motivo", Text, nullable=False),
+    Column("criado_em", Text, nullable=False, server_default=text("CURRENT_TIMESTAMP")),
+    Index("idx_movimentacoes_tipo_pagamento", "tipo_pagamento_id"),
+)
+
+saldos_snapshot = Table(
+    "saldos_snapshot", metadados,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("tipo_pagamento_id", Integer, ForeignKey("tipos_pagamento.id", ondelete="CASCADE"), nullable=False),
+    Column("movimentacao_id", Integer, nullable=False),
+    Column("saldo", Float, nullable=False),
+    Index("idx_saldos_snapshot_tipo_pagamento", "tipo_pagamento_id", "movimentacao_id"),
+)
+
+db = SQLAlchemy(metadata=metadados)
+migrate = Migrate()
+
+
+# --- Comandos (montados uma vez; compilados uma vez por Engine) ---
+# Nos UPDATEs, os parâmetros do WHERE não podem ter o nome de uma coluna (ex: 'dono' no lugar de user_id).
+_c, _cat, _tp, _mov, _snap = contas.c, categorias.c, tipos_pagamento.c, movimentacoes.c, saldos_snapshot.c
+
+_INCREMENTAR_VERSAO = update(users).where(users.c.id == bindparam("dono")).values(data_version=users.c.data_version + 1)
+_VERSAO_DOS_DADOS = select(users.c.data_version).where(users.c.id == bindparam("user_id"))
+
+_USUARIO_POR_NOME = select(users).where(users.c.username == bindparam("username"))
+_INSERIR_USUARIO = insert(users)
+_ATUALIZAR_SENHA = update(users).where(users.c.id == bindparam("dono")).values(password=bindparam("nova_senha"))
+
+_CATEGORIAS_DO_USUARIO = select(categorias).where(_cat.user_id == bindparam("user_id")).order_by(_cat.nome)
+_CATEGORIA_POR_ID = select(categorias).where(_cat.id == bindparam("categoria_id"), _cat.user_id == bindparam("user_id"))
+_CATEGORIA_POR_NOME = select(categorias).where(_cat.nome == bindparam("nome"), _cat.user_id == bindparam("user_id"))
+_OUTRA_CATEGORIA_COM_NOME = select(_cat.id).where(
+    _cat.nome == bindparam("nome"), _cat.user_id == bindparam("user_id"), _cat.id != bindparam("categoria_id")
+)
+_INSERIR_CATEGORIA = insert(categorias)
+_ATUALIZAR_CATEGORIA = update(categorias).where(
+    _cat.id == bindparam("categoria_id"), _cat.user_id == bindparam("dono")
+).values(nome=bindparam("novo_nome"))
+_EXCLUIR_CATEGORIA = delete(categorias).where(_cat.id == bindparam("categoria_id"), _cat.user_id == bindparam("user_id"))
+
+_CONTAS_COM_CATEGORIA = select(contas, _cat.nome.label("categoria_nome")).select_from(
+    contas.outerjoin(categorias, _c.categoria_id == _cat.id)
+)
+_CONTA_POR_ID = _CONTAS_COM_CATEGORIA.where(_c.id == bindparam("conta_id"), _c.user_id == bindparam("user_id"))
+_CONTAS_DO_USUARIO = _CONTAS_COM_CATEGORIA.where(_c.user_id == bindparam("user_id")).order_by(
+    _c.vencimento.desc(), _c.id.desc()
+)
+_CONTAS_PARA_PREVISAO = select(
+    _c.valor, _c.vencimento, _c.recorrente, _c.primeiro_vencimento, _c.ultimo_vencimento
+).where(_c.user_id == bindparam("user_id"))
+_INSERIR_CONTA = insert(contas)
+_ATUALIZAR_CONTA = update(contas).where(_c.id == bindparam("conta_id"), _c.user_id == bindparam("dono"))
+_EXCLUIR_CONTA = delete(contas).where(_c.id == bindparam("conta_id"), _c.user_id == bindparam("user_id"))
+_AVANCAR_VENCIMENTO = update(contas).where(_c.id == bindparam("conta_id")).values(vencimento=bindparam("novo_vencimento"))
+
+_TIPOS_DO_USUARIO = select(tipos_pagamento).where(_tp.user_id == bindparam("user_id")).order_by(_tp.nome)
+_TIPO_POR_ID = select(tipos_pagamento).where(_tp.id == bindparam("tipo_id"))
+_INSERIR_TIPO = insert(tipos_pagamento)
+_ATUALIZAR_TIPO = update(tipos_pagamento).where(_tp.id == bindparam("tipo_id"), _tp.user_id == bindparam("dono"))
+_CONTAS_VINCULADAS = select(func.count()).select_from(contas).where(
+    _c.tipo_pagamento_id == bindparam("tipo_id"), _c.user_id == bindparam("user_id")
+)
+_EXCLUIR_TIPO = delete(tipos_pagamento).where(_tp.id == bindparam("tipo_id"), _tp.user_id == bindparam("user_id"))
+_AJUSTAR_SALDO = update(tipos_pagamento).where(_tp.id == bindparam("tipo_id"), _tp.user_id == bindparam("dono")).values(
+    limite_disponivel=case(
+        (_tp.tipo == "cartao", func.round(func.coalesce(_tp.limite_disponivel, 0) + bindparam("delta", type_=Float), 2)),
+        else_=_tp.limite_disponivel,
+    ),
+    saldo=case(
+        (_tp.tipo == "conta", func.round(func.coalesce(_tp.saldo, 0) + bindparam("delta", type_=Float), 2)),
+        else_=_tp.saldo,
+    ),
+)
+# Toma o lock de escrita do SQLite antes de ler o valor anterior (o papel do BEGIN IMMEDIATE em database.py)
+_TRAVAR_TIPOS = update(tipos_pagamento).where(text("1 = 0")).values(nome=_tp.nome)
+
+# Livro-razão (ver "Livro-Razão de Limites e Saldos" em database.py)
+_VALOR_LIVRO_ATUAL = select(
+    case((_tp.tipo == "cartao", _tp.limite_disponivel), else_=_tp.saldo)
+).where(_tp.id == bindparam("tipo_id"), _tp.user_id == bindparam("user_id"))
+_INSERIR_MOVIMENTACAO = insert(movimentacoes)
+_INSERIR_SNAPSHOT = insert(saldos_snapshot)
+_ULTIMO_SNAPSHOT = select(_snap.movimentacao_id, _snap.saldo).where(
+    _snap.tipo_pagamento_id == bindparam("tipo_id")
+).order_by(_snap.movimentacao_id.desc()).limit(1)
+_DELTAS_DESDE = select(func.coalesce(func.sum(_mov.delta), 0), func.count()).where(
+    _mov.tipo_pagamento_id == bindparam("tipo_id"), _mov.id > bindparam("desde")
+)
+_MOVIMENTACOES = select(
+    _mov.id, _mov.delta, _mov.motivo, _mov.criado_em, _mov.conta_id, _c.nome.label("conta_nome")
+).select_from(movimentacoes.outerjoin(contas, _c.id == _mov.conta_id)).where(
+    _mov.tipo_pagamento_id == bindparam("tipo_id"), _mov.user_id == bindparam("user_id")
+).order_by(_mov.id.desc()).limit(bindparam("limite"))
+
+_TABELAS_API = {"contas": contas, "categorias": categorias, "tipos_pagamento": tipos_pagamento}
+
+
+def _engine():
+    return db.engine
+
+
+def _incrementar_versao(conn, user_id):
+    """No SQLite os triggers incrementam users.data_version; nos outros bancos, é feito aqui."""
+    if conn.dialect.name != "sqlite":
+        conn.execute(_INCREMENTAR_VERSAO, {"dono": user_id})
+
+
+def _tipo_da_linha(row):
+    if row.tipo == "cartao":
+        return Cartao(row.id, row.nome, row.limite, row.limite_disponivel, row.user_id,
+                      row.dia_fechamento, row.dia_vencimento)
+    if row.tipo == "conta":
+        return ContaBancaria(row.id, row.nome, row.saldo, row.user_id)
+    return None
+
+
+# --- Categorias ---
+def create_categoria(nome, user_id):
+    try:
+        with _engine().begin() as conn:
+            resultado = conn.execute(_INSERIR_CATEGORIA, {"nome": nome, "user_id": user_id})
+            _incrementar_versao(conn, user_id)
+        return resultado.inserted_primary_key[0]
+    except IntegrityError:
+        print(f"Erro de Integridade: Categoria '{nome}' já existe para o usuário ID {user_id}.")
+        return None
+    except Exception as e:
+        print(f"Erro inesperado ao criar categoria: {e}")
+        return None
+
+
+def get_categorias_by_user(user_id):
+    try:
+        with _engine().connect() as conn:
+            linhas = conn.execute(_CATEGORIAS_DO_USUARIO, {"user_id": user_id}).all()
+        return [Categoria(row.id, row.nome, row.user_id) for row in linhas]
+    except Exception as e:
+        print(f"Erro ao buscar categorias para user ID {user_id}: {e}")
+        return []
+
+
+def get_categoria_by_id(categoria_id, user_id):
+    try:
+        with _engine().connect() as conn:
+            row = conn.execute(_CATEGORIA_POR_ID, {"categoria_id": categoria_id, "user_id": user_id}).first()
+        return Categoria(row.id, row.nome, row.user_id) if row else None
+    except Exception as e:
+        print(f"Erro ao buscar categoria ID {categoria_id} para user ID {user_id}: {e}")
+        return None
+
+
+def get_categoria_by_name_and_user(nome, user_id):
+    try:
+        with _engine().connect() as conn:
+            row = conn.execute(_CATEGORIA_POR_NOME, {"nome": nome, "user_id": user_id}).first()
+        return Categoria(row.id, row.nome, row.user_id) if row else None
+    except Exception as e:
+        print(f"Erro ao buscar categoria por nome '{nome}' para user ID {user_id}: {e}")
+        return None
+
+
+def update_categoria(categoria_id, nome, user_id):
+    try:
+        with _engine().begin() as conn:
+            parametros = {"nome": nome, "user_id": user_id, "categoria_id": categoria_id}
+            if conn.execute(_OUTRA_CATEGORIA_COM_NOME, parametros).first():
+                print(f"Erro: Já existe outra categoria com o nome '{nome}' para o usuário ID {user_id}.")
+                return False
+            updated_rows = conn.execute(
+                _ATUALIZAR_CATEGORIA, {"novo_nome": nome, "categoria_id": categoria_id, "dono": user_id}
+            ).rowcount
+            if updated_rows:
+                _incrementar_versao(conn, user_id)
+        return updated_rows > 0
+    except IntegrityError:
+        print(f"Erro de Integridade ao tentar atualizar categoria ID {categoria_id} para nome '{nome}'.")
+        return False
+    except Exception as e:
+        print(f"Erro inesperado ao atualizar categoria ID {categoria_id}: {e}")
+        return False
+
+
+def delete_categoria(categoria_id, user_id):
+    try:
+        with _engine().begin() as conn:
+            deleted_rows = conn.execute(_EXCLUIR_CATEGORIA, {"categoria_id": categoria_id, "user_id": user_id}).rowcount
+            if deleted_rows:
+                _incrementar_versao(conn, user_id)
+        if deleted_rows == 0:
+            print(f"Aviso: Nenhuma categoria encontrada com ID {categoria_id} para o usuário ID {user_id} para deletar.")
+        return deleted_rows > 0
+    except Exception as e:
+        print(f"Erro ao deletar categoria ID {categoria_id}: {e}")
+        return False
+
+
+# --- Contas ---
+def create_conta(nome, valor, vencimento, categoria_id, parcela_atual, total_parcelas, user_id, recorrente,
+                 tipo_pagamento_id, valor_total_compra):
+    try:
+        vencimento_str = vencimento.isoformat() if isinstance(vencimento, (date, datetime)) else str(vencimento)
+        primeiro_str, ultimo_str = database._limites_para_gravar(vencimento_str, parcela_atual, total_parcelas)
+        with _engine().begin() as conn:
+            resultado = conn.execute(_INSERIR_CONTA, {
+                "nome": nome, "valor": valor, "valor_total_compra": valor_total_compra, "vencimento": vencimento_str,
+                "categoria_id": categoria_id, "parcela_atual": parcela_atual, "total_parcelas": total_parcelas,
+                "user_id": user_id, "recorrente": recorrente, "tipo_pagamento_id": tipo_pagamento_id,
+                "primeiro_vencimento": primeiro_str, "ultimo_vencimento": ultimo_str,
+            })
+            _incrementar_versao(conn, user_id)
+        return resultado.inserted_primary_key[0]
+    except Exception as e:
+        print(f"Erro ao criar conta: {e}")
+        return None
+
+
+def update_conta(conta):
+    try:
+        vencimento_str = None
+        if isinstance(conta.vencimento, (date, datetime)):
+            vencimento_str = conta.vencimento.isoformat()
+        elif isinstance(conta.vencimento, str):
+            try:
+                vencimento_str = date.fromisoformat(conta.vencimento).isoformat()
+            except ValueError:
+                print(f"Aviso: String de vencimento inválida '{conta.vencimento}' para conta ID {conta.id}. Salvando como estava.")
+        else:
+            print(f"Aviso: Tipo de vencimento inválido ({type(conta.vencimento)}) para conta ID {conta.id}. Salvando como NULL.")
+        try:
+            valor_float = float(conta.valor) if conta.valor is not None else 0.0
+            valor_total_compra_float = float(conta.valor_total_compra) if conta.valor_total_compra is not None else 0.0
+        except ValueError:
+            print(f"Erro: Valor inválido não pode ser convertido para float para salvar conta ID {conta.id}.")
+            return False
+        primeiro_str, ultimo_str = database._limites_para_gravar(vencimento_str, conta.parcela_atual, conta.total_parcelas)
+        with _engine().begin() as conn:
+            updated_rows = conn.execute(_ATUALIZAR_CONTA, {
+                "nome": conta.nome, "valor": valor_float, "valor_total_compra": valor_total_compra_float,
+                "vencimento": vencimento_str, "categoria_id": conta.categoria_id, "parcela_atual": conta.parcela_atual,
+                "total_parcelas": conta.total_parcelas, "recorrente": conta.recorrente,
+                "tipo_pagamento_id": conta.tipo_pagamento_id, "primeiro_vencimento": primeiro_str,
+                "ultimo_vencimento": ultimo_str, "conta_id": conta.id, "dono": conta.user_id,
+            }).rowcount
+            if updated_rows:
+                _incrementar_versao(conn, conta.user_id)
+        if updated_rows == 0:
+            print(f"Aviso: Nenhuma conta encontrada com ID {conta.id} para o usuário ID {conta.user_id} para atualizar.")
+        return updated_rows > 0
+    except Exception as e:
+        print(f"Erro inesperado ao atualizar conta ID {getattr(conta, 'id', 'N/A')}: {e}")
+        return False
+
+
+def delete_conta(conta_id, user_id):
+    try:
+        with _engine().begin() as conn:
+            deleted_rows = conn.execute(_EXCLUIR_CONTA, {"conta_id": conta_id, "user_id": user_id}).rowcount
+            if deleted_rows:
+                _incrementar_versao(conn, user_id)
+        if deleted_rows == 0:
+            print(f"Aviso: Nenhuma conta encontrada com ID {conta_id} para o usuário ID {user_id} para deletar.")
+        return deleted_rows > 0
+    except Exception as e:
+        print(f"Erro ao deletar conta ID {conta_id}: {e}")
+        return False
+
+
+def get_conta_by_id(id, user_id):
+    try:
+        with _engine().connect() as conn:
+            row = conn.execute(_CONTA_POR_ID, {"conta_id": id, "user_id": user_id}).first()
+        return database._conta_da_linha(row._mapping) if row else None
+    except Exception as e:
+        print(f"Erro ao buscar conta ID {id} para user ID {user_id}: {e}")
+        return None
+
+
+def get_contas_by_user(user_id):
+    try:
+        with _engine().connect() as conn:
+            linhas = conn.execute(_CONTAS_DO_USUARIO, {"user_id": user_id}).all()
+        hoje = date.today()
+        contas_usuario = [database._conta_da_linha(row._mapping, hoje) for row in linhas]
+        contas_usuario.sort(key=lambda c: (c.vencimento or date.min, c.id), reverse=True)
+        return contas_usuario
+    except Exception as e:
+        print(f"Erro ao buscar contas para user ID {user_id}: {e}")
+        return []
+
+
+def get_contas_para_previsao(user_id):
+    try:
+        with _engine().connect() as conn:
+            return [row._mapping for row in conn.execute(_CONTAS_PARA_PREVISAO, {"user_id": user_id})]
+    except Exception as e:
+        print(f"Erro ao buscar contas para previsão do user ID {user_id}: {e}")
+        return []
+
+
+# --- Usuários ---
+def get_user_by_username(username):
+    try:
+        with _engine().connect() as conn:
+            row = conn.execute(_USUARIO_POR_NOME, {"username": username}).first()
+        return User(id=row.id, username=row.username, password=row.password) if row else None
+    except Exception as e:
+        print(f"Erro ao buscar usuário por username '{username}': {e}")
+        return None
+
+
+def create_user(username, hashed_password):
+    try:
+        with _engine().begin() as conn:
+            conn.execute(_INSERIR_USUARIO, {"username": username, "password": hashed_password})
+        return get_user_by_username(username)
+    except IntegrityError:
+        print(f"Erro de Integridade: Nome de usuário '{username}' já está em uso.")
+        return None
+    except Exception as e:
+        print(f"Erro inesperado ao criar usuário '{username}': {e}")
+        return None
+
+
+def update_user_password(user_id, hashed_password):
+    try:
+        with _engine().begin() as conn:
+            return conn.execute(_ATUALIZAR_SENHA, {"nova_senha": hashed_password, "dono": user_id}).rowcount == 1
+    except Exception as e:
+        print(f"Erro ao atualizar a senha do usuário ID {user_id}: {e}")
+        return False
+
+
+# --- Tipos de Pagamento ---
+def get_tipos_pagamento_by_user(user_id):
+    try:
+        with _engine().connect() as conn:
+            linhas = conn.execute(_TIPOS_DO_USUARIO, {"user_id": user_id}).all()
+        return [tipo for tipo in map(_tipo_da_linha, linhas) if tipo is not None]
+    except Exception as e:
+        print(f"Erro ao buscar tipos de pagamento para user ID {user_id}: {e}")
+        return []
+
+
+def create_tipo_pagamento(nome, tipo, limite=None, limite_disponivel=None, saldo=None, user_id=None,
+                          dia_fechamento=None, dia_vencimento=None):
+    try:
+        limite_float = float(limite) if limite is not None else None
+        limite_disp_float = float(limite_disponivel) if limite_disponivel is not None else None
+        saldo_float = float(saldo) if saldo is not None else None
+    except (ValueError, TypeError) as conv_err:
+        print(f"Erro de conversão de valor ao criar tipo de pagamento '{nome}': {conv_err}")
+        return None
+    try:
+        with _engine().begin() as conn:
+            tipo_pagamento_id = conn.execute(_INSERIR_TIPO, {
+                "nome": nome, "tipo": tipo, "limite": limite_float, "limite_disponivel": limite_disp_float,
+                "saldo": saldo_float, "user_id": user_id, "dia_fechamento": dia_fechamento,
+                "dia_vencimento": dia_vencimento,
+            }).inserted_primary_key[0]
+            inicial = limite_disp_float if tipo == "cartao" else saldo_float
+            if inicial:
+                _registrar_movimentacao(conn, tipo_pagamento_id, user_id, inicial, database.MOTIVO_ABERTURA)
+            _incrementar_versao(conn, user_id)
+        return tipo_pagamento_id
+    except Exception as e:
+        print(f"Erro inesperado ao criar tipo de pagamento '{nome}': {e}")
+        return None
+
+
+def get_tipo_pagamento_by_id(tipo_id):
+    if not tipo_id:
+        return None
+    try:
+        with _engine().connect() as conn:
+            row = conn.execute(_TIPO_POR_ID, {"tipo_id": tipo_id}).first()
+        return _tipo_da_linha(row) if row else None
+    except Exception as e:
+        print(f"Erro ao buscar tipo de pagamento ID {tipo_id}: {e}")
+        return None
+
+
+def update_tipo_pagamento(tipo_pagamento):
+    if isinstance(tipo_pagamento, Cartao):
+        valores = {
+            "nome": tipo_pagamento.nome, "limite": float(tipo_pagamento.limite),
+            "limite_disponivel": float(tipo_pagamento.limite_disponivel),
+            "dia_fechamento": tipo_pagamento.dia_fechamento, "dia_vencimento": tipo_pagamento.dia_vencimento,
+        }
+    elif isinstance(tipo_pagamento, ContaBancaria):
+        valores = {"nome": tipo_pagamento.nome, "saldo": float(tipo_pagamento.saldo)}
+    else:
+        print(f"Erro: Tipo de pagamento desconhecido para atualização: {type(tipo_pagamento)}")
+        return False
+    tipo_id, user_id = tipo_pagamento.id, tipo_pagamento.user_id
+    try:
+        with _engine().begin() as conn:
+            # Leitura do valor anterior, UPDATE e movimentação sem outra escrita no meio
+            if conn.dialect.name == "sqlite":
+                conn.execute(_TRAVAR_TIPOS)
+            anterior = _valor_livro_atual(conn, tipo_id, user_id, travar=True)
+            updated_rows = conn.execute(_ATUALIZAR_TIPO, {**valores, "tipo_id": tipo_id, "dono": user_id}).rowcount
+            if updated_rows:
+                delta = _valor_livro_atual(conn, tipo_id, user_id) - anterior
+                if delta:
+                    _registrar_movimentacao(conn, tipo_id, user_id, delta, database.MOTIVO_EDICAO)
+                _incrementar_versao(conn, user_id)
+        if updated_rows == 0:
+            print(f"Aviso: Nenhum tipo de pagamento encontrado com ID {tipo_id} para o usuário ID {user_id} para atualizar.")
+        return updated_rows > 0
+    except Exception as e:
+        print(f"Erro inesperado ao atualizar tipo de pagamento ID {tipo_id}: {e}")
+        return False
+
+
+def adjust_tipo_pagamento_saldo(tipo_id, user_id, delta, motivo=None, conta_id=None):
+    try:
+        with _engine().begin() as conn:
+            updated_rows = _ajustar_saldo(conn, tipo_id, user_id, float(delta), motivo or database.MOTIVO_AJUSTE, conta_id)
+        return updated_rows > 0
+    except Exception as e:
+        print(f"Erro ao ajustar limite/saldo do tipo de pagamento ID {tipo_id}: {e}")
+        return False
+
+
+def _ajustar_saldo(conn, tipo_id, user_id, delta, motivo, conta_id=None):
+    updated_rows = conn.execute(_AJUSTAR_SALDO, {"delta": delta, "tipo_id": tipo_id, "dono": user_id}).rowcount
+    if updated_rows:
+        if delta:
+            _registrar_movimentacao(conn, tipo_id, user_id, delta, motivo, conta_id)
+        _incrementar_versao(conn, user_id)
+    return updated_rows
+
+
+def avancar_recorrentes(atualizacoes):
+    if not atualizacoes:
+        return 0
+    try:
+        with _engine().begin() as conn:
+            conn.execute(_AVANCAR_VENCIMENTO, [
+                {"novo_vencimento": vencimento, "conta_id": conta_id}
+                for conta_id, _, vencimento, _, _ in atualizacoes
+            ])
+            for conta_id, user_id, _, tipo_id, valor in atualizacoes:
+                if tipo_id:
+                    _ajustar_saldo(conn, tipo_id, user_id, -float(valor), database.MOTIVO_RECORRENTE, conta_id)
+            for user_id in {user_id for _, user_id, _, _, _ in atualizacoes}:
+                _incrementar_versao(conn, user_id)
+        return len(atualizacoes)
+    except Exception as e:
+        print(f"Erro ao gravar o rollover das recorrentes: {e}")
+        return 0
+
+
+def delete_tipo_pagamento(tipo_id, user_id):
+    try:
+        with _engine().begin() as conn:
+            count = conn.execute(_CONTAS_VINCULADAS, {"tipo_id": tipo_id, "user_id": user_id}).scalar()
+            if count > 0:
+                print(f"Erro: Não é possível excluir o tipo de pagamento ID {tipo_id}, pois existem {count} contas vinculadas a ele.")
+                return False
+            deleted_rows = conn.execute(_EXCLUIR_TIPO, {"tipo_id": tipo_id, "user_id": user_id}).rowcount
+            if deleted_rows:
+                _incrementar_versao(conn, user_id)
+        if deleted_rows == 0:
+            print(f"Aviso: Nenhum tipo de pagamento encontrado com ID {tipo_id} para o usuário ID {user_id} para deletar.")
+        return deleted_rows > 0
+    except Exception as e:
+        print(f"Erro ao deletar tipo de pagamento ID {tipo_id}: {e}")
+        return False
+
+
+# --- Livro-Razão ---
+def _valor_livro_atual(conn, tipo_id, user_id, travar=False):
+    comando = _VALOR_LIVRO_ATUAL.with_for_update() if travar else _VALOR_LIVRO_ATUAL
+    valor = conn.execute(comando, {"tipo_id": tipo_id, "user_id": user_id}).scalar()
+    return float(valor or 0)
+
+
+def _registrar_movimentacao(conn, tipo_id, user_id, delta, motivo, conta_id=None):
+    """Mesma regra de database._registrar_movimentacao: a movimentação e, a cada SNAPSHOT_A_CADA, um snapshot."""
+    movimentacao_id = conn.execute(_INSERIR_MOVIMENTACAO, {
+        "tipo_pagamento_id": tipo_id, "user_id": user_id, "conta_id": conta_id,
+        "delta": round(float(delta), 2), "motivo": motivo,
+    }).inserted_primary_key[0]
+    snapshot = conn.execute(_ULTIMO_SNAPSHOT, {"tipo_id": tipo_id}).first()
+    desde, saldo = (snapshot.movimentacao_id, snapshot.saldo) if snapshot else (0, 0.0)
+    soma, pendentes = conn.execute(_DELTAS_DESDE, {"tipo_id": tipo_id, "desde": desde}).one()
+    if pendentes >= database.SNAPSHOT_A_CADA:
+        # O snapshot vem do livro (e não da coluna), para que uma divergência não seja absorvida por ele
+        conn.execute(_INSERIR_SNAPSHOT, {
+            "tipo_pagamento_id": tipo_id, "movimentacao_id": movimentacao_id, "saldo": round(saldo + soma, 2),
+        })
+
+
+def get_movimentacoes(tipo_id, user_id, limit=100):
+    try:
+        with _engine().connect() as conn:
+            linhas = conn.execute(_MOVIMENTACOES, {"tipo_id": tipo_id, "user_id": user_id, "limite": limit})
+            return [dict(row._mapping) for row in linhas]
+    except Exception as e:
+        print(f"Erro ao buscar movimentações do tipo de pagamento ID {tipo_id}: {e}")
+        return []
+
+
+# --- API e Versão dos Dados ---
+def get_rows_by_user(tabela, user_id, colunas=None, after_id=None, limit=None, ids=None):
+    colunas, extras = database._colunas_api(tabela, colunas)
+    if ids is not None and not ids:
+        return []
+    tabela_sa = _TABELAS_API[tabela]
+    # Um comando por combinação de colunas/filtros; o cache do Engine guarda a compilação de cada uma
+    comando = select(*(tabela_sa.c[coluna] for coluna in colunas)).where(tabela_sa.c.user_id == bindparam("user_id"))
+    parametros = {"user_id": user_id}
+    if ids is not None:
+        comando = comando.where(tabela_sa.c.id.in_(bindparam("ids", expanding=True)))
+        parametros["ids"] = list(ids)
+    if after_id is not None:
+        comando = comando.where(tabela_sa.c.id > bindparam("after_id"))
+        parametros["after_id"] = after_id
+    comando = comando.order_by(tabela_sa.c.id)
+    if limit is not None:
+        comando = comando.limit(bindparam("limite"))
+        parametros["limite"] = limit
+    try:
+        with _engine().connect() as conn:
+            linhas = [dict(row._mapping) for row in conn.execute(comando, parametros)]
+        return database._linhas_api(linhas, extras)
+    except Exception as e:
+        print(f"Erro ao buscar {tabela} para user ID {user_id}: {e}")
+        return []
+
+
+def get_data_version(user_id):
+    try:
+        with _engine().connect() as conn:
+            return conn.execute(_VERSAO_DOS_DADOS, {"user_id": user_id}).scalar() or 0
+    except Exception as e:
+        print(f"Erro ao buscar versão dos dados para user ID {user_id}: {e}")
+        return 0
+
+
+# --- Registro no App ---
+def _ativar_chaves_estrangeiras(conexao, _registro):
+    # Como em database.get_db_connection: ON DELETE CASCADE/SET NULL dependem disso no SQLite
+    cursor = conexao.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
+    cursor.close()
+
+
+def _mesmo_arquivo(url, caminho):
+    """True se a URL do SQLAlchemy é um SQLite no arquivo 'caminho'."""
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        return False
+    return os.path.abspath(url.database) == os.path.abspath(caminho)
+
+
+def init_app(app):
+    """Liga o backend no app: Engine com pool (Flask-SQLAlchemy), Flask-Migrate e o desvio das
+    funções de database.py (app.extensions["database_backend"])."""
+    app.config.setdefault("DATABASE_URL", None)
+    app.config.setdefault("DATABASE_POOL_TAMANHO", POOL_TAMANHO_PADRAO)
+    app.config.setdefault("DATABASE_POOL_EXTRA", POOL_EXTRA_PADRAO)
+    app.config.setdefault("DATABASE_POOL_TIMEOUT", POOL_TIMEOUT_PADRAO)
+    app.config.setdefault("DATABASE_CACHE_COMANDOS", CACHE_COMANDOS_PADRAO)
+    if app.config.get("DATABASE_SHARDS"):
+        raise ValueError("DATABASE_BACKEND='sqlalchemy' não suporta DATABASE_SHARDS.")
+    url = make_url(app.config.get("SQLALCHEMY_DATABASE_URI") or app.config["DATABASE_URL"]
+                   or "sqlite:///" + app.config["DATABASE"])
+    if not _mesmo_arquivo(url, app.config["DATABASE"]):
+        # Migrações, views com SQL direto, busca, faturas etc. usam o arquivo de DATABASE (ver o topo)
+        raise ValueError(
+            "DATABASE_BACKEND='sqlalchemy' exige que DATABASE_URL aponte para o arquivo de DATABASE "
+            f"({os.path.abspath(app.config['DATABASE'])})."
+        )
+    # Caminho absoluto: o Flask-SQLAlchemy resolveria um caminho relativo na pasta 'instance'
+    app.config["SQLALCHEMY_DATABASE_URI"] = url.set(database=os.path.abspath(url.database)).render_as_string(
+        hide_password=False
+    )
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {
+        "pool_size": app.config["DATABASE_POOL_TAMANHO"],
+        "max_overflow": app.config["DATABASE_POOL_EXTRA"],
+        "pool_timeout": app.config["DATABASE_POOL_TIMEOUT"],
+        "pool_pre_ping": True,
+        "query_cache_size": app.config["DATABASE_CACHE_COMANDOS"],
+    })
+    db.init_app(app)
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations"))
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", _ativar_chaves_estrangeiras)
+    app.extensions["database_backend"] = sys.modules[__name__]
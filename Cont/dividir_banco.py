@@ -0,0 +1,119 @@
+"""Divide um banco existente em shards por usuário (ver "Shards por Usuário" em database.py).
+
+Cria contas.shard0.db ... contas.shard<N-1>.db ao lado do banco (com o schema atual) e copia para
+cada um os dados dos usuários com user_id % N igual ao número do shard: uma cópia mínima do usuário
+(sem a senha), categorias, tipos de pagamento, contas e o livro-razão. O banco original continua
+sendo o banco principal (tabela 'users', usada no login). Com --limpar, os dados copiados são
+apagados dele no final (senão ficam lá, sem uso, como cópia de segurança).
+
+Depois, suba o app com DATABASE_SHARDS=N (o mesmo N usado aqui).
+
+Uso (dentro de Cont/, com o app parado):
+    python dividir_banco.py contas.db --shards 4
+    python dividir_banco.py contas.db --shards 4 --limpar
+"""
+import argparse
+import os
+import sys
+import time
+
+import database
+
+# Ordem de cópia (chaves estrangeiras): cada tabela só referencia tabelas já copiadas
+TABELAS_POR_USUARIO = ("categorias", "tipos_pagamento", "contas", "movimentacoes")
+
+
+def _colunas(conn, tabela):
+    return ", ".join(row["name"] for row in conn.execute(f"PRAGMA origem.table_info({tabela})"))
+
+
+def _copiar_shard(origem, destino, numero, shards):
+    """Copia os dados dos usuários do shard 'numero' em uma única transação; devolve as contagens."""
+    database.apply_migrations(destino)
+    conn = database.get_db_connection(destino)
+    try:
+        conn.execute("ATTACH DATABASE ? AS origem", (origem,))
+        contagens = {}
+        with conn:
+            contagens["users"] = conn.execute(
+                "INSERT INTO users (id, username, password, data_version) "
+                "SELECT id, username, '', data_version FROM origem.users WHERE id % ? = ?",
+                (shards, numero),
+            ).rowcount
+            for tabela in TABELAS_POR_USUARIO:
+                colunas = _colunas(conn, tabela)
+                contagens[tabela] = conn.execute(
+                    f"INSERT INTO {tabela} ({colunas}) SELECT {colunas} FROM origem.{tabela} WHERE user_id % ? = ?",
+                    (shards, numero),
+                ).rowcount
+            colunas = _colunas(conn, "saldos_snapshot")
+            contagens["saldos_snapshot"] = conn.execute(
+                f"INSERT INTO saldos_snapshot ({colunas}) SELECT {colunas} FROM origem.saldos_snapshot "
+                "WHERE tipo_pagamento_id IN (SELECT id FROM main.tipos_pagamento)"
+            ).rowcount
+        conn.execute("DETACH DATABASE origem")
+        return contagens
+    finally:
+        conn.close()
+
+
+def _limpar_origem(origem):
+    """Apaga do banco principal os dados já copiados para os shards (mantém 'users')."""
+    conn = database.get_db_connection(origem)
+    try:
+        with conn:
+            for tabela in ("saldos_snapshot",) + tuple(reversed(TABELAS_POR_USUARIO)):
+                conn.execute(f"DELETE FROM {tabela}")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def dividir(origem, shards, limpar=False):
+    """Divide 'origem' em 'shards' arquivos.
+
+    Returns:
+        list[dict]: Contagens de linhas copiadas, por shard.
+
+    Raises:
+        FileExistsError: Se algum arquivo de shard já existir (nada é copiado).
+    """
+    destinos = database.get_shard_paths(origem, shards)
+    existentes = [destino for destino in destinos if os.path.exists(destino)]
+    if existentes:
+        raise FileExistsError(f"Shards já existem: {', '.join(existentes)}")
+    database.apply_migrations(origem)
+    contagens = [_copiar_shard(origem, destino, numero, shards) for numero, destino in enumerate(destinos)]
+    if limpar:
+        _limpar_origem(origem)
+    return contagens
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Divide o banco em arquivos por usuário (shards).")
+    parser.add_argument("banco", help="banco existente (passa a ser o banco principal, com 'users')")
+    parser.add_argument("--shards", type=int, required=True, help="quantidade de shards (DATABASE_SHARDS)")
+    parser.add_argument("--limpar", action="store_true", help="apaga do banco principal os dados copiados")
+    args = parser.parse_args(argv)
+
+    if args.shards < 1:
+        parser.error("--shards deve ser pelo menos 1")
+    if not os.path.exists(args.banco):
+        print(f"Banco não encontrado: {args.banco}")
+        return 1
+
+    inicio = time.perf_counter()
+    try:
+        contagens = dividir(args.banco, args.shards, args.limpar)
+    except FileExistsError as e:
+        print(e)
+        return 1
+    for caminho, contagem in zip(database.get_shard_paths(args.banco, args.shards), contagens):
+        print(f"{caminho}: " + ", ".join(f"{n} {tabela}" for tabela, n in contagem.items()))
+    print(f"Banco dividido em {args.shards} shards em {time.perf_counter() - inicio:.1f}s. "
+          f"Suba o app com DATABASE_SHARDS={args.shards}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Escritor único: todas as escritas de um arquivo SQLite em uma só thread, em transações agrupadas.
+
+Com as threads do Waitress escrevendo cada uma pela sua conexão, as escritas disputam o lock do
+arquivo: quem não consegue espera (timeout do sqlite3) ou falha com "database is locked". Com
+ESCRITOR_ATIVO, as escritas de database.py (contas, ajustes de limite/saldo, lote do rollover; ver
+database._executar_escrita) viram operações em uma fila, consumida por uma thread por arquivo:
+
+    1. pega a primeira operação da fila e as que já estiverem esperando (até ESCRITOR_LOTE);
+    2. roda todas em uma única transação (BEGIN IMMEDIATE ... COMMIT), cada uma em um SAVEPOINT:
+       uma operação que falha desfaz só o que ela fez, e recebe a exceção;
+    3. depois do COMMIT, devolve o resultado de cada operação à requisição que está esperando.
+
+Um só escritor por arquivo nunca disputa o lock com outro, e um COMMIT (o fsync) serve a várias
+requisições. As leituras continuam nas conexões de cada requisição. Com shards por usuário, cada
+shard tem o seu escritor. Sem ESCRITOR_ATIVO (padrão), cada escrita abre a sua conexão, como antes.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+import database
+
+LOTE_PADRAO = 64  # Operações por transação
+TIMEOUT_PADRAO = 30  # Segundos que a requisição espera pelo resultado
+
+
+class _Fila:
+    """Fila e thread do escritor de um arquivo."""
+
+    def __init__(self, caminho, lote, conectar):
+        self.caminho = caminho
+        self.lote = lote
+        self._conectar = conectar
+        self.fila = queue.Queue()
+        self.thread = threading.Thread(target=self._executar, name=f"escritor:{caminho}", daemon=True)
+        self.thread.start()
+
+    def _proximo_lote(self):
+        operacoes = [self.fila.get()]
+        while len(operacoes) < self.lote:
+            try:
+                operacoes.append(self.fila.get_nowait())
+            except queue.Empty:
+                break
+        return operacoes
+
+    def _executar(self):
+        conn = self._conectar(self.caminho)
+        conn.isolation_level = None  # Controle manual da transação
+        try:
+            while True:
+                operacoes = self._proximo_lote()
+                encerrar = None in operacoes
+                operacoes = [op for op in operacoes if op is not None]
+                if operacoes:
+                    self._gravar(conn, operacoes)
+                if encerrar:
+                    return
+        finally:
+            conn.close()
+
+    def _gravar(self, conn, operacoes):
+        resultados = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for futuro, funcao, args in operacoes:
+                conn.execute("SAVEPOINT operacao")
+                try:
+                    resultados.append((futuro, funcao(conn, *args), None))
+                    conn.execute("RELEASE operacao")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operacao")
+                    conn.execute("RELEASE operacao")
+                    resultados.append((futuro, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Falha na transação inteira (ex: COMMIT): nenhuma operação do lote foi gravada
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for futuro, _, _ in operacoes:
+                futuro.set_exception(e)
+            return
+        for futuro, resultado, erro in resultados:
+            if erro is not None:
+                futuro.set_exception(erro)
+            else:
+                futuro.set_result(resultado)
+
+
+class EscritorUnico:
+    """Um escritor (fila + thread) por arquivo de banco, criado no primeiro uso."""
+
+    def __init__(self, conectar, lote=LOTE_PADRAO, timeout=TIMEOUT_PADRAO):
+        self.lote = lote
+        self.timeout = timeout
+        self._conectar = conectar
+        self._filas = {}
+        self._lock = threading.Lock()
+
+    def _fila(self, caminho):
+        # Criada no primeiro uso: sob o gunicorn, dentro de cada worker (depois do fork)
+        with self._lock:
+            if caminho not in self._filas:
+                self._filas[caminho] = _Fila(caminho, self.lote, self._conectar)
+            return self._filas[caminho]
+
+    def executar(self, caminho, funcao, *args):
+        """Roda funcao(conn, *args) no escritor do arquivo e devolve o resultado (ou levanta a exceção).
+
+        A função não deve fazer commit/rollback: a transação é do escritor. Se o resultado não chegar
+        em ESCRITOR_TIMEOUT segundos, levanta TimeoutError (a operação ainda pode ser gravada depois).
+        """
+        futuro = Future()
+        self._fila(caminho).fila.put((futuro, funcao, args))
+        return futuro.result(timeout=self.timeout)
+
+    def encerrar(self):
+        """Termina as threads depois das operações já enfileiradas."""
+        with self._lock:
+            filas, self._filas = list(self._filas.values()), {}
+        for fila in filas:
+            fila.fila.put(None)
+        for fila in filas:
+            fila.thread.join()
+
+
+def init_app(app):
+    """Registra o escritor único do app se ESCRITOR_ATIVO (as threads só sobem no primeiro uso)."""
+    app.config.setdefault("ESCRITOR_ATIVO", False)
+    app.config.setdefault("ESCRITOR_LOTE", LOTE_PADRAO)
+    app.config.setdefault("ESCRITOR_TIMEOUT", TIMEOUT_PADRAO)
+    if app.config["ESCRITOR_ATIVO"]:
+        app.extensions["escritor"] = EscritorUnico(
+            database.get_db_connection, app.config["ESCRITOR_LOTE"], app.config["ESCRITOR_TIMEOUT"]
+        )
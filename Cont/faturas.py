@@ -0,0 +1,80 @@
+"""Ciclos de fatura de cartão de crédito (dia de fechamento e dia de vencimento).
+
+Cada fatura é identificada pelo mês do seu fechamento (`ciclo`, uma date no dia 1). Ela reúne
+os lançamentos com data depois do fechamento anterior até o fechamento do ciclo, inclusive:
+
+    fechamento dia 5:  06/09 .. 05/10 -> ciclo 2025-10-01
+
+Em meses mais curtos que o dia configurado, o fechamento (e o vencimento) cai no último dia do
+mês, como no cronograma de parcelas (parcelas.py). A fatura vence no mês do fechamento se o dia
+de vencimento for depois do de fechamento; senão, no mês seguinte.
+
+Os totais de cada ciclo são calculados no banco (database.get_totais_faturas), por intervalo de
+datas nos índices de contas por tipo de pagamento. Aqui ficam só as contas de datas.
+"""
+import calendar
+from datetime import date, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+FATURAS_ANTERIORES = 6
+FATURAS_FUTURAS = 6
+
+
+def dia_no_mes(ano, mes, dia):
+    """date(ano, mes, dia), com o dia limitado ao último dia do mês."""
+    return date(ano, mes, min(dia, calendar.monthrange(ano, mes)[1]))
+
+
+def ciclo_de(data, dia_fechamento):
+    """Ciclo (dia 1 do mês do fechamento) da fatura em que cai um lançamento na `data`."""
+    inicio_mes = data.replace(day=1)
+    # data.day só passa de dia_fechamento se o fechamento deste mês já aconteceu
+    return inicio_mes if data.day <= dia_fechamento else inicio_mes + relativedelta(months=1)
+
+
+def fechamento(ciclo, dia_fechamento):
+    return dia_no_mes(ciclo.year, ciclo.month, dia_fechamento)
+
+
+def vencimento(ciclo, dia_fechamento, dia_vencimento):
+    mes = ciclo if dia_vencimento > dia_fechamento else ciclo + relativedelta(months=1)
+    return dia_no_mes(mes.year, mes.month, dia_vencimento)
+
+
+def periodo(ciclo, dia_fechamento):
+    """(início, fim) dos lançamentos do ciclo: início inclusivo, fim exclusivo."""
+    anterior = fechamento(ciclo - relativedelta(months=1), dia_fechamento)
+    return anterior + timedelta(days=1), fechamento(ciclo, dia_fechamento) + timedelta(days=1)
+
+
+def montar_faturas(cartao, totais, hoje, anteriores=FATURAS_ANTERIORES, futuras=FATURAS_FUTURAS):
+    """Lista das faturas do cartão ao redor da fatura aberta em `hoje`.
+
+    Args:
+        cartao (Cartao): Cartão com dia_fechamento e dia_vencimento.
+        totais (dict): ciclo (date) -> (quantidade de lançamentos, total), de get_totais_faturas.
+        hoje (date): Data de referência (define a fatura aberta).
+        anteriores (int): Faturas já fechadas a exibir.
+        futuras (int): Faturas futuras a exibir, depois da aberta.
+
+    Returns:
+        list[dict]: Um item por ciclo, em ordem, com 'ciclo', 'inicio', 'fechamento', 'vencimento',
+            'quantidade', 'total' e 'situacao' ('fechada', 'aberta' ou 'futura').
+    """
+    aberta = ciclo_de(hoje, cartao.dia_fechamento)
+    faturas = []
+    for deslocamento in range(-anteriores, futuras + 1):
+        ciclo = aberta + relativedelta(months=deslocamento)
+        inicio, _ = periodo(ciclo, cartao.dia_fechamento)
+        quantidade, total = totais.get(ciclo, (0, 0))
+        faturas.append({
+            "ciclo": ciclo,
+            "inicio": inicio,
+            "fechamento": fechamento(ciclo, cartao.dia_fechamento),
+            "vencimento": vencimento(ciclo, cartao.dia_fechamento, cartao.dia_vencimento),
+            "quantidade": quantidade,
+            "total": total,
+            "situacao": "aberta" if deslocamento == 0 else ("fechada" if deslocamento < 0 else "futura"),
+        })
+    return faturas
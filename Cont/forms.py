@@ -174,9 +174,24 @@ class CartaoForm(FlaskForm):
     # Campo para o limite total. Usa StringField para a máscara e o validador decimal customizado. Obrigatório.
     limite = StringField('Limite Total',
                          validators=[DataRequired(message="O limite é obrigatório."), decimal_field_validator])
+    # Dias do ciclo da fatura (opcionais, mas informados juntos). Usados na tela de faturas do cartão.
+    dia_fechamento = IntegerField('Dia de Fechamento da Fatura (Opcional)',
+                                  validators=[Optional(), NumberRange(min=1, max=31, message="Informe um dia entre 1 e 31.")])
+    dia_vencimento = IntegerField('Dia de Vencimento da Fatura (Opcional)',
+                                  validators=[Optional(), NumberRange(min=1, max=31, message="Informe um dia entre 1 e 31.")])
     # Botão de submissão.
     submit = SubmitField('Salvar Cartão')
 
+    # Um dia sem o outro não define o ciclo da fatura. Fica na validação do formulário porque
+    # Optional() encerra (e limpa) a validação do campo vazio, inclusive de um validate_dia_*.
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators):
+            return False
+        if (self.dia_fechamento.data is None) != (self.dia_vencimento.data is None):
+            self.dia_vencimento.errors.append("Informe o dia de fechamento e o dia de vencimento, ou nenhum dos dois.")
+            return False
+        return True
+
 
 # --- Formulário para Adicionar/Editar Conta Bancária ---
 class ContaBancariaForm(FlaskForm):
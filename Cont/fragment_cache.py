@@ -0,0 +1,69 @@
+"""Cache de fragmentos de template já renderizados (HTML).
+
+As chaves incluem o usuário, o período exibido e a versão dos dados do usuário
+(users.data_version). Qualquer escrita muda a versão, então um fragmento antigo
+nunca é reaproveitado: ele apenas deixa de ser consultado e sai do cache pelo LRU.
+
+Cada app tem o seu cache (app.extensions["fragment_cache"], criado em init_app): dois apps no
+mesmo processo apontando para bancos diferentes (benchmark, carga, verificar_planos) não trocam
+fragmentos entre si, mesmo com o mesmo usuário e a mesma versão.
+"""
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from markupsafe import Markup
+
+MAX_ENTRADAS_PADRAO = 1000
+
+
+class FragmentCache:
+    """Cache LRU em memória (por processo), seguro para uso entre threads."""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_PADRAO):
+        self.max_entradas = max_entradas
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def get(self, chave):
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is None:
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_entradas:
+                self._itens.popitem(last=False)
+
+    def get_or_render(self, chave, renderizar):
+        """Retorna os fragmentos da chave; se não estiverem no cache, chama renderizar()
+        (que deve devolver um dict nome -> HTML) e guarda o resultado."""
+        fragmentos = self.get(chave)
+        if fragmentos is None:
+            fragmentos = {nome: Markup(html) for nome, html in renderizar().items()}
+            self.set(chave, fragmentos)
+        return fragmentos
+
+    def clear(self):
+        with self._lock:
+            self._itens.clear()
+
+
+def obter():
+    """Cache de fragmentos do app atual."""
+    return current_app.extensions["fragment_cache"]
+
+
+def init_app(app):
+    """Cria o cache de fragmentos do app (FRAGMENT_CACHE_MAX entradas)."""
+    app.config.setdefault("FRAGMENT_CACHE_MAX", MAX_ENTRADAS_PADRAO)
+    app.extensions["fragment_cache"] = FragmentCache(app.config["FRAGMENT_CACHE_MAX"])
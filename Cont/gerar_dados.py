@@ -0,0 +1,303 @@
+"""Gerador de dados financeiros sintéticos (para testes de desempenho e reprodução local).
+
+Gera, direto em um arquivo SQLite e com inserts em lote, usuários com:
+- categorias (Mercado, Moradia, Transporte, ...);
+- cartões de crédito e contas bancárias;
+- contas recorrentes mensais (aluguel, energia, internet...), com o próximo vencimento;
+- compras parceladas nos cartões, ao longo de vários anos (com o cronograma de parcelas, ver parcelas.py);
+- compras avulsas (à vista) ao longo do histórico.
+
+O resultado é determinístico para a mesma seed e a mesma data de referência (--hoje).
+
+Consistência dos saldos: limite_disponivel e saldo ficam como se cada conta tivesse sido cadastrada
+pela tela "Adicionar Conta", que debita o valor total da compra do tipo de pagamento escolhido:
+    limite_disponivel = limite - soma(valor_total_compra das contas do cartão)   (nunca negativo)
+    saldo             = saldo inicial - soma(valor_total_compra das contas da conta bancária)
+Uma compra que não cabe no limite restante de nenhum cartão vai para uma conta bancária.
+
+Uso (dentro de Cont/):
+    python gerar_dados.py dados.db --escala media
+    python gerar_dados.py dados.db --usuarios 20 --anos 4 --contas 2000 --seed 7
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from werkzeug.security import generate_password_hash
+
+import database
+import parcelas
+
+SENHA_PADRAO = "senha123"
+
+# Presets de --escala (cada opção pode ser sobrescrita individualmente)
+ESCALAS = {
+    "pequena": {"usuarios": 5, "anos": 2, "contas": 300, "categorias": 10, "cartoes": 2, "contas_bancarias": 1},
+    "media": {"usuarios": 50, "anos": 3, "contas": 1500, "categorias": 15, "cartoes": 3, "contas_bancarias": 2},
+    "grande": {"usuarios": 500, "anos": 5, "contas": 3000, "categorias": 20, "cartoes": 4, "contas_bancarias": 2},
+}
+
+NOMES_CATEGORIAS = [
+    "Mercado", "Moradia", "Transporte", "Saúde", "Educação", "Lazer", "Restaurantes", "Vestuário",
+    "Assinaturas", "Farmácia", "Combustível", "Pets", "Viagens", "Impostos", "Presentes", "Eletrônicos",
+    "Casa", "Beleza", "Seguros", "Serviços",
+]
+
+# (nome, categoria, faixa de valor)
+RECORRENTES = [
+    ("Aluguel", "Moradia", (900, 3500)),
+    ("Condomínio", "Moradia", (250, 900)),
+    ("Energia", "Moradia", (90, 450)),
+    ("Água", "Moradia", (40, 180)),
+    ("Internet", "Assinaturas", (80, 200)),
+    ("Celular", "Assinaturas", (40, 150)),
+    ("Streaming", "Assinaturas", (20, 60)),
+    ("Academia", "Saúde", (70, 200)),
+    ("Plano de Saúde", "Saúde", (250, 1200)),
+    ("Escola", "Educação", (500, 2500)),
+]
+
+# (descrição, categoria, faixa de valor total, máximo de parcelas)
+COMPRAS = [
+    ("Supermercado", "Mercado", (50, 900), 1),
+    ("Padaria", "Mercado", (10, 80), 1),
+    ("Posto", "Combustível", (80, 400), 1),
+    ("Uber", "Transporte", (12, 90), 1),
+    ("Restaurante", "Restaurantes", (40, 350), 1),
+    ("Farmácia", "Farmácia", (15, 300), 1),
+    ("Roupas", "Vestuário", (80, 1200), 6),
+    ("Notebook", "Eletrônicos", (2500, 9000), 12),
+    ("Celular novo", "Eletrônicos", (1200, 7000), 12),
+    ("Geladeira", "Casa", (2000, 6000), 10),
+    ("Móveis", "Casa", (800, 8000), 10),
+    ("Passagens", "Viagens", (600, 5000), 10),
+    ("Hotel", "Viagens", (400, 4000), 6),
+    ("Curso online", "Educação", (200, 2500), 12),
+    ("Pet shop", "Pets", (60, 600), 3),
+    ("Presente", "Presentes", (50, 800), 3),
+    ("Salão", "Beleza", (40, 400), 1),
+    ("Seguro do carro", "Seguros", (1500, 5000), 10),
+    ("IPVA", "Impostos", (600, 4000), 5),
+]
+
+
+def _valor(rnd, faixa):
+    return round(rnd.uniform(*faixa), 2)
+
+
+class _Ids:
+    """Próximo ID livre de cada tabela (IDs atribuídos aqui permitem inserir tudo em lote)."""
+
+    def __init__(self, conn):
+        self._proximo = {
+            tabela: (conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabela}").fetchone()[0] + 1)
+            for tabela in ("users", "categorias", "tipos_pagamento", "contas")
+        }
+
+    def novo(self, tabela):
+        valor = self._proximo[tabela]
+        self._proximo[tabela] += 1
+        return valor
+
+
+def _gerar_usuario(rnd, ids, user_id, hoje, anos, contas, categorias, cartoes, contas_bancarias, atrasadas):
+    """Gera as linhas (categorias, tipos_pagamento, contas) de um usuário."""
+    # --- Categorias ---
+    nomes = NOMES_CATEGORIAS[:categorias] + [f"Categoria {i}" for i in range(len(NOMES_CATEGORIAS) + 1, categorias + 1)]
+    cat_por_nome = {nome: ids.novo("categorias") for nome in nomes}
+    linhas_cat = [(cid, nome, user_id) for nome, cid in cat_por_nome.items()]
+    cat_ids = list(cat_por_nome.values())
+
+    def categoria(nome):
+        return cat_por_nome.get(nome) or (rnd.choice(cat_ids) if cat_ids else None)
+
+    # --- Tipos de pagamento ---
+    cartoes_lista = []  # [id, nome, limite, disponível]
+    for i in range(1, cartoes + 1):
+        limite = float(rnd.randint(20, 300) * 100)
+        cartoes_lista.append([ids.novo("tipos_pagamento"), f"Cartão {i}", limite, limite])
+    bancos = [(ids.novo("tipos_pagamento"), f"Conta Bancária {i}") for i in range(1, contas_bancarias + 1)]
+
+    def pagar(total, preferir_cartao):
+        """Escolhe o tipo de pagamento e debita o valor total (retorna o ID ou None)."""
+        if preferir_cartao:
+            candidatos = [c for c in cartoes_lista if c[3] >= total]
+            if candidatos:
+                cartao = rnd.choice(candidatos)
+                cartao[3] = round(cartao[3] - total, 2)
+                return cartao[0]
+        if bancos:
+            return rnd.choice(bancos)[0]
+        return None
+
+    linhas_contas = []
+    inicio = hoje - relativedelta(years=anos)
+    dias_historico = (hoje - inicio).days
+
+    # --- Recorrentes mensais: uma linha por conta, com o próximo vencimento ---
+    for nome, cat, faixa in rnd.sample(RECORRENTES, k=min(len(RECORRENTES), max(1, contas // 50))):
+        valor = _valor(rnd, faixa)
+        dia = rnd.randint(1, 28)
+        venc = date(hoje.year, hoje.month, dia)
+        if venc < hoje:
+            venc += relativedelta(months=1)
+        if rnd.random() < atrasadas:
+            venc -= relativedelta(months=1)  # Ainda não processada pelo rollover
+        tp_id = pagar(valor, preferir_cartao=rnd.random() < 0.3)
+        linhas_contas.append((nome, valor, valor, venc, categoria(cat), None, None, 1, tp_id, None))
+
+    # --- Compras (avulsas e parceladas) ao longo do histórico ---
+    while len(linhas_contas) < contas:
+        nome, cat, faixa, max_parcelas = rnd.choice(COMPRAS)
+        total = _valor(rnd, faixa)
+        data_compra = inicio + relativedelta(days=rnd.randint(0, dias_historico))
+        n = rnd.randint(2, max_parcelas) if max_parcelas > 1 and rnd.random() < 0.7 else 1
+        tp_id = pagar(total, preferir_cartao=n > 1 or rnd.random() < 0.6)
+        if n == 1:
+            linhas_contas.append((nome, total, total, data_compra, categoria(cat), None, None, 0, tp_id, None))
+            continue
+        valor_parcela = round(total / n, 2)
+        # Cronograma: 1ª parcela no mês seguinte à compra (ver parcelas.py). A linha guarda a parcela
+        # "atual" de quando foi gravada; às vezes uma já vencida, como num cadastro antigo.
+        primeiro = data_compra + relativedelta(months=1)
+        parcela, _ = parcelas.parcela_em(primeiro, n, hoje)
+        if parcela < n and parcela > 1 and rnd.random() < atrasadas:
+            parcela -= 1
+        linhas_contas.append(
+            (nome, valor_parcela, total, parcelas.vencimento_da_parcela(primeiro, parcela), categoria(cat),
+             parcela, n, 0, tp_id, primeiro)
+        )
+
+    # Ciclo da fatura derivado do id (sem sortear: não muda a sequência do gerador para a mesma seed);
+    # vence 7 dias depois do fechamento
+    linhas_tp = []
+    for c in cartoes_lista:
+        fechamento = 1 + (c[0] * 11) % 28
+        linhas_tp.append((c[0], c[1], "cartao", c[2], c[3], None, user_id, fechamento, 1 + (fechamento + 6) % 28))
+    for banco_id, nome in bancos:
+        # Gera o saldo final (positivo); o saldo inicial implícito é ele + tudo o que foi debitado
+        linhas_tp.append((banco_id, nome, "conta", None, None, float(rnd.randint(5, 500) * 100), user_id, None, None))
+
+    linhas_contas = [
+        (ids.novo("contas"), nome, valor, total, venc.isoformat(), cat_id, parcela, n, user_id, recorrente, tp_id,
+         primeiro.isoformat() if primeiro else None,
+         parcelas.ultimo_vencimento(primeiro, n).isoformat() if primeiro else None)
+        for nome, valor, total, venc, cat_id, parcela, n, recorrente, tp_id, primeiro in linhas_contas
+    ]
+    return linhas_cat, linhas_tp, linhas_contas
+
+
+def gerar(caminho, usuarios=5, anos=2, contas=300, categorias=10, cartoes=2, contas_bancarias=1,
+          seed=42, hoje=None, atrasadas=0.0, prefixo="usuario", senha=SENHA_PADRAO):
+    """Gera os dados no banco `caminho` (criado/migrado se necessário) e retorna as contagens.
+
+    Args:
+        caminho (str): Arquivo SQLite de destino. Dados existentes são mantidos.
+        usuarios (int): Número de usuários (usernames '<prefixo>1', '<prefixo>2', ...).
+        anos (int): Anos de histórico antes de `hoje`.
+        contas (int): Contas por usuário (recorrentes + compras).
+        categorias, cartoes, contas_bancarias (int): Quantidades por usuário.
+        seed (int): Semente do gerador aleatório.
+        hoje (date, optional): Data de referência (padrão: hoje).
+        atrasadas (float): Fração (0 a 1) de recorrentes/parcelas ativas deixadas com vencimento
+            passado, como se o usuário não acessasse há um mês (trabalho para o rollover, nas
+            recorrentes; nas parceladas a parcela atual é calculada na leitura).
+        prefixo (str): Prefixo dos usernames.
+        senha (str): Senha de todos os usuários gerados.
+
+    Returns:
+        dict: Número de linhas inseridas por tabela.
+    """
+    rnd = random.Random(seed)
+    hoje = hoje or date.today()
+    database.apply_migrations(caminho)
+    senha_hash = generate_password_hash(senha)  # Um hash só: gerar um por usuário é lento
+
+    conn = database.get_db_connection(caminho)
+    conn.execute("PRAGMA synchronous = OFF")  # Só durante a geração; o arquivo é validado no commit
+    try:
+        ids = _Ids(conn)
+        usuarios_linhas, cat_linhas, tp_linhas, contas_linhas = [], [], [], []
+        for u in range(1, usuarios + 1):
+            user_id = ids.novo("users")
+            usuarios_linhas.append((user_id, f"{prefixo}{user_id}", senha_hash))
+            cats, tps, cts = _gerar_usuario(
+                rnd, ids, user_id, hoje, anos, contas, categorias, cartoes, contas_bancarias, atrasadas
+            )
+            cat_linhas += cats
+            tp_linhas += tps
+            contas_linhas += cts
+
+        with conn:  # Uma transação para tudo
+            conn.executemany("INSERT INTO users (id, username, password) VALUES (?, ?, ?)", usuarios_linhas)
+            conn.executemany("INSERT INTO categorias (id, nome, user_id) VALUES (?, ?, ?)", cat_linhas)
+            conn.executemany(
+                "INSERT INTO tipos_pagamento (id, nome, tipo, limite, limite_disponivel, saldo, user_id, "
+                "dia_fechamento, dia_vencimento) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                tp_linhas,
+            )
+            conn.executemany(
+                "INSERT INTO contas (id, nome, valor, valor_total_compra, vencimento, categoria_id, parcela_atual, "
+                "total_parcelas, user_id, recorrente, tipo_pagamento_id, primeiro_vencimento, ultimo_vencimento) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                contas_linhas,
+            )
+            # O valor final de cada cartão/conta abre o livro-razão (uma movimentação + snapshot). Só os
+            # gerados agora (ids novos, acima dos existentes): os que já estavam no banco têm o seu livro
+            if tp_linhas:
+                primeiro_tp = min(linha[0] for linha in tp_linhas)
+                conn.execute(
+                    "INSERT INTO movimentacoes (tipo_pagamento_id, user_id, delta, motivo) "
+                    "SELECT id, user_id, ROUND(CASE WHEN tipo = 'cartao' THEN limite_disponivel ELSE saldo END, 2), ? "
+                    "FROM tipos_pagamento WHERE id >= ?",
+                    (database.MOTIVO_ABERTURA, primeiro_tp),
+                )
+                conn.execute(
+                    "INSERT INTO saldos_snapshot (tipo_pagamento_id, movimentacao_id, saldo) "
+                    "SELECT tipo_pagamento_id, id, delta FROM movimentacoes WHERE tipo_pagamento_id >= ?",
+                    (primeiro_tp,),
+                )
+    finally:
+        conn.close()
+
+    return {
+        "users": len(usuarios_linhas),
+        "categorias": len(cat_linhas),
+        "tipos_pagamento": len(tp_linhas),
+        "contas": len(contas_linhas),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados financeiros sintéticos em um banco SQLite.")
+    parser.add_argument("banco", help="arquivo SQLite de destino (criado se não existir)")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    for opcao in ("usuarios", "anos", "contas", "categorias", "cartoes", "contas_bancarias"):
+        parser.add_argument(f"--{opcao.replace('_', '-')}", dest=opcao, type=int,
+                            help="sobrescreve o valor da escala")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--hoje", type=date.fromisoformat, help="data de referência AAAA-MM-DD (padrão: hoje)")
+    parser.add_argument("--atrasadas", type=float, default=0.0,
+                        help="fração de recorrentes/parcelas com vencimento passado (0 a 1)")
+    parser.add_argument("--prefixo", default="usuario", help="prefixo dos usernames")
+    parser.add_argument("--senha", default=SENHA_PADRAO)
+    args = parser.parse_args(argv)
+
+    parametros = dict(ESCALAS[args.escala])
+    parametros.update({k: v for k, v in vars(args).items() if k in parametros and v is not None})
+
+    inicio = time.perf_counter()
+    contagens = gerar(
+        args.banco, seed=args.seed, hoje=args.hoje, atrasadas=args.atrasadas,
+        prefixo=args.prefixo, senha=args.senha, **parametros,
+    )
+    duracao = time.perf_counter() - inicio
+    print(", ".join(f"{n} {tabela}" for tabela, n in contagens.items()) + f" gerados em {duracao:.1f}s.")
+    print(f"Login: {args.prefixo}<id> / senha '{args.senha}'")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""Configuração do gunicorn (lida automaticamente ao rodar 'gunicorn' dentro de Cont/).
+
+Variáveis de ambiente:
+    GUNICORN_BIND      Endereço (padrão 0.0.0.0:5000)
+    GUNICORN_WORKERS   Número de processos (padrão 2 * núcleos + 1)
+    GUNICORN_THREADS   Threads por processo (padrão 1)
+    DATABASE           Caminho do banco SQLite (o mesmo para todos os workers)
+    DATABASE_SHARDS    Arquivos de dados por usuário (padrão 0 = tudo em DATABASE)
+"""
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+
+
+def on_starting(server):
+    """Roda uma única vez no processo master, antes de criar os workers:
+    aplica as migrações pendentes do schema (os workers não repetem esse trabalho)."""
+    from app import configuracao_padrao
+    from database import apply_migrations_all
+
+    config = configuracao_padrao()
+    versao = apply_migrations_all(config["DATABASE"], config["DATABASE_SHARDS"])
+    server.log.info("Schema do banco de dados na versão %s.", versao)
@@ -0,0 +1,111 @@
+"""Leituras pesadas fora do caminho das escritas: conexões somente leitura e réplica opcional.
+
+Relatórios, exportações (GET da API) e páginas de análise só leem, mas abriam as mesmas conexões
+de leitura e escrita do resto do app. As views marcadas com @somente_leitura passam a abrir, em
+get_db() e nas funções de database.py sem arquivo explícito, conexões 'mode=ro' (URI do SQLite):
+um SELECT esquecido em uma transação nunca vira escrita, e a conexão não segura RESERVED/EXCLUSIVE.
+As escritas que essas views ainda fazem (ex: o rollover das recorrentes) continuam com conexões
+normais (ver database._executar_escrita).
+
+Com LEITURA_REPLICA, as views marcadas com replica=True leem de uma cópia do arquivo
+('contas.db' -> 'contas.replica.db'; um por shard), refeita a cada LEITURA_REPLICA_INTERVALO
+segundos por uma thread com a API de backup do SQLite. A cópia é gravada em um arquivo temporário
+e trocada de uma vez (os.replace): quem já está lendo a réplica antiga termina nela. As leituras na
+réplica podem estar até um intervalo atrasadas; enquanto a primeira cópia não existe, a leitura é
+no próprio arquivo (somente leitura).
+"""
+import functools
+import os
+import sqlite3
+import threading
+import time
+
+from flask import g
+
+import database
+
+INTERVALO_PADRAO = 60  # Segundos entre as cópias da réplica
+
+
+def somente_leitura(view=None, *, replica=True):
+    """Marca uma view como somente leitura (conexões 'mode=ro').
+
+    Use @somente_leitura, ou @somente_leitura(replica=False) nas views que precisam ler o que
+    acabaram de gravar (ex: as que rodam o rollover antes de montar a página).
+    """
+    if view is None:
+        return functools.partial(somente_leitura, replica=replica)
+
+    @functools.wraps(view)
+    def envolvida(*args, **kwargs):
+        g.somente_leitura = True
+        g.leitura_replica = replica
+        return view(*args, **kwargs)
+
+    return envolvida
+
+
+def copiar(origem, destino):
+    """Copia 'origem' para 'destino' com a API de backup e troca o arquivo de uma vez."""
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    conn_origem = sqlite3.connect(database.uri_somente_leitura(origem), uri=True)
+    conn_destino = sqlite3.connect(temporario)
+    try:
+        conn_origem.backup(conn_destino)
+    finally:
+        conn_destino.close()
+        conn_origem.close()
+    os.replace(temporario, destino)
+
+
+class Replica:
+    """Réplicas dos arquivos do banco, refeitas periodicamente por uma thread."""
+
+    def __init__(self, intervalo=INTERVALO_PADRAO):
+        self.intervalo = intervalo
+        self._origens = set()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def caminho(self, origem):
+        """Arquivo a ler no lugar de 'origem': a réplica, se já existir; senão a própria origem."""
+        with self._lock:
+            self._origens.add(origem)
+            if self._thread is None:
+                # Criada no primeiro uso: sob o gunicorn, dentro de cada worker (depois do fork)
+                self._thread = threading.Thread(target=self._executar, name="replica", daemon=True)
+                self._thread.start()
+        destino = database.caminho_replica(origem)
+        return destino if os.path.exists(destino) else origem
+
+    def atualizar(self, origem):
+        """Refaz a réplica de 'origem' se ela for mais velha que o intervalo.
+
+        Com vários workers do gunicorn, o primeiro a passar do intervalo copia; os outros veem a
+        réplica nova e não copiam de novo.
+        """
+        destino = database.caminho_replica(origem)
+        try:
+            if os.path.exists(destino) and time.time() - os.path.getmtime(destino) < self.intervalo:
+                return False
+            copiar(origem, destino)
+            return True
+        except (sqlite3.Error, OSError) as e:
+            print(f"Erro ao atualizar a réplica de {origem}: {e}")
+            return False
+
+    def _executar(self):
+        while True:
+            with self._lock:
+                origens = list(self._origens)
+            for origem in origens:
+                self.atualizar(origem)
+            time.sleep(self.intervalo)
+
+
+def init_app(app):
+    """Registra a réplica do app se LEITURA_REPLICA (a thread só sobe no primeiro uso)."""
+    app.config.setdefault("LEITURA_REPLICA", False)
+    app.config.setdefault("LEITURA_REPLICA_INTERVALO", INTERVALO_PADRAO)
+    if app.config["LEITURA_REPLICA"]:
+        app.extensions["replica"] = Replica(app.config["LEITURA_REPLICA_INTERVALO"])
@@ -0,0 +1,206 @@
+"""Métricas no formato texto do Prometheus, em GET /metrics.
+
+Coletadas com custo baixo (contadores em memória, um lock curto por atualização):
+- requisições e latência por rota (endpoint do Flask), método e status;
+- comandos SQL executados e tempo gasto no banco por rota, e conexões abertas
+  (via observador registrado em database.py);
+- duração do rollover de vencimentos (update_parcelas_recorrentes);
+- acertos/falhas do cache de fragmentos;
+- número de contas processadas por renderização do dashboard.
+
+Os valores são por processo: com vários workers (gunicorn), cada um expõe os seus.
+Se METRICAS_TOKEN estiver configurado, /metrics exige 'Authorization: Bearer <token>'.
+"""
+import functools
+import threading
+import time
+
+from flask import Response, abort, g, has_request_context, request
+
+import database
+import fragment_cache
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONTAS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = threading.Lock()
+_metricas = []  # Na ordem em que aparecem em /metrics
+
+
+def _rotulos(nomes, valores):
+    if not nomes:
+        return ""
+    pares = []
+    for nome, valor in zip(nomes, valores):
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pares.append(f'{nome}="{valor}"')
+    return "{" + ",".join(pares) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador (só cresce), opcionalmente com rótulos."""
+
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self._valores = {}
+        _metricas.append(self)
+
+    def inc(self, valor=1, *rotulos):
+        with _lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def linhas(self):
+        for chave, valor in sorted(self._valores.items()):
+            yield f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}"
+
+
+class Histograma:
+    """Histograma com buckets fixos, opcionalmente com rótulos."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, buckets, rotulos=()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self.buckets = tuple(buckets)
+        self._series = {}  # rótulos -> [contagens por bucket..., soma, total]
+        _metricas.append(self)
+
+    def observe(self, valor, *rotulos):
+        with _lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def linhas(self):
+        nomes_le = self.rotulos + ("le",)
+        for chave, serie in sorted(self._series.items()):
+            acumulado = 0
+            for limite, n in zip(self.buckets, serie):
+                acumulado += n
+                yield f"{self.nome}_bucket{_rotulos(nomes_le, chave + (limite,))} {acumulado}"
+            yield f"{self.nome}_bucket{_rotulos(nomes_le, chave + ('+Inf',))} {serie[-1]}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(serie[-2])}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, chave)} {serie[-1]}"
+
+
+class Coletado:
+    """Valor lido no momento da coleta (ex: contadores mantidos por outro módulo)."""
+
+    def __init__(self, nome, ajuda, tipo, ler):
+        self.nome, self.ajuda, self.tipo, self._ler = nome, ajuda, tipo, ler
+        _metricas.append(self)
+
+    def linhas(self):
+        yield f"{self.nome} {_numero(self._ler())}"
+
+
+# --- Métricas ---
+REQUISICOES = Contador("http_requests_total", "Requisições HTTP atendidas.", ("endpoint", "method", "status"))
+LATENCIA = Histograma("http_request_duration_seconds", "Duração das requisições HTTP.", BUCKETS_LATENCIA,
+                      ("endpoint",))
+DB_COMANDOS = Contador("db_queries_total", "Comandos SQL executados, por rota.", ("endpoint",))
+DB_TEMPO = Contador("db_query_seconds_total", "Tempo gasto executando comandos SQL, por rota.", ("endpoint",))
+DB_CONEXOES = Contador("db_connections_opened_total", "Conexões SQLite abertas.")
+ROLLOVER = Histograma("rollover_duration_seconds", "Duração de update_parcelas_recorrentes.", BUCKETS_LATENCIA)
+DASHBOARD_CONTAS = Histograma("dashboard_contas_processadas", "Contas processadas por renderização do dashboard.",
+                              BUCKETS_CONTAS)
+
+
+def _taxa_acertos_fragmentos():
+    cache = fragment_cache.obter()
+    return cache.acertos / ((cache.acertos + cache.falhas) or 1)
+
+
+# Lidos do cache do app que atende /metrics
+Coletado("fragment_cache_hits_total", "Acertos do cache de fragmentos.", "counter",
+         lambda: fragment_cache.obter().acertos)
+Coletado("fragment_cache_misses_total", "Falhas do cache de fragmentos.", "counter",
+         lambda: fragment_cache.obter().falhas)
+Coletado("fragment_cache_hit_ratio", "Fração de acertos do cache de fragmentos.", "gauge",
+         _taxa_acertos_fragmentos)
+
+
+def gerar_texto():
+    """Todas as métricas no formato texto do Prometheus (versão 0.0.4)."""
+    saida = []
+    for metrica in _metricas:
+        saida.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+        saida.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+        with _lock:
+            saida.extend(metrica.linhas())
+    return "\n".join(saida) + "\n"
+
+
+def cronometrar(histograma):
+    """Decorador: observa a duração de cada chamada da função no histograma."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                histograma.observe(time.perf_counter() - inicio)
+        return envolvida
+
+    return decorador
+
+
+# --- Observador do Banco ---
+class ObservadorBanco:
+    """Recebe os eventos de database.py e acumula o uso do banco na requisição atual (em g)."""
+
+    def conexao_aberta(self, conn):
+        DB_CONEXOES.inc()
+
+    def comando_executado(self, segundos):
+        if has_request_context():
+            g._metricas_db_comandos = g.get("_metricas_db_comandos", 0) + 1
+            g._metricas_db_tempo = g.get("_metricas_db_tempo", 0.0) + segundos
+
+
+_observador = ObservadorBanco()
+
+
+def init_app(app):
+    """Registra a rota /metrics, os hooks por requisição e o observador do banco."""
+    app.config.setdefault("METRICAS_TOKEN", None)
+    database.add_db_observer(_observador)
+
+    @app.before_request
+    def iniciar_metricas():
+        g._metricas_inicio = time.perf_counter()
+
+    @app.after_request
+    def registrar_metricas(response):
+        inicio = g.pop("_metricas_inicio", None)
+        if inicio is None:
+            return response
+        endpoint = request.endpoint or "sem_rota"  # 404 etc.: um rótulo só, para não explodir a cardinalidade
+        REQUISICOES.inc(1, endpoint, request.method, str(response.status_code))
+        LATENCIA.observe(time.perf_counter() - inicio, endpoint)
+        comandos = g.pop("_metricas_db_comandos", 0)
+        if comandos:
+            DB_COMANDOS.inc(comandos, endpoint)
+            DB_TEMPO.inc(g.pop("_metricas_db_tempo", 0.0), endpoint)
+        return response
+
+    def expor_metricas():
+        token = app.config["METRICAS_TOKEN"]
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            abort(401)
+        return Response(gerar_texto(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_url_rule("/metrics", "metrics", expor_metricas)
@@ -178,7 +178,7 @@ class User(UserMixin):
 class Cartao:
     """Representa um cartão de crédito (um tipo de pagamento)."""
 
-    def __init__(self, id, nome, limite, limite_disponivel, user_id):
+    def __init__(self, id, nome, limite, limite_disponivel, user_id, dia_fechamento=None, dia_vencimento=None):
         """Inicializa um objeto Cartao.
 
         Args:
@@ -187,6 +187,8 @@ class Cartao:
             limite (float | str | Decimal): Limite total do cartão.
             limite_disponivel (float | str | Decimal): Limite disponível atual.
             user_id (int): ID do usuário dono do cartão.
+            dia_fechamento (int | None): Dia do mês em que a fatura fecha (ver faturas.py).
+            dia_vencimento (int | None): Dia do mês em que a fatura vence.
         """
         self.id = id
         self.nome = nome
@@ -201,6 +203,13 @@ class Cartao:
             else decimal.Decimal("0.00")
         )
         self.user_id = user_id
+        self.dia_fechamento = dia_fechamento
+        self.dia_vencimento = dia_vencimento
+
+    @property
+    def tem_ciclo_fatura(self):
+        """True se os dias de fechamento e vencimento estão definidos (necessários para as faturas)."""
+        return bool(self.dia_fechamento and self.dia_vencimento)
 
 
 # --- Modelo ContaBancaria ---
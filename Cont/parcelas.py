@@ -0,0 +1,61 @@
+"""Cronograma de parcelas calculado sob demanda.
+
+Uma compra parcelada é gravada uma única vez: vencimento da 1ª parcela (primeiro_vencimento),
+número de parcelas (total_parcelas) e valor de cada parcela. A parcela de qualquer mês, passado
+ou futuro, e a parcela "atual" são calculadas aqui, sem reescrever a linha todo mês.
+
+A parcela N vence N-1 meses depois da primeira, no mesmo dia (ajustado para o último dia em
+meses mais curtos: 31/01 -> 28/02 -> 31/03). ultimo_vencimento também é gravado na linha,
+para que "parcelas com vencimento no mês" seja uma busca por intervalo no índice
+(user_id, ultimo_vencimento) + um filtro em primeiro_vencimento.
+"""
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+
+def vencimento_da_parcela(primeiro_vencimento, numero):
+    """Data de vencimento da parcela `numero` (a partir de 1)."""
+    return primeiro_vencimento + relativedelta(months=numero - 1)
+
+
+def primeiro_vencimento_de(vencimento, parcela_atual):
+    """Vencimento da 1ª parcela, sabendo o vencimento da parcela `parcela_atual` (padrão 1)."""
+    return vencimento - relativedelta(months=(parcela_atual or 1) - 1)
+
+
+def ultimo_vencimento(primeiro_vencimento, total_parcelas):
+    return vencimento_da_parcela(primeiro_vencimento, total_parcelas)
+
+
+def parcela_em(primeiro_vencimento, total_parcelas, referencia):
+    """(número, vencimento) da parcela atual em `referencia`: a primeira que vence nesse dia ou
+    depois; se todas já venceram, a última."""
+    meses = (referencia.year - primeiro_vencimento.year) * 12 + referencia.month - primeiro_vencimento.month
+    numero = max(meses + 1, 1)
+    if numero <= total_parcelas and vencimento_da_parcela(primeiro_vencimento, numero) < referencia:
+        numero += 1  # A parcela deste mês já venceu: a atual é a do mês seguinte
+    numero = min(numero, total_parcelas)
+    return numero, vencimento_da_parcela(primeiro_vencimento, numero)
+
+
+def parcela_no_mes(primeiro_vencimento, total_parcelas, ano, mes):
+    """(número, vencimento) da parcela que vence no mês, ou None se nenhuma vence nele."""
+    numero = (ano - primeiro_vencimento.year) * 12 + mes - primeiro_vencimento.month + 1
+    if 1 <= numero <= total_parcelas:
+        return numero, vencimento_da_parcela(primeiro_vencimento, numero)
+    return None
+
+
+def limites(vencimento, parcela_atual, total_parcelas):
+    """(primeiro_vencimento, ultimo_vencimento) de uma conta, ou (None, None) se não for parcelada.
+
+    Args:
+        vencimento (date): Vencimento da parcela `parcela_atual`.
+        parcela_atual (int | None): Número da parcela que vence em `vencimento` (padrão 1).
+        total_parcelas (int | None): Total de parcelas; sem ele (ou 0) a conta não é parcelada.
+    """
+    if not total_parcelas or not isinstance(vencimento, date):
+        return None, None
+    primeiro = primeiro_vencimento_de(vencimento, parcela_atual)
+    return primeiro, ultimo_vencimento(primeiro, total_parcelas)
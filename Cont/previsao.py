@@ -0,0 +1,111 @@
+"""Previsão de fluxo de caixa (saídas mês a mês) para os próximos meses.
+
+As contas do usuário são lidas uma única vez (database.get_contas_para_previsao) e projetadas
+de uma vez com numpy: cada conta vira um intervalo de meses [início, fim) com o mesmo valor
+mensal, e os intervalos são somados por "diferenças" (+valor no início, -valor no fim, soma
+acumulada). Não há uma consulta nem um laço Python por mês.
+
+    recorrentes  do mês do vencimento atual até o fim do horizonte
+    parceladas   das parcelas que ainda não venceram até a última (pelo cronograma, ver parcelas.py)
+    avulsas      só no mês do vencimento, se ainda não venceu
+
+O saldo projetado parte da soma dos saldos das contas bancárias e desconta as saídas acumuladas
+(não há receitas cadastradas no app).
+"""
+import calendar
+import decimal
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+MESES_PADRAO = 12
+MESES_MAXIMO = 60
+
+
+def _datas(linhas, coluna):
+    """Coluna de datas ISO (AAAA-MM-DD, ou None) como datetime64[D] (None -> NaT)."""
+    return np.array([str(l[coluna])[:10] if l[coluna] else "NaT" for l in linhas], dtype="datetime64[D]")
+
+
+def _acumular(inicio, fim, valor, meses):
+    """Soma, mês a mês, `valor` nos intervalos [inicio, fim) (deslocamentos a partir do mês atual)."""
+    inicio = np.clip(inicio, 0, meses)
+    fim = np.clip(fim, 0, meses)
+    ativos = inicio < fim
+    delta = np.zeros(meses + 1)
+    np.add.at(delta, inicio[ativos], valor[ativos])
+    np.add.at(delta, fim[ativos], -valor[ativos])
+    return np.cumsum(delta[:-1])
+
+
+def _para_decimal(valores):
+    # round(...) + 0.0: resíduos da soma acumulada (ex: -1e-13) viram 0.00, e não -0.00
+    return [decimal.Decimal(f"{round(v, 2) + 0.0:.2f}") for v in valores]
+
+
+def projetar(linhas, saldo_inicial, hoje, meses=MESES_PADRAO):
+    """Projeta as saídas e o saldo dos próximos `meses` (o mês de `hoje` é o primeiro).
+
+    Args:
+        linhas (list): Linhas com valor, vencimento, recorrente, primeiro_vencimento e
+            ultimo_vencimento (ver database.get_contas_para_previsao).
+        saldo_inicial (Decimal | float): Saldo disponível hoje (soma das contas bancárias).
+        hoje (date): Data de referência.
+        meses (int): Horizonte da previsão, em meses.
+
+    Returns:
+        list[dict]: Um item por mês, com 'mes' (date, dia 1), 'recorrentes', 'parcelas',
+            'avulsas', 'saidas' e 'saldo' (Decimal, saldo projetado ao fim do mês).
+    """
+    valor = np.array([l["valor"] or 0 for l in linhas], dtype=float)
+    vencimento = _datas(linhas, "vencimento")
+    primeiro = _datas(linhas, "primeiro_vencimento")
+    ultimo = _datas(linhas, "ultimo_vencimento")
+    recorrente = np.array([bool(l["recorrente"]) for l in linhas], dtype=bool)
+    parcelada = ~np.isnat(primeiro) & ~np.isnat(ultimo)
+    # Evita NaT nas contas: os valores das linhas fora de cada máscara são descartados
+    primeiro = np.where(parcelada, primeiro, vencimento)
+    ultimo = np.where(parcelada, ultimo, vencimento)
+
+    hoje64 = np.datetime64(hoje, "D")
+    mes_atual = hoje64.astype("datetime64[M]")
+
+    def deslocamento(datas):
+        return (datas.astype("datetime64[M]") - mes_atual).astype(int)
+
+    # Parceladas: a parcela deste mês já venceu se o seu dia (ajustado ao tamanho do mês) é antes de hoje
+    dia_primeiro = (primeiro - primeiro.astype("datetime64[M]")).astype(int) + 1
+    dia_no_mes_atual = np.minimum(dia_primeiro, calendar.monthrange(hoje.year, hoje.month)[1])
+    inicio_parcelas = np.where(
+        deslocamento(primeiro) > 0, deslocamento(primeiro), (dia_no_mes_atual < hoje.day).astype(int)
+    )
+    parcelas = _acumular(
+        np.where(parcelada, inicio_parcelas, 0), np.where(parcelada, deslocamento(ultimo) + 1, 0), valor, meses
+    )
+
+    # Recorrentes vencidas (rollover pendente) ainda vão ser pagas: contam a partir deste mês
+    eh_recorrente = recorrente & ~parcelada
+    recorrentes = _acumular(
+        np.where(eh_recorrente, deslocamento(vencimento), 0), np.where(eh_recorrente, meses, 0), valor, meses
+    )
+
+    avulsa = ~recorrente & ~parcelada & (vencimento >= hoje64)
+    avulsas = _acumular(
+        np.where(avulsa, deslocamento(vencimento), 0), np.where(avulsa, deslocamento(vencimento) + 1, 0), valor, meses
+    )
+
+    saidas = recorrentes + parcelas + avulsas
+    saldo = float(saldo_inicial or 0) - np.cumsum(saidas)
+
+    primeiro_dia = hoje.replace(day=1)
+    colunas = {
+        "recorrentes": _para_decimal(recorrentes),
+        "parcelas": _para_decimal(parcelas),
+        "avulsas": _para_decimal(avulsas),
+        "saidas": _para_decimal(saidas),
+        "saldo": _para_decimal(saldo),
+    }
+    return [
+        {"mes": primeiro_dia + relativedelta(months=i), **{nome: valores[i] for nome, valores in colunas.items()}}
+        for i in range(meses)
+    ]
@@ -0,0 +1,103 @@
+"""Perfil (cProfile) de requisições sob demanda.
+
+Desligado por padrão. Com PROFILING_ATIVO, uma requisição é perfilada quando:
+- traz o header 'X-Profile' ou o parâmetro '?_profile=' com o valor de PROFILING_TOKEN
+  (sem PROFILING_TOKEN o header e o parâmetro são ignorados: qualquer cliente poderia encher o
+  disco de perfis); ou
+- é sorteada pela taxa de amostragem PROFILING_AMOSTRAGEM (0 a 1, padrão 0).
+
+Para cada requisição perfilada são gravados em PROFILING_DIR:
+    <data>_<endpoint>_<id>.prof   abrir com pstats/snakeviz
+    <data>_<endpoint>_<id>.txt    resumo com as PROFILING_TOP funções de maior tempo acumulado
+e a resposta recebe o header 'X-Profile-Arquivo' com o nome do arquivo.
+
+Só uma requisição é perfilada por vez (por processo): o cProfile mede apenas a thread que o
+ativou, e as demais seguem normalmente, sem perfil.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, request
+
+HEADER = "X-Profile"
+PARAMETRO = "_profile"
+
+_em_uso = threading.Lock()
+
+
+def _pedido(app):
+    """True se a requisição pediu perfil com o header ou o parâmetro e o token confere."""
+    token = app.config["PROFILING_TOKEN"]
+    valor = request.headers.get(HEADER) or request.args.get(PARAMETRO)
+    if not token or not valor:
+        return False
+    return hmac.compare_digest(valor.encode("utf-8"), token.encode("utf-8"))
+
+
+def _gravar(app, perfil, duracao_ms):
+    """Grava o .prof e o resumo .txt; retorna o nome base dos arquivos."""
+    pasta = app.config["PROFILING_DIR"]
+    os.makedirs(pasta, exist_ok=True)
+    endpoint = (request.endpoint or "sem_rota").replace(".", "_")
+    nome = f"{datetime.now():%Y%m%d_%H%M%S}_{endpoint}_{uuid.uuid4().hex[:8]}"
+
+    perfil.dump_stats(os.path.join(pasta, f"{nome}.prof"))
+
+    resumo = io.StringIO()
+    resumo.write(f"{request.method} {request.full_path.rstrip('?')} - {duracao_ms:.1f} ms\n\n")
+    stats = pstats.Stats(perfil, stream=resumo)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(app.config["PROFILING_TOP"])
+    with open(os.path.join(pasta, f"{nome}.txt"), "w", encoding="utf-8") as f:
+        f.write(resumo.getvalue())
+    return nome
+
+
+def init_app(app):
+    """Registra os hooks de perfil (não faz nada por requisição se PROFILING_ATIVO for falso)."""
+    app.config.setdefault("PROFILING_ATIVO", False)
+    app.config.setdefault("PROFILING_TOKEN", None)
+    app.config.setdefault("PROFILING_AMOSTRAGEM", 0.0)
+    app.config.setdefault("PROFILING_DIR", "perfis")
+    app.config.setdefault("PROFILING_TOP", 30)
+
+    @app.before_request
+    def iniciar_perfil():
+        if not app.config["PROFILING_ATIVO"]:
+            return
+        if not (_pedido(app) or random.random() < app.config["PROFILING_AMOSTRAGEM"]):
+            return
+        if not _em_uso.acquire(blocking=False):
+            return  # Outra requisição está sendo perfilada
+        g._perfil = cProfile.Profile()
+        g._perfil_inicio = time.perf_counter()
+        g._perfil.enable()
+
+    @app.after_request
+    def gravar_perfil(response):
+        perfil = g.pop("_perfil", None)
+        if perfil is None:
+            return response
+        perfil.disable()
+        _em_uso.release()
+        duracao_ms = (time.perf_counter() - g.pop("_perfil_inicio")) * 1000
+        try:
+            response.headers["X-Profile-Arquivo"] = _gravar(app, perfil, duracao_ms)
+        except Exception as e:
+            print(f"Erro ao gravar perfil da requisição: {e}")
+        return response
+
+    @app.teardown_request
+    def encerrar_perfil(e=None):
+        # Se a view levantou exceção, after_request não roda: desliga o perfil e libera o lock
+        perfil = g.pop("_perfil", None)
+        if perfil is not None:
+            perfil.disable()
+            _em_uso.release()
@@ -0,0 +1,109 @@
+"""Reconciliação dos limites disponíveis (cartões) e saldos (contas bancárias) de todos os usuários.
+
+Recalcula o valor esperado de cada cartão/conta pelas contas vinculadas e pelo livro-razão
+(ver database.get_divergencias_saldo) e lista os que divergem do valor gravado. Os usuários são
+divididos em lotes por faixa de ID; cada lote é uma única consulta agregada, e os lotes rodam em
+paralelo em um pool de processos (cada processo abre a sua própria conexão). Com shards por usuário
+(DATABASE_SHARDS, ver database.py), cada shard é um lote.
+
+Com --corrigir, os valores esperados são gravados de uma vez, em uma única transação, com uma
+movimentação de reconciliação no livro-razão de cada cartão/conta corrigido.
+
+Uso (dentro de Cont/):
+    python reconciliar.py                        # usa contas.db
+    python reconciliar.py outro.db --processos 8 --lote 1000
+    python reconciliar.py --corrigir
+    python reconciliar.py contas.db --shards 4   # mesmo valor de DATABASE_SHARDS
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import database
+
+LOTE_PADRAO = 500  # Usuários (faixa de IDs) por consulta
+
+
+def _lotes(caminho, tamanho, shards=0):
+    """Lotes (arquivo, inicio, fim), com faixas de IDs de usuário inclusivas, cobrindo todos os usuários."""
+    conn = database.get_db_connection(caminho)
+    try:
+        menor, maior = conn.execute("SELECT MIN(id), MAX(id) FROM users").fetchone()
+    finally:
+        conn.close()
+    if menor is None:
+        return []
+    if shards:
+        return [(shard, menor, maior) for shard in database.get_shard_paths(caminho, shards)]
+    return [(caminho, inicio, min(inicio + tamanho - 1, maior)) for inicio in range(menor, maior + 1, tamanho)]
+
+
+def _reconciliar_lote(caminho, inicio, fim):
+    # Roda nos processos do pool: só tipos simples entram e saem
+    return [dict(divergencia, banco=caminho) for divergencia in database.get_divergencias_saldo(inicio, fim, caminho)]
+
+
+def reconciliar(caminho, processos=None, lote=LOTE_PADRAO, shards=0):
+    """Divergências de todos os usuários, com os lotes distribuídos em `processos` processos.
+
+    Args:
+        caminho (str): Arquivo do banco (principal, se houver shards).
+        processos (int, optional): Tamanho do pool (padrão: os.cpu_count()); 0 roda no próprio processo.
+        lote (int): Usuários (faixa de IDs) por consulta, sem shards.
+        shards (int): Quantidade de shards por usuário (0 = banco único).
+
+    Returns:
+        list[dict]: Itens de database.get_divergencias_saldo, mais o arquivo em 'banco'.
+    """
+    lotes = _lotes(caminho, lote, shards)
+    if processos == 0 or len(lotes) <= 1:
+        resultados = [_reconciliar_lote(*lote_atual) for lote_atual in lotes]
+    else:
+        with ProcessPoolExecutor(max_workers=processos or os.cpu_count()) as executor:
+            futuros = [executor.submit(_reconciliar_lote, *lote_atual) for lote_atual in lotes]
+            resultados = [futuro.result() for futuro in futuros]
+    return [divergencia for resultado in resultados for divergencia in resultado]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcilia limites disponíveis e saldos com as contas vinculadas.")
+    parser.add_argument("banco", nargs="?", default=database.DB_FILE, help="arquivo SQLite (padrão: contas.db)")
+    parser.add_argument("--processos", type=int, help="processos em paralelo (padrão: nº de CPUs; 0 = sem pool)")
+    parser.add_argument("--lote", type=int, default=LOTE_PADRAO, help="usuários por consulta")
+    parser.add_argument("--corrigir", action="store_true", help="grava os valores esperados")
+    parser.add_argument("--shards", type=int, default=database.get_num_shards(),
+                        help="shards por usuário (padrão: DATABASE_SHARDS)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.banco):
+        print(f"Banco não encontrado: {args.banco}")
+        return 1
+    database.apply_migrations_all(args.banco, args.shards)
+
+    inicio = time.perf_counter()
+    divergencias = reconciliar(args.banco, args.processos, max(args.lote, 1), args.shards)
+    duracao = time.perf_counter() - inicio
+
+    for d in divergencias:
+        coluna = "limite disponível" if d["tipo"] == "cartao" else "saldo"
+        print(f"[usuário {d['user_id']}] {d['nome']} (ID {d['id']}): {coluna} {d['gravado']:.2f}, "
+              f"esperado {d['esperado']:.2f} (diferença {d['gravado'] - d['esperado']:+.2f}; "
+              f"livro-razão {d['livro']:.2f})")
+    print(f"{len(divergencias)} divergência(s) encontrada(s) em {duracao:.1f}s.")
+
+    if args.corrigir and divergencias:
+        # Uma transação por arquivo
+        por_banco = {}
+        for d in divergencias:
+            por_banco.setdefault(d["banco"], []).append(d)
+        corrigidos = sum(database.corrigir_saldos(lista, banco) for banco, lista in por_banco.items())
+        print(f"{corrigidos} tipo(s) de pagamento corrigido(s).")
+        if corrigidos != len(divergencias):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
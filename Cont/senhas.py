@@ -0,0 +1,111 @@
+"""Hash de senhas fora das threads de requisição.
+
+generate_password_hash/check_password_hash (scrypt, PBKDF2) são CPU puro e levam dezenas de ms;
+uma rajada de logins feitos direto nas threads do Waitress ocupa todas elas. Aqui o cálculo vai
+para um pool de processos de tamanho fixo (SENHA_PROCESSOS) com limite de pedidos em andamento
+(SENHA_PROCESSOS + SENHA_FILA_MAXIMA): acima do limite, FilaCheia é levantada na hora e a rota
+responde 503, em vez de a thread ficar esperando atrás de uma fila sem fim.
+
+O método do hash é configurável (SENHA_METODO, no formato do Werkzeug, ex: 'scrypt:32768:8:1' ou
+'pbkdf2:sha256:1000000'). Hashes gravados com outro método são refeitos no próximo login
+(precisa_rehash), de forma transparente para o usuário.
+
+Com SENHA_PROCESSOS = 0 o hash é calculado na própria thread (útil em testes).
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+METODO_PADRAO = "scrypt:32768:8:1"
+
+
+class FilaCheia(Exception):
+    """Pedidos de hash demais em andamento (ou o pedido passou de SENHA_TIMEOUT); tente novamente em instantes."""
+
+
+class PoolSenhas:
+    """Pool de processos com limite de pedidos em andamento (executando + esperando)."""
+
+    def __init__(self, processos, fila_maxima, timeout):
+        self.processos = processos
+        self.timeout = timeout
+        self._vagas = threading.BoundedSemaphore(processos + fila_maxima)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _obter_executor(self):
+        # Criado no primeiro uso: sob o gunicorn, dentro de cada worker (depois do fork).
+        # 'spawn' porque o processo já tem threads (servidor), e fork com threads não é seguro
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processos, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def executar(self, funcao, *args):
+        """Executa funcao(*args) no pool e devolve o resultado.
+
+        A vaga é liberada quando o cálculo termina de fato (ou é cancelado antes de começar), não
+        quando a requisição desiste de esperar: um hash que passou de SENHA_TIMEOUT continua
+        rodando no processo e ocupando a sua vaga.
+        """
+        if not self.processos:
+            return funcao(*args)
+        if not self._vagas.acquire(blocking=False):
+            raise FilaCheia()
+        try:
+            futuro = self._obter_executor().submit(funcao, *args)
+        except BaseException:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TempoEsgotado:
+            futuro.cancel()  # Só tem efeito se ainda não começou
+            raise FilaCheia() from None
+
+    def encerrar(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+def _pool():
+    return current_app.extensions["senhas"]
+
+
+def gerar_hash(senha):
+    """Hash da senha com o método configurado (SENHA_METODO)."""
+    return _pool().executar(generate_password_hash, senha, current_app.config["SENHA_METODO"])
+
+
+def verificar(hash_armazenado, senha):
+    """True se a senha confere com o hash armazenado (qualquer método suportado pelo Werkzeug)."""
+    if not hash_armazenado:
+        return False
+    return _pool().executar(check_password_hash, hash_armazenado, senha)
+
+
+def precisa_rehash(hash_armazenado):
+    """True se o hash foi gerado com parâmetros diferentes dos configurados.
+
+    O Werkzeug grava 'método$salt$hash'; basta comparar o método (com seus parâmetros).
+    """
+    return hash_armazenado.split("$", 1)[0] != current_app.config["SENHA_METODO"]
+
+
+def init_app(app):
+    """Cria o pool de hash do app (os processos só sobem no primeiro uso)."""
+    app.config.setdefault("SENHA_METODO", METODO_PADRAO)
+    app.config.setdefault("SENHA_PROCESSOS", 2)
+    app.config.setdefault("SENHA_FILA_MAXIMA", 16)
+    app.config.setdefault("SENHA_TIMEOUT", 30)
+    app.extensions["senhas"] = PoolSenhas(
+        app.config["SENHA_PROCESSOS"], app.config["SENHA_FILA_MAXIMA"], app.config["SENHA_TIMEOUT"]
+    )
@@ -0,0 +1,137 @@
+"""Rastreador de SQL por requisição: detecção de N+1 e log de consultas lentas.
+
+Desligado por padrão (SQL_TRACE_ATIVO). Ligado, cada conexão aberta durante uma requisição
+recebe um sqlite3 set_trace_callback que anota cada comando (com os parâmetros já expandidos);
+o tempo de cada comando vem do cursor instrumentado de database.py (comando_executado).
+
+Ao fim da requisição os comandos são agrupados pelo texto normalizado (literais trocados por '?'):
+- um mesmo comando repetido SQL_TRACE_N1_MINIMO vezes ou mais é registrado como N+1;
+- cada comando com SQL_TRACE_LENTO_MS ou mais é registrado como lento.
+Os registros vão, uma linha cada, para SQL_TRACE_LOG. A resposta recebe os headers
+'X-SQL-Comandos' e 'X-SQL-Tempo-Ms' com o total da requisição.
+
+O tempo medido é o do execute (até a primeira linha); o restante de um fetchall não entra.
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
+
+import database
+
+_log_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTA = re.compile(r"\?(?:\s*,\s*\?)+")
+_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar(sql):
+    """Texto do comando sem os valores: "WHERE id = 7" e "WHERE id = 8" caem no mesmo grupo."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMERO.sub("?", sql)
+    sql = _LISTA.sub("?, ...", sql)
+    return _ESPACOS.sub(" ", sql).strip()
+
+
+def _estado():
+    """Comandos da requisição atual: pendentes (sem tempo ainda) e concluídos [(sql, segundos)]."""
+    if "_sql_trace" not in g:
+        g._sql_trace = {"pendentes": [], "comandos": []}
+    return g._sql_trace
+
+
+def _fechar_pendentes(estado, fim, inicio_comando):
+    """Atribui tempo aos comandos anotados: cada um vai do seu início ao início do seguinte
+    (executescript traz vários); os que vieram antes do execute atual (ex: o COMMIT de
+    conn.commit()) ficam com tempo 0."""
+    pendentes = estado["pendentes"]
+    for i, (sql, inicio) in enumerate(pendentes):
+        if inicio < inicio_comando:
+            segundos = 0.0
+        else:
+            proximo = pendentes[i + 1][1] if i + 1 < len(pendentes) else fim
+            segundos = proximo - inicio
+        estado["comandos"].append((sql, segundos))
+    pendentes.clear()
+
+
+class ObservadorTracer:
+    """Observador de database.py: liga o trace nas conexões abertas durante uma requisição."""
+
+    def conexao_aberta(self, conn):
+        if not (has_request_context() and current_app.config["SQL_TRACE_ATIVO"]):
+            return
+        estado = _estado()
+
+        def anotar(sql):
+            pendentes = estado["pendentes"]
+            # Statements de triggers chegam repetindo o texto do comando que os disparou
+            if pendentes and pendentes[-1][0] == sql:
+                return
+            pendentes.append((sql, time.perf_counter()))
+
+        conn.set_trace_callback(anotar)
+
+    def comando_executado(self, segundos):
+        if has_request_context() and "_sql_trace" in g:
+            agora = time.perf_counter()
+            _fechar_pendentes(g._sql_trace, agora, agora - segundos)
+
+
+_observador = ObservadorTracer()
+
+
+def analisar(comandos, lento_ms, n1_minimo):
+    """Retorna (lentos, n1): lentos = [(ms, sql)], n1 = [(vezes, ms_total, sql_normalizado)]."""
+    lentos = [(s * 1000, sql) for sql, s in comandos if s * 1000 >= lento_ms]
+    grupos = defaultdict(lambda: [0, 0.0])
+    for sql, s in comandos:
+        grupo = grupos[normalizar(sql)]
+        grupo[0] += 1
+        grupo[1] += s
+    n1 = sorted(((vezes, total * 1000, sql) for sql, (vezes, total) in grupos.items() if vezes >= n1_minimo),
+                reverse=True)
+    return lentos, n1
+
+
+def _gravar_log(caminho, linhas):
+    with _log_lock:
+        with open(caminho, "a", encoding="utf-8") as f:
+            f.writelines(linha + "\n" for linha in linhas)
+
+
+def init_app(app):
+    """Registra o observador do banco e os hooks que analisam os comandos de cada requisição."""
+    app.config.setdefault("SQL_TRACE_ATIVO", False)
+    app.config.setdefault("SQL_TRACE_LENTO_MS", 100.0)
+    app.config.setdefault("SQL_TRACE_N1_MINIMO", 5)
+    app.config.setdefault("SQL_TRACE_LOG", "sql_trace.log")
+    database.add_db_observer(_observador)
+
+    @app.after_request
+    def registrar_comandos(response):
+        estado = g.pop("_sql_trace", None)
+        if estado is None:
+            return response
+        agora = time.perf_counter()
+        _fechar_pendentes(estado, agora, agora)
+        comandos = estado["comandos"]
+        response.headers["X-SQL-Comandos"] = str(len(comandos))
+        response.headers["X-SQL-Tempo-Ms"] = f"{sum(s for _, s in comandos) * 1000:.1f}"
+
+        lentos, n1 = analisar(comandos, app.config["SQL_TRACE_LENTO_MS"], app.config["SQL_TRACE_N1_MINIMO"])
+        if lentos or n1:
+            origem = f"{request.method} {request.path} ({request.endpoint or 'sem_rota'})"
+            momento = datetime.now().isoformat(timespec="seconds")
+            linhas = [f"{momento} LENTO {ms:.1f}ms {origem} {_ESPACOS.sub(' ', sql).strip()}" for ms, sql in lentos]
+            linhas += [f"{momento} N+1 {vezes}x {ms:.1f}ms {origem} {sql}" for vezes, ms, sql in n1]
+            try:
+                _gravar_log(app.config["SQL_TRACE_LOG"], linhas)
+            except OSError as e:
+                print(f"Erro ao gravar o log de SQL: {e}")
+        return response
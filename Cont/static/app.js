@@ -0,0 +1,55 @@
+/* Scripts gerais da aplicação (páginas que herdam de base.html) */
+
+// Destaca no menu lateral o link da página atual
+$(function() {
+    var currentPath = window.location.pathname;
+    var dashboardUrl = $('.sidebar-menu').data('dashboard-url');
+    $('.sidebar-menu a').each(function() {
+        var $this = $(this);
+        var linkHref = $this.attr('href');
+        if (linkHref === currentPath || (linkHref !== '/' && currentPath.startsWith(linkHref))) {
+             $this.addClass('active');
+        } else {
+             $this.removeClass('active');
+        }
+    });
+     if (currentPath === dashboardUrl) {
+          $('.sidebar-menu a[href="' + dashboardUrl + '"]').addClass('active');
+     }
+});
+
+// Modal genérico de confirmação de exclusão
+$(document).ready(function() {
+    $('#confirmDeleteModal').on('show.bs.modal', function (event) {
+        var button = $(event.relatedTarget);
+        var url = button.data('url-delete');
+        var itemName = button.data('item-name');
+        var modal = $(this);
+        var form = modal.find('#deleteForm');
+        form.attr('action', url);
+
+        var itemNameElement = modal.find('#deleteItemName');
+        if (itemName) {
+            itemNameElement.text('Item: ' + itemName).show();
+        } else {
+            itemNameElement.hide().text('');
+        }
+    });
+});
+
+// Modo escuro (preferência salva no navegador)
+if (localStorage.getItem('theme') === 'dark') {
+    document.body.classList.add('dark-mode');
+}
+
+$(document).ready(function() {
+    $("#darkModeToggle").click(function() {
+        if (document.body.classList.contains("dark-mode")) {
+            document.body.classList.remove("dark-mode");
+            localStorage.setItem("theme", "light");
+        } else {
+            document.body.classList.add("dark-mode");
+            localStorage.setItem("theme", "dark");
+        }
+    });
+});
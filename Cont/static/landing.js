@@ -0,0 +1,19 @@
+/* Carrossel de depoimentos da landing page */
+document.addEventListener('DOMContentLoaded', function() {
+    const slides = document.querySelectorAll('.testimonial-slide');
+    let currentSlide = 0;
+
+    function showSlide(n) {
+        slides.forEach(slide => slide.classList.remove('active'));
+        slides[n].classList.add('active');
+    }
+
+    function nextSlide() {
+        currentSlide = (currentSlide + 1) % slides.length;
+        showSlide(currentSlide);
+    }
+
+    // Inicia o carrossel
+    showSlide(currentSlide);
+    setInterval(nextSlide, 5000); // Troca de slide a cada 5 segundos
+});
@@ -0,0 +1,54 @@
+"""Busca de contas (database.search_contas): filtro de vencimento nas parceladas."""
+import calendar
+from datetime import date
+
+import pytest
+from dateutil.relativedelta import relativedelta
+
+import database
+import parcelas
+from app import create_app
+
+
+def _mes(dia):
+    """(primeiro, último) dia do mês de 'dia'."""
+    return dia.replace(day=1), dia.replace(day=calendar.monthrange(dia.year, dia.month)[1])
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({"DATABASE": str(tmp_path / "busca.db"), "TESTING": True, "SENHA_PROCESSOS": 0})
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def parcelada(app):
+    """Compra em 10 parcelas cuja 1ª venceu há 3 meses: a parcela atual não é a gravada em 'vencimento'."""
+    database.create_user("busca", "hash")
+    user_id = database.get_user_by_username("busca").id
+    primeiro = date.today().replace(day=10) - relativedelta(months=3)
+    conta_id = database.create_conta("Notebook parcelado", 250.0, primeiro, None, 1, 10, user_id, 0, None, 2500.0)
+    _, atual = parcelas.parcela_em(primeiro, 10, date.today())
+    return user_id, conta_id, primeiro, atual
+
+
+def test_parcelada_encontrada_pelo_mes_da_parcela_atual(parcelada):
+    user_id, conta_id, _, atual = parcelada
+    de, ate = _mes(atual)
+    resultado = database.search_contas(user_id, "note", data_inicio=de, data_fim=ate)
+    assert [(linha["id"], linha["vencimento"]) for linha in resultado] == [(conta_id, atual.isoformat())]
+
+
+def test_parcelada_fora_do_mes_da_parcela_atual(parcelada):
+    user_id, _, primeiro, _ = parcelada
+    de, ate = _mes(primeiro)
+    assert database.search_contas(user_id, "note", data_inicio=de, data_fim=ate) == []
+
+
+def test_avulsa_filtrada_pelo_vencimento(parcelada):
+    user_id = parcelada[0]
+    vencimento = date.today() + relativedelta(months=6)
+    conta_id = database.create_conta("Notebook avulso", 90.0, vencimento, None, None, None, user_id, 0, None, 90.0)
+    de, ate = _mes(vencimento)
+    assert [linha["id"] for linha in database.search_contas(user_id, "note", data_inicio=de, data_fim=ate)] == [conta_id]
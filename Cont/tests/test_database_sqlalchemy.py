@@ -0,0 +1,23 @@
+"""Backend SQLAlchemy (DATABASE_BACKEND='sqlalchemy'): URL do banco."""
+import os
+
+import pytest
+
+from app import create_app
+
+
+def _config(tmp_path, **extra):
+    return {"DATABASE": str(tmp_path / "contas.db"), "DATABASE_BACKEND": "sqlalchemy", "SENHA_PROCESSOS": 0, **extra}
+
+
+@pytest.mark.parametrize("url", ["sqlite:////tmp/outro.db", "sqlite://", "postgresql://usuario@servidor/contas"])
+def test_url_de_outro_banco_e_recusada(tmp_path, url):
+    with pytest.raises(ValueError, match="DATABASE_URL"):
+        create_app(_config(tmp_path, DATABASE_URL=url))
+
+
+def test_url_relativa_do_mesmo_arquivo_vira_absoluta(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = create_app(_config(tmp_path, DATABASE="contas.db", DATABASE_URL="sqlite:///contas.db"))
+    with app.app_context():
+        assert app.extensions["sqlalchemy"].engine.url.database == os.path.join(str(tmp_path), "contas.db")
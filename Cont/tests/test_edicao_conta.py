@@ -0,0 +1,49 @@
+"""Edição de conta pela tela: livro-razão quando a conta não é salva."""
+from datetime import date
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as app_module
+import database
+
+
+@pytest.fixture
+def cliente(tmp_path):
+    app = app_module.create_app({
+        "DATABASE": str(tmp_path / "edicao.db"), "TESTING": True, "WTF_CSRF_ENABLED": False, "SENHA_PROCESSOS": 0,
+    })
+    with app.app_context():
+        database.create_user("edicao", generate_password_hash("senha123", "pbkdf2:sha256:1000"))
+    cliente = app.test_client()
+    assert cliente.post("/login", data={"username": "edicao", "password": "senha123"}).status_code == 302
+    with app.app_context():
+        yield cliente
+
+
+def test_falha_ao_salvar_desfaz_o_estorno_com_motivo_proprio(cliente, monkeypatch):
+    categoria_id = cliente.post("/api/v1/categorias", json={"nome": "Casa"}).get_json()["data"]["id"]
+    cartao_id = cliente.post("/api/v1/tipos_pagamento", json={"tipo": "cartao", "nome": "Cartão", "limite": "1000"}
+                             ).get_json()["data"]["id"]
+    conta_id = cliente.post("/api/v1/contas", json={
+        "nome": "Geladeira", "valor": "300", "vencimento": date.today().isoformat(),
+        "categoria_id": categoria_id, "tipo_pagamento_id": cartao_id,
+    }).get_json()["data"]["id"]
+
+    monkeypatch.setattr(app_module, "update_conta", lambda conta: False)
+    form = {
+        "nome": "Geladeira", "valor": "350,00", "valor_total_compra": "", "vencimento": date.today().isoformat(),
+        "categoria_id": str(categoria_id), "parcela_atual": "", "total_parcelas": "", "tipo_pagamento": str(cartao_id),
+    }
+    cliente.post(f"/edit/{conta_id}", data=form)
+
+    user_id = database.get_user_by_username("edicao").id
+    movimentos = database.get_movimentacoes(cartao_id, user_id)
+    motivos = [(m["motivo"], m["delta"]) for m in movimentos if m["conta_id"] == conta_id]
+    assert sorted(motivos) == sorted([
+        (database.MOTIVO_CONTA_ADICIONADA, -300.0),
+        (database.MOTIVO_CONTA_ESTORNO, 300.0),
+        (database.MOTIVO_ESTORNO_DESFEITO, -300.0),
+    ])
+    assert database.get_tipo_pagamento_by_id(cartao_id).limite_disponivel == 700
+    assert database.get_divergencias_saldo(user_id, user_id) == []
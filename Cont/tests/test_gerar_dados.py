@@ -0,0 +1,29 @@
+"""Gerador de dados sintéticos (gerar_dados.py): consistência do livro-razão."""
+from datetime import date
+
+import database
+import reconciliar
+from gerar_dados import gerar
+
+HOJE = date(2026, 1, 15)
+
+
+def test_gerar_de_novo_no_mesmo_banco_mantem_o_livro(tmp_path):
+    caminho = str(tmp_path / "dados.db")
+    gerar(caminho, usuarios=2, anos=1, contas=40, hoje=HOJE, prefixo="a")
+    gerar(caminho, usuarios=2, anos=1, contas=40, hoje=HOJE, prefixo="b", seed=7)
+
+    assert reconciliar.reconciliar(caminho, processos=0) == []
+    conn = database.get_db_connection(caminho)
+    try:
+        # Uma abertura (movimentação + snapshot) por cartão/conta bancária, inclusive os da 1ª geração
+        aberturas = conn.execute(
+            "SELECT tipo_pagamento_id, COUNT(*) FROM movimentacoes WHERE motivo = ? GROUP BY tipo_pagamento_id",
+            (database.MOTIVO_ABERTURA,),
+        ).fetchall()
+        snapshots = conn.execute("SELECT tipo_pagamento_id, COUNT(*) FROM saldos_snapshot GROUP BY tipo_pagamento_id").fetchall()
+        tipos = conn.execute("SELECT COUNT(*) FROM tipos_pagamento").fetchone()[0]
+    finally:
+        conn.close()
+    assert len(aberturas) == len(snapshots) == tipos
+    assert all(n == 1 for _, n in aberturas + snapshots)
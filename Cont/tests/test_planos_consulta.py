@@ -0,0 +1,52 @@
+"""Planos de consulta dos comandos SQL do app (ver verificar_planos.py).
+
+Falha se algum comando voltar a ler 'contas' inteira ou a ordenar com B-tree temporária, por
+exemplo depois de uma consulta nova sem índice ou de um índice removido.
+"""
+import pytest
+
+import database
+import verificar_planos
+
+
+@pytest.fixture(scope="module")
+def resultado():
+    return verificar_planos.verificar()
+
+
+def test_comandos_capturados(resultado):
+    # Sem comandos capturados a verificação abaixo passaria sem verificar nada
+    assert len(resultado) > 20
+
+
+def test_planos_sem_regressao(resultado):
+    regressoes = [
+        "\n".join([sql, *(f"  -> {problema}" for problema in problemas)])
+        for sql, _, problemas in resultado
+        if problemas
+    ]
+    assert not regressoes, "Planos com regressão:\n\n" + "\n\n".join(regressoes)
+
+
+@pytest.fixture
+def banco_vazio(tmp_path):
+    caminho = str(tmp_path / "vazio.db")
+    database.apply_migrations(caminho)
+    return caminho
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT c.id FROM contas c WHERE c.nome = 'x'",
+    "SELECT c.id FROM contas AS c WHERE c.nome = 'x'",
+    "SELECT cat.nome FROM categorias cat JOIN contas c ON c.categoria_id = cat.id WHERE c.nome = 'x'",
+    "SELECT id FROM contas WHERE nome = 'x'",
+])
+def test_scan_de_contas_com_alias_e_regressao(banco_vazio, sql):
+    [(_, linhas, problemas)] = verificar_planos.planos(banco_vazio, {sql: sql})
+    assert problemas, linhas
+
+
+def test_busca_por_indice_com_alias_nao_e_regressao(banco_vazio):
+    sql = "SELECT c.id FROM contas c WHERE c.user_id = 1"
+    [(_, linhas, problemas)] = verificar_planos.planos(banco_vazio, {sql: sql})
+    assert not problemas, linhas
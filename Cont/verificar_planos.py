@@ -0,0 +1,205 @@
+"""Verificação dos planos de consulta (EXPLAIN QUERY PLAN) dos comandos SQL do app.
+
+Gera um banco temporário com gerar_dados.py e exercita as rotas e funções que acessam o banco
+(dashboard, relatório, previsão, faturas, detalhes financeiros, rollover, cadastros, API, busca, reconciliação
+e as funções de database.py), capturando cada comando executado com set_trace_callback. Depois roda
+EXPLAIN QUERY PLAN em cada comando distinto (pelo texto normalizado, ver sql_tracer.normalizar) e aponta as regressões:
+
+    SCAN contas                   leitura completa da tabela de contas (falta índice); o SQLite
+                                  mostra o alias quando há um ('FROM contas c' -> 'SCAN c')
+    USE TEMP B-TREE FOR ORDER BY  ordenação feita em memória em vez de pelo índice
+                                  (exceto na busca textual: ordenar por relevância sempre ordena)
+
+Sai com código 1 se alguma regressão for encontrada, para rodar em CI ou antes de um commit
+que mexe em consultas ou índices. A mesma verificação roda com os testes (tests/test_planos_consulta.py).
+
+Uso (dentro de Cont/):
+    python verificar_planos.py
+    python verificar_planos.py --mostrar        # imprime o plano de todos os comandos
+    python -m pytest                            # testes, incluindo esta verificação
+"""
+import argparse
+import contextlib
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+
+import app as app_module
+import database
+from app import create_app
+from gerar_dados import gerar
+from sql_tracer import normalizar
+
+SENHA = "senha123"
+
+# Tabela que não pode ser lida inteira: no plano aparece pelo nome ou pelo alias do comando
+TABELA_SEM_SCAN = "contas"
+# 'FROM contas c', 'JOIN contas AS c'... (o grupo é o alias, se houver)
+_REFERENCIA = re.compile(rf"\b(?:FROM|JOIN)\s+{TABELA_SEM_SCAN}\b(?:\s+(?:AS\s+)?(\w+))?", re.I)
+# Palavras que podem vir logo depois do nome da tabela sem ser um alias
+_NAO_ALIAS = {"where", "on", "using", "left", "right", "inner", "outer", "cross", "join", "natural", "group",
+              "order", "limit", "set", "union", "except", "intersect", "window", "having", "indexed", "not",
+              "returning", "values"}
+# Trechos de plano considerados regressão (além da leitura completa de TABELA_SEM_SCAN)
+REGRESSOES = (
+    (re.compile(r"USE TEMP B-TREE FOR (?:.* )?ORDER BY"), "ordenação com B-tree temporária"),
+)
+# Comandos sem plano relevante ('--' = comandos internos do SQLite, ex: das tabelas do FTS5)
+_IGNORAR = re.compile(r"^\s*(--|(PRAGMA|BEGIN|COMMIT|ROLLBACK|CREATE|ALTER|DROP|SAVEPOINT|RELEASE)\b)", re.I)
+
+
+class Captura:
+    """Observador de database.py que guarda o primeiro exemplo de cada comando distinto."""
+
+    def __init__(self):
+        self.comandos = {}  # sql normalizado -> sql com valores
+
+    def anotar(self, sql):
+        if not _IGNORAR.match(sql) and "sqlite_master" not in sql:
+            self.comandos.setdefault(normalizar(sql), sql.strip())
+
+    def conexao_aberta(self, conn):
+        conn.set_trace_callback(self.anotar)
+
+    def comando_executado(self, segundos):
+        pass
+
+
+def _esperar(resposta, *esperados):
+    if resposta.status_code not in esperados:
+        raise RuntimeError(f"Status inesperado {resposta.status_code} em {resposta.request.path}")
+
+
+def exercitar(app):
+    """Percorre as rotas e funções que acessam o banco, com um usuário dos dados gerados."""
+    with app.app_context():
+        conn = database.get_db_connection()
+        user_id = conn.execute("SELECT id FROM users WHERE username = 'plano1'").fetchone()[0]
+        categoria_id = conn.execute("SELECT id FROM categorias WHERE user_id = ? LIMIT 1", (user_id,)).fetchone()[0]
+        conta_id = conn.execute("SELECT id FROM contas WHERE user_id = ? LIMIT 1", (user_id,)).fetchone()[0]
+        tipo_id = conn.execute("SELECT id FROM tipos_pagamento WHERE user_id = ? AND tipo = 'cartao' LIMIT 1",
+                               (user_id,)).fetchone()[0]
+        conn.close()
+
+        app_module.update_parcelas_recorrentes()
+        database.get_contas_by_user(user_id)
+        database.get_conta_by_id(conta_id, user_id)
+        database.get_categorias_by_user(user_id)
+        database.get_tipos_pagamento_by_user(user_id)
+        database.get_data_version(user_id)
+        for tabela in database.API_COLUMNS:
+            database.get_rows_by_user(tabela, user_id, limit=50)
+            database.get_rows_by_user(tabela, user_id, after_id=1, limit=50)
+
+    cliente = app.test_client()
+    _esperar(cliente.post("/login", data={"username": "plano1", "password": SENHA}), 302)
+    hoje = date.today()
+    for caminho in ("/dashboard", "/detalhes_financeiros", "/categorias", "/cartoes", "/contas_bancarias",
+                    f"/relatorio/visualizar?mes={hoje.month}&ano={hoje.year}", "/previsao?meses=24", f"/edit/{conta_id}",
+                    f"/cartoes/edit/{tipo_id}", f"/cartoes/{tipo_id}/faturas",
+                    f"/tipos_pagamento/{tipo_id}/movimentacoes", f"/categorias/edit/{categoria_id}",
+                    "/api/v1/contas?limit=50", f"/api/v1/contas?ids={conta_id}", f"/api/v1/contas/{conta_id}",
+                    "/api/v1/categorias", "/api/v1/tipos_pagamento",
+                    f"/api/v1/busca?q=cel&categoria_id={categoria_id}&de=2020-01-01&ate={hoje.isoformat()}"):
+        _esperar(cliente.get(caminho), 200)
+
+    form = {
+        "nome": "Conta verificação",
+        "valor": "10,00",
+        "valor_total_compra": "",
+        "vencimento": hoje.isoformat(),
+        "categoria_id": str(categoria_id),
+        "parcela_atual": "",
+        "total_parcelas": "",
+        "tipo_pagamento": str(tipo_id),
+    }
+    _esperar(cliente.post("/add", data=form), 302)
+    _esperar(cliente.post(f"/edit/{conta_id}", data=form), 302)
+    _esperar(cliente.post(f"/delete/{conta_id}"), 302)
+    _esperar(cliente.post("/categorias/add", data={"nome": "Categoria verificação"}), 302)
+
+    # Depois das escritas acima, para haver movimentações de contas no livro-razão
+    with app.app_context():
+        database.get_divergencias_saldo(user_id, user_id)
+
+
+def nomes_no_plano(sql):
+    """Nomes com que TABELA_SEM_SCAN aparece no plano do comando: o da tabela e os aliases usados."""
+    nomes = {TABELA_SEM_SCAN}
+    for alias in _REFERENCIA.findall(sql):
+        if alias and alias.lower() not in _NAO_ALIAS:
+            nomes.add(alias)
+    return nomes
+
+
+def regressoes(sql, linhas):
+    """Regressões encontradas nas linhas do plano de 'sql'."""
+    nomes = "|".join(re.escape(nome) for nome in sorted(nomes_no_plano(sql)))
+    regras = [(re.compile(rf"^SCAN (?:{nomes})\b"), f"leitura completa de '{TABELA_SEM_SCAN}'")]
+    if " MATCH " not in sql:  # Busca textual: ordenar por relevância sempre ordena
+        regras.extend(REGRESSOES)
+    return [f"{motivo}: {linha}" for linha in linhas for padrao, motivo in regras if padrao.search(linha)]
+
+
+def planos(caminho, comandos):
+    """[(sql, [linhas do plano], [regressões])] para cada comando capturado."""
+    conn = sqlite3.connect(caminho)
+    try:
+        resultado = []
+        for sql in comandos.values():
+            try:
+                linhas = [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            except sqlite3.Error as e:
+                linhas = [f"(EXPLAIN falhou: {e})"]
+            resultado.append((sql, linhas, regressoes(sql, linhas)))
+        return resultado
+    finally:
+        conn.close()
+
+
+def verificar(contas=300):
+    """Gera um banco temporário, exercita o app e devolve planos() de cada comando executado."""
+    pasta = tempfile.mkdtemp(prefix="planos_")
+    captura = Captura()
+    try:
+        caminho = os.path.join(pasta, "planos.db")
+        gerar(caminho, usuarios=2, anos=2, contas=contas, prefixo="plano", senha=SENHA, atrasadas=0.3)
+        database.add_db_observer(captura)
+        app = create_app({"DATABASE": caminho, "WTF_CSRF_ENABLED": False, "TESTING": True, "SENHA_PROCESSOS": 0})
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            exercitar(app)
+        return planos(caminho, captura.comandos)
+    finally:
+        database.remove_db_observer(captura)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica os planos de consulta dos comandos SQL do app.")
+    parser.add_argument("--mostrar", action="store_true", help="imprime o plano de todos os comandos")
+    parser.add_argument("--contas", type=int, default=300, help="contas por usuário nos dados gerados")
+    args = parser.parse_args(argv)
+
+    resultado = verificar(args.contas)
+
+    regressoes = 0
+    for sql, linhas, problemas in resultado:
+        if problemas or args.mostrar:
+            print(("REGRESSÃO " if problemas else "") + sql)
+            for linha in linhas:
+                print(f"    {linha}")
+            for problema in problemas:
+                print(f"  -> {problema}")
+            print()
+        regressoes += bool(problemas)
+
+    print(f"{len(resultado)} comandos verificados, {regressoes} com regressão.")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+"""Ponto de entrada WSGI para servidores com vários processos (gunicorn).
+
+    gunicorn            # dentro de Cont/, usa gunicorn.conf.py
+
+As migrações do schema já foram aplicadas pelo processo master do gunicorn
+(hook on_starting em gunicorn.conf.py), então cada worker apenas cria o app.
+Para outro servidor WSGI, aplique-as antes (ex: python -c "import database; database.apply_migrations_all()")
+ou use create_app() com a configuração padrão.
+"""
+from app import create_app
+
+app = create_app({"APLICAR_MIGRACOES": False})